@@ -8,6 +8,7 @@ import os
 import json
 import logging
 import time
+import asyncio
 import re
 from typing import Dict, List, Any, Optional
 from datetime import datetime
@@ -1013,8 +1014,10 @@ async def convert_query_to_questions(request: ElasticsearchQueryRequest):
         if not request.query or not isinstance(request.query, dict):
             raise HTTPException(status_code=400, detail="Invalid Elasticsearch query format")
 
-        # Generate questions
-        questions = query_service.generate_questions_from_query(
+        # Generate questions in a worker thread: the LiteLLM call and its
+        # retry backoff are blocking and must not stall the event loop
+        questions = await asyncio.to_thread(
+            query_service.generate_questions_from_query,
             query=request.query,
             context=request.context
         )
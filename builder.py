@@ -1,4 +1,5 @@
 import json
+import hashlib
 
 def condition_to_es(condition):
     field = condition["field"]
@@ -73,26 +74,61 @@ def condition_to_es(condition):
     return query
 
 
-def group_to_es(group, inherited_nested_path=None):
+# Operators whose clauses contribute to relevance scoring. Everything else
+# (exact, range, exists, in, ...) is a yes/no filter.
+SCORING_OPERATORS = {"match"}
+
+
+def is_scoring_condition(condition):
+    return condition.get("operator") in SCORING_OPERATORS
+
+
+def group_has_scoring(group):
+    """True if any condition in the group or its subgroups is scored"""
+    if any(is_scoring_condition(c) for c in group.get("conditions", [])):
+        return True
+    return any(group_has_scoring(g) for g in group.get("groups", []))
+
+
+def build_bool_clauses(bool_key, scored, unscored, filter_context=False):
+    """
+    Build the bool body for a group. In filter context, AND groups put
+    non-scoring clauses under `filter` (cacheable, no scoring) and keep only
+    scoring clauses under `must`.
+    """
+    if not filter_context or bool_key != "must":
+        return {bool_key: scored + unscored}
+    body = {}
+    if scored:
+        body["must"] = scored
+    if unscored:
+        body["filter"] = unscored
+    return body or {"must": []}
+
+
+def group_to_es(group, inherited_nested_path=None, filter_context=False):
     logic = group["operator"]
     bool_key = "must" if logic == "AND" else "should"
 
-    clauses = []
+    scored, unscored = [], []
     current_nested_path = group.get("nested_path", inherited_nested_path)
 
     for condition in group.get("conditions", []):
-        clauses.append(condition_to_es(condition))
+        target = unscored if filter_context and not is_scoring_condition(condition) else scored
+        target.append(condition_to_es(condition))
 
     for subgroup in group.get("groups", []):
+        target = unscored if filter_context and not group_has_scoring(subgroup) else scored
         # If subgroup has its own nested_path, treat it as a new nested group
         if "nested_path" in subgroup:
-            clauses.append(group_to_es(subgroup, inherited_nested_path=current_nested_path))
+            target.append(group_to_es(subgroup, inherited_nested_path=current_nested_path,
+                                      filter_context=filter_context))
         else:
             # Inherit the current nested path
 
-            clauses.append(group_to_es(subgroup, inherited_nested_path=None))
+            target.append(group_to_es(subgroup, inherited_nested_path=None, filter_context=filter_context))
 
-    group_query = {"bool": {bool_key: clauses}}
+    group_query = {"bool": build_bool_clauses(bool_key, scored, unscored, filter_context)}
 
     if bool_key == "should":
         group_query["bool"]["minimum_should_match"] = 1
@@ -111,20 +147,31 @@ def group_to_es(group, inherited_nested_path=None):
     return group_query
 
 
-def build_es_query_v3(query_structure, query_aggregations=None):
+def build_es_query_v3(query_structure, query_aggregations=None, filter_context=False):
     query_body = query_structure["query"]
+    filter_context = query_structure.get("filter_context", filter_context)
     query = {
         "track_total_hits": True,
-        "query": group_to_es_V2(query_body)
+        "query": group_to_es_V2(query_body, filter_context=filter_context)
     }
 
     pagination = query_structure.get("pagination")
-    if pagination:
+    if pagination and pagination.get("pit_id"):
+        # Cursor pagination: point-in-time + search_after, no from/offset
+        query["pit"] = {
+            "id": pagination["pit_id"],
+            "keep_alive": pagination.get("keep_alive", "1m")
+        }
+        query["size"] = pagination.get("size", 10)
+        query["sort"] = build_stable_sort(query_structure.get("sort"))
+        if pagination.get("search_after"):
+            query["search_after"] = pagination["search_after"]
+            # Total is only needed on the first page
+            query["track_total_hits"] = False
+    elif pagination:
         query["from"] = pagination.get("from", 0)
         query["size"] = pagination.get("size", 10)
 
-
-
     aggs = query_aggregations.get("aggregations") if query_aggregations else None
     if aggs:
         query["aggs"] = build_es_aggregations(aggs)
@@ -136,7 +183,33 @@ def build_es_query_v3(query_structure, query_aggregations=None):
     return query
 
 
-def group_to_es_V2(group, inherited_nested_path=None):
+def build_stable_sort(sort_rules=None):
+    """
+    Sort for search_after pagination. Uses the explicit sort fields (or _score)
+    and always ends with _shard_doc so every hit has a unique sort position.
+    """
+    sort = []
+    for rule in sort_rules or []:
+        if rule.get("field"):
+            sort.append({rule["field"]: {"order": rule.get("order", "asc")}})
+    if not sort:
+        sort.append({"_score": {"order": "desc"}})
+    sort.append({"_shard_doc": {"order": "asc"}})
+    return sort
+
+
+def with_sort_tiebreaker(sort):
+    """A caller-supplied sort as a list ending with _shard_doc, so search_after never skips tied hits"""
+    if not sort:
+        return build_stable_sort()
+    sort = list(sort) if isinstance(sort, list) else [sort]
+    names = [rule if isinstance(rule, str) else next(iter(rule), None) for rule in sort]
+    if "_shard_doc" not in names:
+        sort.append({"_shard_doc": {"order": "asc"}})
+    return sort
+
+
+def group_to_es_V2(group, inherited_nested_path=None, filter_context=False):
     logic = group["operator"]
     bool_key = (
         "must" if logic == "AND" else
@@ -145,25 +218,30 @@ def group_to_es_V2(group, inherited_nested_path=None):
         "must"
     )
 
-    clauses = []
+    scored, unscored = [], []
     current_nested_path = group.get("nested_path", inherited_nested_path)
     is_has_child = group.get("has_child_type")
 
     for condition in group.get("conditions", []):
-        clauses.append(condition_to_es(condition))
+        target = unscored if filter_context and not is_scoring_condition(condition) else scored
+        target.append(condition_to_es(condition))
 
     for subgroup in group.get("groups", []):
+        target = unscored if filter_context and not group_has_scoring(subgroup) else scored
         if "nested_path" in subgroup:
             # Use new nested path from subgroup
-            clauses.append(group_to_es_V2(subgroup, inherited_nested_path=subgroup["nested_path"]))
+            target.append(group_to_es_V2(subgroup, inherited_nested_path=subgroup["nested_path"],
+                                         filter_context=filter_context))
         elif "has_child_type" in subgroup:
             # Subgroup defines a has_child block
-            clauses.append(group_to_es_V2(subgroup, inherited_nested_path=subgroup["has_child_type"]))
+            target.append(group_to_es_V2(subgroup, inherited_nested_path=subgroup["has_child_type"],
+                                         filter_context=filter_context))
         else:
             # Inherit current path (if any)
-            clauses.append(group_to_es_V2(subgroup, inherited_nested_path=current_nested_path))
+            target.append(group_to_es_V2(subgroup, inherited_nested_path=current_nested_path,
+                                         filter_context=filter_context))
 
-    group_query = {"bool": {bool_key: clauses}}
+    group_query = {"bool": build_bool_clauses(bool_key, scored, unscored, filter_context)}
     if bool_key == "should":
         group_query["bool"]["minimum_should_match"] = 1
 
@@ -192,17 +270,455 @@ def group_to_es_V2(group, inherited_nested_path=None):
     return group_query
 
 
+# ================================
+# Query tree optimizer
+# ================================
+
+BOOL_OCCURS = ("must", "filter", "should", "must_not")
+
+
+def optimize_es_query(query_body, scoring=None):
+    """
+    Simplify the bool tree produced by build_es_query_v3/group_to_es_V2 without
+    changing which documents match.
+
+    - single-clause bool wrappers are unwrapped
+    - bools of the same kind are flattened into their parent
+    - double negations are removed
+    - in non-scoring context (filter, must_not, or a body that does not sort
+      on _score) repeated term clauses on a field become one terms clause,
+      nested blocks on the same path under OR / must_not are merged, and
+      duplicate clauses are dropped
+
+    Nested blocks under AND are never merged: two nested clauses can match
+    different child documents, one nested clause would need a single child
+    matching both.
+    """
+    if "query" not in query_body:
+        return query_body
+    if scoring is None:
+        scoring = body_uses_scores(query_body)
+    optimized = dict(query_body)
+    optimized["query"] = optimize_clause(query_body["query"], scoring)
+    return optimized
+
+
+def body_uses_scores(query_body):
+    """False when hits are sorted on fields only, so scores are never read"""
+    if query_body.get("track_scores") or query_body.get("min_score") is not None or query_body.get("rescore"):
+        return True
+    sort = query_body.get("sort")
+    if not sort:
+        return True
+    for rule in sort if isinstance(sort, list) else [sort]:
+        name = rule if isinstance(rule, str) else next(iter(rule), None)
+        if name == "_score":
+            return True
+    return False
+
+
+def optimize_clause(clause, scoring=True):
+    if not isinstance(clause, dict) or len(clause) != 1:
+        return clause
+    kind, body = next(iter(clause.items()))
+    if kind in ("nested", "has_child", "has_parent") and isinstance(body, dict) and "query" in body:
+        return {kind: {**body, "query": optimize_clause(body["query"], scoring)}}
+    if kind != "bool" or not isinstance(body, dict):
+        return clause
+    return optimize_bool(body, scoring)
+
+
+def _clause_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+def _plain_bool(clause, allowed):
+    """Return the bool body if the clause is a bool using only the allowed occurs"""
+    if not isinstance(clause, dict) or set(clause) != {"bool"}:
+        return None
+    body = clause["bool"]
+    if not isinstance(body, dict):
+        return None
+    keys = set(body) - {"minimum_should_match"}
+    if not keys or not keys <= set(allowed):
+        return None
+    if "minimum_should_match" in body and ("should" not in keys or not _simple_msm(body) or not _should_required(body)):
+        return None
+    return body
+
+
+def _should_required(body):
+    """
+    True if at least one should clause must match. Lucene requires one even
+    with minimum_should_match 0 when the bool has no must/filter clause.
+    """
+    msm = body.get("minimum_should_match")
+    if msm in (1, "1"):
+        return True
+    return not body.get("must") and not body.get("filter")
+
+
+def _simple_msm(body):
+    """minimum_should_match values the optimizer can reason about"""
+    return body.get("minimum_should_match") in (None, 0, 1, "0", "1")
+
+
+def _clause_key(clause):
+    return json.dumps(clause, sort_keys=True, default=str)
+
+
+def _dedupe(clauses):
+    seen = set()
+    unique = []
+    for clause in clauses:
+        key = _clause_key(clause)
+        if key not in seen:
+            seen.add(key)
+            unique.append(clause)
+    return unique
+
+
+def _term_values(clause):
+    """(field, values) for a plain term/terms clause, else None"""
+    if not isinstance(clause, dict) or len(clause) != 1:
+        return None
+    kind, body = next(iter(clause.items()))
+    if not isinstance(body, dict) or len(body) != 1:
+        return None
+    field, value = next(iter(body.items()))
+    if kind == "term":
+        if isinstance(value, dict):
+            if set(value) != {"value"}:
+                return None
+            value = value["value"]
+        if isinstance(value, (dict, list)):
+            return None
+        return field, [value]
+    if kind == "terms" and isinstance(value, list):
+        return field, value
+    return None
+
+
+def _merge_terms(clauses):
+    """OR-combine term/terms clauses on the same field into one terms clause"""
+    by_field = {}
+    for clause in clauses:
+        term = _term_values(clause)
+        if term:
+            by_field.setdefault(term[0], []).append(term[1])
+
+    merged, emitted = [], set()
+    for clause in clauses:
+        term = _term_values(clause)
+        if not term or len(by_field[term[0]]) < 2:
+            merged.append(clause)
+            continue
+        if term[0] in emitted:
+            continue
+        emitted.add(term[0])
+        values = []
+        for group in by_field[term[0]]:
+            for value in group:
+                if value not in values:
+                    values.append(value)
+        merged.append({"terms": {term[0]: values}})
+    return merged
+
+
+def _merge_nested(clauses):
+    """OR-combine nested clauses on the same path: ∃q1 ∨ ∃q2 == ∃(q1 ∨ q2)"""
+    def path_of(clause):
+        nested = clause.get("nested") if isinstance(clause, dict) and len(clause) == 1 else None
+        if isinstance(nested, dict) and set(nested) == {"path", "query"}:
+            return nested["path"]
+        return None
+
+    by_path = {}
+    for clause in clauses:
+        path = path_of(clause)
+        if path:
+            by_path.setdefault(path, []).append(clause["nested"]["query"])
+
+    merged, emitted = [], set()
+    for clause in clauses:
+        path = path_of(clause)
+        if not path or len(by_path[path]) < 2:
+            merged.append(clause)
+            continue
+        if path in emitted:
+            continue
+        emitted.add(path)
+        inner = optimize_bool({"should": by_path[path], "minimum_should_match": 1}, scoring=False)
+        merged.append({"nested": {"path": path, "query": inner}})
+    return merged
+
+
+def optimize_bool(body, scoring=True):
+    extras = {k: v for k, v in body.items() if k not in BOOL_OCCURS}
+    orphan_msm = "minimum_should_match" in body and not _clause_list(body.get("should"))
+    if set(extras) - {"minimum_should_match"} or orphan_msm or not _simple_msm(body):
+        # boost, _name, minimum_should_match 2 or 50%, ... : only optimize the children in place
+        optimized = dict(body)
+        for occur in BOOL_OCCURS:
+            if occur in body:
+                child_scoring = scoring and occur in ("must", "should")
+                optimized[occur] = [optimize_clause(c, child_scoring) for c in _clause_list(body[occur])]
+        return {"bool": optimized}
+
+    should_required = _should_required(body)
+    must = [optimize_clause(c, scoring) for c in _clause_list(body.get("must"))]
+    should = [optimize_clause(c, scoring) for c in _clause_list(body.get("should"))]
+    filter_ = [optimize_clause(c, False) for c in _clause_list(body.get("filter"))]
+    must_not = [optimize_clause(c, False) for c in _clause_list(body.get("must_not"))]
+
+    if not scoring:
+        # Nothing is scored here, so must behaves exactly like filter and
+        # optional should clauses have no effect
+        filter_ = must + filter_
+        must = []
+        if not should_required:
+            should = []
+
+    # Flatten AND-of-AND: must/filter children that are themselves conjunctions
+    flat_must = []
+    for clause in must:
+        child = _plain_bool(clause, ("must", "filter", "must_not"))
+        if child is None:
+            flat_must.append(clause)
+            continue
+        flat_must.extend(_clause_list(child.get("must")))
+        filter_.extend(_clause_list(child.get("filter")))
+        must_not.extend(_clause_list(child.get("must_not")))
+    must = flat_must
+
+    flat_filter = []
+    for clause in filter_:
+        child = _plain_bool(clause, ("must", "filter", "must_not"))
+        if child is None:
+            flat_filter.append(clause)
+            continue
+        flat_filter.extend(_clause_list(child.get("must")) + _clause_list(child.get("filter")))
+        must_not.extend(_clause_list(child.get("must_not")))
+    filter_ = flat_filter
+
+    # NOT (a OR b) == NOT a AND NOT b; NOT NOT a == a
+    flat_must_not = []
+    for clause in must_not:
+        negated_or = _plain_bool(clause, ("should",))
+        if negated_or is not None:
+            flat_must_not.extend(_clause_list(negated_or.get("should")))
+            continue
+        double_negation = _plain_bool(clause, ("must_not",))
+        if double_negation is not None:
+            inner = _clause_list(double_negation.get("must_not"))
+            if len(inner) == 1:
+                filter_.append(inner[0])
+            else:
+                filter_.append({"bool": {"should": inner, "minimum_should_match": 1}})
+            continue
+        flat_must_not.append(clause)
+    must_not = flat_must_not
+
+    # Flatten OR-of-OR
+    if should and should_required:
+        flat_should = []
+        for clause in should:
+            child = _plain_bool(clause, ("should",))
+            if child is None:
+                flat_should.append(clause)
+            else:
+                flat_should.extend(_clause_list(child.get("should")))
+        should = flat_should
+        if not scoring:
+            should = _dedupe(_merge_terms(_merge_nested(should)))
+
+    filter_ = _dedupe(filter_)
+    must_not = _dedupe(_merge_terms(_merge_nested(must_not)))
+
+    if should and not should_required and not must and not filter_:
+        # The required clauses were all negations moved to must_not. With no
+        # required clause left Lucene would make one should clause mandatory.
+        filter_.append({"match_all": {}})
+
+    clause_count = len(must) + len(filter_) + len(should) + len(must_not)
+    if clause_count == 0:
+        return {"bool": dict(body)}
+
+    # Unwrap single-clause wrappers
+    if clause_count == 1:
+        if must:
+            return must[0]
+        if should and should_required:
+            return should[0]
+        if filter_ and not scoring:
+            return filter_[0]
+
+    optimized = {}
+    if must:
+        optimized["must"] = must
+    if filter_:
+        optimized["filter"] = filter_
+    if should:
+        optimized["should"] = should
+    if must_not:
+        optimized["must_not"] = must_not
+    if should and (should_required == bool(must or filter_) or "minimum_should_match" in body):
+        # Flattening can move clauses between occurs, so state explicitly
+        # whether should is required whenever it differs from the ES default
+        optimized["minimum_should_match"] = 1 if should_required else 0
+    return {"bool": optimized}
+
+
+# ================================
+# Query normalization and fingerprints
+# ================================
+
+# Keys whose values describe the query shape rather than user input
+STRUCTURAL_VALUE_KEYS = {
+    "field", "path", "type", "minimum_should_match", "score_mode", "format",
+    "operator", "order", "calendar_interval", "fixed_interval", "interval",
+    "keep_alive", "track_total_hits", "ignore_unmapped", "analyzer"
+}
+# Subtrees kept verbatim in the shape (field lists, sort rules)
+STRUCTURAL_SUBTREES = {"_source", "sort", "fields", "includes", "excludes"}
+PARAM_PLACEHOLDER = "?"
+
+
+def _canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _is_noop(key, value):
+    if key == "boost" and value in (1, 1.0):
+        return True
+    if key in BOOL_OCCURS and value == []:
+        return True
+    return False
+
+
+def _normalize_node(node):
+    if isinstance(node, list):
+        return [_normalize_node(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    normalized = {}
+    for key, value in node.items():
+        if _is_noop(key, value):
+            continue
+        if key == "bool" and isinstance(value, dict):
+            value = _normalize_bool(value)
+            if value is None:
+                normalized["match_all"] = {}
+                continue
+        elif key == "term" and isinstance(value, dict):
+            # {"term": {"f": "x"}} and {"term": {"f": {"value": "x"}}} are the same query
+            value = {
+                field: _normalize_node(term if isinstance(term, dict) else {"value": term})
+                for field, term in value.items()
+            }
+        elif key == "terms" and isinstance(value, dict):
+            value = {
+                field: sorted(values, key=_canonical_json) if isinstance(values, list) else _normalize_node(values)
+                for field, values in value.items()
+            }
+        else:
+            value = _normalize_node(value)
+        normalized[key] = value
+    return normalized
+
+
+def _normalize_bool(body):
+    """Sort commutative clause lists; None for a bool that matches everything"""
+    normalized = {}
+    for key, value in body.items():
+        if _is_noop(key, value):
+            continue
+        if key in BOOL_OCCURS:
+            clauses = [_normalize_node(c) for c in _clause_list(value)]
+            normalized[key] = sorted(clauses, key=_canonical_json)
+        else:
+            normalized[key] = _normalize_node(value)
+    if not any(key in normalized for key in BOOL_OCCURS) and set(normalized) <= {"boost"}:
+        return None
+    return normalized
+
+
+def normalize_es_query(query_body):
+    """
+    Canonical form of a search body from build_es_query_v3, build_es_query_v2
+    or build_logical_query: bool clause lists and terms values are sorted,
+    default no-ops (boost 1, empty occurs, from 0) are dropped and short term
+    syntax is expanded. Two bodies that differ only in those respects
+    normalize to the same dict.
+    """
+    normalized = _normalize_node(query_body)
+    if normalized.get("from") == 0:
+        del normalized["from"]
+    return normalized
+
+
+def _extract_shape(node, params, key=None):
+    if key in STRUCTURAL_SUBTREES:
+        return node
+    if isinstance(node, dict):
+        return {k: _extract_shape(v, params, k) for k, v in sorted(node.items())}
+    if isinstance(node, list) and key in BOOL_OCCURS:
+        # Re-sort by shape: literal values must not decide clause order
+        extracted = []
+        for item in node:
+            item_params = []
+            extracted.append((_extract_shape(item, item_params), item_params))
+        extracted.sort(key=lambda pair: _canonical_json(pair[0]))
+        for _, item_params in extracted:
+            params.extend(item_params)
+        return [shape for shape, _ in extracted]
+    if isinstance(node, list):
+        if node and all(not isinstance(item, (dict, list)) for item in node):
+            # A literal list (terms values, search_after) is one parameter
+            params.append(node)
+            return [PARAM_PLACEHOLDER]
+        return [_extract_shape(item, params) for item in node]
+    if key in STRUCTURAL_VALUE_KEYS:
+        return node
+    params.append(node)
+    return PARAM_PLACEHOLDER
+
+
+def query_fingerprint(query_body):
+    """
+    Identity of a search body.
+
+    query_hash changes with any semantic difference, including literal values;
+    shape_hash only with the structure, so "status = A" and "status = B"
+    share a shape. params holds the literals in canonical traversal order.
+    """
+    normalized = normalize_es_query(query_body)
+    params = []
+    shape = _extract_shape(normalized, params)
+    return {
+        "query_hash": hashlib.sha256(_canonical_json(normalized).encode("utf-8")).hexdigest(),
+        "shape_hash": hashlib.sha256(_canonical_json(shape).encode("utf-8")).hexdigest(),
+        "normalized": normalized,
+        "shape": shape,
+        "params": params
+    }
+
+
 
 
-def build_es_query_v2(query_structure):
+def build_es_query_v2(query_structure, filter_context=False):
     if "query" not in query_structure:
         raise ValueError("Missing 'query' key in top-level query structure")
 
     query_body = query_structure["query"]
+    filter_context = query_structure.get("filter_context", filter_context)
 
     query = {
         "track_total_hits": True,
-        "query": group_to_es(query_body)
+        "query": group_to_es(query_body, filter_context=filter_context)
     }
 
     pagination = query_body.get("pagination")
@@ -302,3 +818,29 @@ def build_es_aggregations(aggs_list):
     return es_aggs
 
 
+
+
+def wrap_values_aggregation(field, values_agg, match_query):
+    """
+    Wrap a "values" aggregation in nested/filter aggregations as needed so only
+    matching (nested) values are counted. Returns (search body, agg path).
+    """
+    body = {"size": 0}
+    aggs = {"values": values_agg}
+    agg_path = ["values"]
+
+    # A composite aggregation only accepts nested parents, so it is not put under
+    # the filter; the query still limits it to documents with a matching value
+    # and callers drop the other values of those documents.
+    if match_query and field["nested_path"] and "composite" not in values_agg:
+        aggs = {"matching": {"filter": match_query, "aggs": aggs}}
+        agg_path.insert(0, "matching")
+    if field["nested_path"]:
+        aggs = {"nested_values": {"nested": {"path": field["nested_path"]}, "aggs": aggs}}
+        agg_path.insert(0, "nested_values")
+
+    if match_query:
+        body["query"] = {"nested": {"path": field["nested_path"], "query": match_query}} \
+            if field["nested_path"] else match_query
+    body["aggs"] = aggs
+    return body, agg_path
@@ -107,7 +107,8 @@ class OracleElasticsearchMapper:
         return converted_data
 
     def bulk_index(self, oracle_data: List[Dict[str, Any]], index_name: str,
-                   doc_id_field: Optional[str] = None, chunk_size: int = 1000) -> Dict[str, Any]:
+                   doc_id_field: Optional[str] = None, chunk_size: int = 1000,
+                   refresh: bool = True) -> Dict[str, Any]:
         """
         Convert Oracle data and perform bulk indexing to Elasticsearch.
 
@@ -116,6 +117,8 @@ class OracleElasticsearchMapper:
             index_name: Target Elasticsearch index name
             doc_id_field: Oracle field to use as document ID (optional)
             chunk_size: Number of documents per bulk request
+            refresh: Refresh after each bulk request (disable for large loads
+                that refresh once at the end)
 
         Returns:
             Dictionary with mapping results and bulk operation status
@@ -130,7 +133,7 @@ class OracleElasticsearchMapper:
         actions = self._prepare_bulk_actions(converted_data, index_name, doc_id_field)
 
         # Execute bulk operation
-        bulk_result = self._execute_bulk_operation(actions, chunk_size)
+        bulk_result = self._execute_bulk_operation(actions, chunk_size, refresh)
 
         return {
             'column_mapping': self.column_mapping,
@@ -286,10 +289,13 @@ class OracleElasticsearchMapper:
         type_converters = {
             'integer': lambda x: int(x) if x is not None else None,
             'long': lambda x: int(x) if x is not None else None,
+            'short': lambda x: int(x) if x is not None else None,
             'float': lambda x: float(x) if x is not None else None,
             'double': lambda x: float(x) if x is not None else None,
+            'scaled_float': lambda x: float(x) if x is not None else None,
             'boolean': lambda x: bool(x) if x is not None else None,
             'date': lambda x: x.isoformat() if hasattr(x, 'isoformat') else str(x),
+            'date_nanos': lambda x: x.isoformat() if hasattr(x, 'isoformat') else str(x),
             'text': lambda x: str(x) if x is not None else None,
             'keyword': lambda x: str(x) if x is not None else None
         }
@@ -341,7 +347,8 @@ class OracleElasticsearchMapper:
 
         return actions
 
-    def _execute_bulk_operation(self, actions: List[Dict[str, Any]], chunk_size: int = 1000) -> Dict[str, Any]:
+    def _execute_bulk_operation(self, actions: List[Dict[str, Any]], chunk_size: int = 1000,
+                                refresh: bool = True) -> Dict[str, Any]:
         """Execute bulk operation with error handling and chunking."""
         try:
             self.logger.info(f"Executing bulk operation with {len(actions)} documents")
@@ -350,7 +357,7 @@ class OracleElasticsearchMapper:
                 self.es_client,
                 actions,
                 chunk_size=chunk_size,
-                refresh=True,
+                refresh=refresh,
                 request_timeout=300
             )
 
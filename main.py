@@ -1,9 +1,20 @@
 from fastapi import FastAPI, Request, Form, HTTPException, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import sqlite3
 import json
+import hashlib
+import base64
+import math
+import copy
+import time
+import threading
+import fnmatch
+import csv
+import io
+import queue
+from collections import OrderedDict, deque
 from datetime import datetime
 import requests
 import asyncio
@@ -16,7 +27,8 @@ import os
 import re
 import logging
 from contextlib import contextmanager
-from builder import build_es_query_v3, build_es_query_v2
+from builder import build_es_query_v3, build_es_query_v2, with_sort_tiebreaker, optimize_es_query, \
+    query_fingerprint, wrap_values_aggregation
 import re
 import json
 import logging
@@ -59,6 +71,7 @@ class FormConfiguration(BaseModel):
     environment: int
     index: str
     fields: Dict[str, Any]
+    query_options: Dict[str, Any] = {}
     created_at: Optional[str] = None
 
 # Database models
@@ -68,6 +81,7 @@ class ElasticsearchEnvironment(BaseModel):
     host_url: str
     username: Optional[str] = None
     password: Optional[str] = None
+    bulk_concurrency: Optional[int] = None
 
 class OracleEnvironment(BaseModel):
     id: Optional[int] = None
@@ -203,10 +217,80 @@ def init_db():
                                                                       environment INTEGER NOT NULL,
                                                                       index_name TEXT NOT NULL,
                                                                       fields_json TEXT NOT NULL,
+                                                                      query_options_json TEXT,
                                                                       created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                                                                       FOREIGN KEY (environment) REFERENCES elasticsearch_environments (id)
                        )
                    ''')
+
+    # Form submission analytics, written in batches by submission_log_writer
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS form_submissions (
+                                                                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                                   form_url TEXT NOT NULL,
+                                                                   fields_data TEXT NOT NULL,
+                                                                   result_count INTEGER,
+                                                                   response_time INTEGER,
+                                                                   user_agent TEXT,
+                                                                   ip_address TEXT,
+                                                                   stage_timings TEXT,
+                                                                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+    cursor.execute("PRAGMA table_info(form_submissions)")
+    if 'stage_timings' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE form_submissions ADD COLUMN stage_timings TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_form_submissions_form ON form_submissions (form_url, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_form_submissions_created ON form_submissions (created_at)")
+
+    # Submissions slower than SLOW_QUERY_THRESHOLD_MS, with the normalized query
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS slow_queries (
+                                                               id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                               form_url TEXT NOT NULL,
+                                                               index_name TEXT,
+                                                               query_hash TEXT NOT NULL,
+                                                               shape_hash TEXT NOT NULL,
+                                                               normalized_query TEXT NOT NULL,
+                                                               stage_timings TEXT,
+                                                               total_ms REAL,
+                                                               took_ms INTEGER,
+                                                               result_count INTEGER,
+                                                               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                   )
+                   ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_slow_queries_form ON slow_queries (form_url, created_at)")
+
+    # Reindex tasks submitted with wait_for_completion=false, polled via _tasks
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS reindex_tasks (
+                                                               id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                                               env_id INTEGER NOT NULL,
+                                                               task_id TEXT NOT NULL,
+                                                               source_index TEXT NOT NULL,
+                                                               dest_index TEXT NOT NULL,
+                                                               status TEXT NOT NULL DEFAULT 'running',
+                                                               requests_per_second REAL,
+                                                               progress_json TEXT,
+                                                               error TEXT,
+                                                               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                                               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                                               completed_at TIMESTAMP,
+                                                               UNIQUE (env_id, task_id)
+                   )
+                   ''')
+
+    # Add query options column to databases created before it existed
+    cursor.execute("PRAGMA table_info(form_configurations)")
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'query_options_json' not in columns:
+        cursor.execute("ALTER TABLE form_configurations ADD COLUMN query_options_json TEXT")
+
+    # Per-cluster limit of concurrent bulk operation requests (NULL: BULK_OPERATION_CONCURRENCY)
+    cursor.execute("PRAGMA table_info(elasticsearch_environments)")
+    if 'bulk_concurrency' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE elasticsearch_environments ADD COLUMN bulk_concurrency INTEGER")
+
     conn.commit()
     conn.close()
 
@@ -218,15 +302,15 @@ def save_form_configuration(form_config: FormConfiguration):
 
         if form_config.id:
             cursor.execute(
-                "UPDATE form_configurations SET name=?, url=?, environment=?, index_name=?, fields_json=? WHERE id=?",
+                "UPDATE form_configurations SET name=?, url=?, environment=?, index_name=?, fields_json=?, query_options_json=? WHERE id=?",
                 (form_config.name, form_config.url, form_config.environment, form_config.index,
-                 json.dumps(form_config.fields), form_config.id)
+                 json.dumps(form_config.fields), json.dumps(form_config.query_options), form_config.id)
             )
         else:
             cursor.execute(
-                "INSERT INTO form_configurations (name, url, environment, index_name, fields_json) VALUES (?, ?, ?, ?, ?)",
+                "INSERT INTO form_configurations (name, url, environment, index_name, fields_json, query_options_json) VALUES (?, ?, ?, ?, ?, ?)",
                 (form_config.name, form_config.url, form_config.environment, form_config.index,
-                 json.dumps(form_config.fields))
+                 json.dumps(form_config.fields), json.dumps(form_config.query_options))
             )
 
         conn.commit()
@@ -260,6 +344,7 @@ def get_form_configuration_by_url(url: str):
         if result:
             form_data = dict(result)
             form_data['fields'] = json.loads(form_data['fields_json'])
+            form_data['query_options'] = json.loads(form_data.get('query_options_json') or '{}')
             return form_data
         return None
 
@@ -519,6 +604,7 @@ def create_elasticsearch_index(host_url: str, index_name: str, mapping: dict, us
         )
 
         if response.status_code in [200, 201]:
+            mapping_cache.invalidate(host_url, index_name)
             return {
                 "success": True,
                 "message": f"Index '{index_name}' created successfully",
@@ -562,6 +648,7 @@ def create_elasticsearch_index_v2(host_url: str, index_name: str, mapping: dict,
         )
 
         if response.status_code in [200, 201]:
+            mapping_cache.invalidate(host_url, index_name)
             return {
                 "success": True,
                 "message": f"Index '{index_name}' created successfully",
@@ -1034,6 +1121,7 @@ async def oracle_data_load(
         print("\n" + mapper.get_mapping_report())
 
         result = mapper.bulk_index(records, index)
+        invalidate_index_caches(elastic_env_id, index)
         print("\nBulk Index Result:")
         print(json.dumps(result, indent=2))
 
@@ -1069,6 +1157,615 @@ def extract_columns_by_table(schema):
     return tables
 
 
+# ================================
+# Blue/green index versions behind a read alias
+# ================================
+
+BLUE_GREEN_KEEP_VERSIONS = int(os.getenv("BLUE_GREEN_KEEP_VERSIONS", "2"))
+BLUE_GREEN_FETCH_SIZE = int(os.getenv("BLUE_GREEN_FETCH_SIZE", "5000"))
+# Smallest new/live document ratio accepted before swapping (guards against truncated loads)
+BLUE_GREEN_MIN_DOC_RATIO = float(os.getenv("BLUE_GREEN_MIN_DOC_RATIO", "0.9"))
+# Settings while a version is loading; replicas and refresh are restored before validation
+BLUE_GREEN_LOAD_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0}
+
+
+class BlueGreenRolloutRequest(BaseModel):
+    oracle_env_id: int
+    query: Optional[str] = None
+    mapping: Optional[Dict[str, Any]] = None
+    doc_id_field: Optional[str] = None
+    number_of_replicas: int = 1
+    refresh_interval: str = "1s"
+    min_doc_ratio: Optional[float] = None
+    keep_versions: Optional[int] = None
+    replace_concrete_index: bool = False
+
+
+class AliasSwapRequest(BaseModel):
+    index: str
+    replace_concrete_index: bool = False
+
+
+def index_version_name(alias: str) -> str:
+    """New version name for an alias, e.g. customers_v20260101120000"""
+    return f"{alias}_v{datetime.now().strftime('%Y%m%d%H%M%S')}"
+
+
+def get_alias_state(host_url: str, auth: Optional[tuple], alias: str) -> Dict[str, Any]:
+    """Indices currently behind the alias, existing versions (oldest first) and whether alias is a concrete index"""
+    alias_response = requests.get(f"{host_url}/_alias/{alias}", auth=auth, timeout=10, verify=False)
+    live = sorted(alias_response.json().keys()) if alias_response.status_code == 200 else []
+
+    versions_response = requests.get(
+        f"{host_url}/_cat/indices/{alias}_v*",
+        params={"format": "json", "h": "index,docs.count,health,creation.date", "s": "index"},
+        auth=auth,
+        timeout=10,
+        verify=False
+    )
+    # The pattern also matches e.g. customers_vip; keep only real versions
+    version_pattern = re.compile(rf"^{re.escape(alias)}_v\d{{14}}$")
+    versions = [v for v in (versions_response.json() if versions_response.status_code == 200 else [])
+                if version_pattern.match(v["index"])]
+
+    # Versions still on the load settings never finished loading (or are loading now)
+    settings_response = requests.get(
+        f"{host_url}/{alias}_v*/_settings/index.refresh_interval",
+        params={"flat_settings": "true"},
+        auth=auth,
+        timeout=10,
+        verify=False
+    )
+    index_settings = settings_response.json() if settings_response.status_code == 200 else {}
+
+    concrete = False
+    if not live:
+        concrete = requests.head(f"{host_url}/{alias}", auth=auth, timeout=10, verify=False).status_code == 200
+
+    return {
+        "alias": alias,
+        "live": live,
+        "versions": [{
+            "index": v["index"],
+            "docs": int(v.get("docs.count") or 0),
+            "health": v.get("health"),
+            "live": v["index"] in live,
+            "loading": index_settings.get(v["index"], {}).get("settings", {}).get("index.refresh_interval") == "-1"
+        } for v in versions],
+        "concrete_index": concrete
+    }
+
+
+def create_index_version(host_url: str, auth: Optional[tuple], index_name: str, mapping: Dict[str, Any]):
+    """Create a version index with the load settings (no refresh, no replicas)"""
+    if "mappings" in mapping:
+        mapping = mapping["mappings"]
+    response = requests.put(
+        f"{host_url}/{index_name}",
+        json={"settings": {"index": BLUE_GREEN_LOAD_SETTINGS}, "mappings": mapping},
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code not in (200, 201):
+        raise Exception(f"Failed to create {index_name}: {response.text}")
+
+
+def finish_index_version(host_url: str, auth: Optional[tuple], index_name: str,
+                         number_of_replicas: int, refresh_interval: str):
+    """Restore serving settings after a load and make all documents visible"""
+    response = requests.put(
+        f"{host_url}/{index_name}/_settings",
+        json={"index": {"refresh_interval": refresh_interval, "number_of_replicas": number_of_replicas}},
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to restore settings on {index_name}: {response.text}")
+    requests.post(f"{host_url}/{index_name}/_refresh", auth=auth, timeout=300, verify=False).raise_for_status()
+
+
+def discard_index_version(host_url: str, auth: Optional[tuple], index_name: str):
+    """Delete a version whose rollout failed so it is never kept as a rollback target"""
+    try:
+        requests.delete(f"{host_url}/{index_name}", auth=auth, timeout=60, verify=False)
+    except Exception as e:
+        logger.warning(f"Could not delete failed version {index_name}: {e}")
+
+
+def count_index_docs(host_url: str, auth: Optional[tuple], target: str) -> int:
+    response = requests.get(f"{host_url}/{target}/_count", auth=auth, timeout=30, verify=False)
+    if response.status_code != 200:
+        raise Exception(f"Failed to count {target}: {response.text}")
+    return response.json().get("count", 0)
+
+
+def validate_index_version(host_url: str, auth: Optional[tuple], index_name: str, expected_docs: int,
+                           live_docs: Optional[int], min_doc_ratio: float, failed: int = 0,
+                           ids_from_rows: bool = False) -> Dict[str, Any]:
+    """
+    Doc count of the new version against what was loaded and what is live now.
+    With ids taken from a row column, rows sharing an id overwrite each other,
+    so fewer documents than indexed rows is valid when nothing failed; the
+    difference is reported as collapsed_rows.
+    """
+    docs = count_index_docs(host_url, auth, index_name)
+    errors = []
+    collapsed_rows = 0
+    if docs < expected_docs and ids_from_rows and not failed:
+        collapsed_rows = expected_docs - docs
+    elif docs != expected_docs:
+        errors.append(f"{index_name} has {docs} documents, {expected_docs} were loaded")
+    if failed:
+        errors.append(f"{failed} rows failed to convert or index")
+    if live_docs and docs < live_docs * min_doc_ratio:
+        errors.append(f"{index_name} has {docs} documents, less than {min_doc_ratio:.0%} of the {live_docs} live ones")
+    return {"valid": not errors, "docs": docs, "expected_docs": expected_docs, "collapsed_rows": collapsed_rows,
+            "live_docs": live_docs, "errors": errors}
+
+
+def swap_alias(host_url: str, auth: Optional[tuple], alias: str, index_name: str,
+               replace_concrete_index: bool = False) -> List[Dict[str, Any]]:
+    """Point the alias at index_name only, in one atomic _aliases call"""
+    state = get_alias_state(host_url, auth, alias)
+    actions: List[Dict[str, Any]] = []
+    if state["concrete_index"]:
+        if not replace_concrete_index:
+            raise ValueError(f"'{alias}' is a concrete index; set replace_concrete_index to replace it with the alias")
+        # Deletes the old index in the same atomic step that creates the alias
+        actions.append({"remove_index": {"index": alias}})
+    actions.extend({"remove": {"index": live, "alias": alias}} for live in state["live"] if live != index_name)
+    actions.append({"add": {"index": index_name, "alias": alias, "is_write_index": True}})
+
+    response = requests.post(
+        f"{host_url}/_aliases",
+        json={"actions": actions},
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Alias swap failed: {response.text}")
+    return actions
+
+
+def collect_index_versions(host_url: str, auth: Optional[tuple], alias: str, keep: int,
+                           preserve: Optional[List[str]] = None) -> List[str]:
+    """
+    Delete versions the alias does not point at beyond `keep` in total. Idle
+    versions worth keeping as rollback targets come first: `preserve` (the
+    previously live ones), then finished versions newest first; versions left
+    on the load settings go first.
+    """
+    state = get_alias_state(host_url, auth, alias)
+    preserve = set(preserve or [])
+    idle = [v for v in reversed(state["versions"]) if not v["live"]]
+    idle.sort(key=lambda v: (v["index"] not in preserve, v["loading"]))
+    keep_idle = max(0, keep - len(state["live"]))
+    doomed = [v["index"] for v in idle[keep_idle:]]
+    for names in chunk_index_names(doomed):
+        response = requests.delete(f"{host_url}/{','.join(names)}", auth=auth, timeout=60, verify=False)
+        if response.status_code != 200:
+            raise Exception(f"Failed to delete old versions: {response.text}")
+    return doomed
+
+
+def repoint_form_configs(environment: int, alias: str, version_indices: List[str]) -> int:
+    """Forms configured against a version index search the alias instead"""
+    if not version_indices:
+        return 0
+    placeholders = ",".join("?" for _ in version_indices)
+    with get_db() as conn:
+        cursor = conn.execute(
+            f"UPDATE form_configurations SET index_name = ? WHERE environment = ? AND index_name IN ({placeholders})",
+            [alias, environment, *version_indices]
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+def get_active_workflow_mapping(index_name: str) -> Optional[Dict[str, Any]]:
+    with sqlite3.connect("workflow_mappings.db") as sconn:
+        sconn.row_factory = sqlite3.Row
+        row = sconn.execute(
+            """SELECT elasticsearch_mapping, table_structures, oracle_query FROM workflow_mappings
+               WHERE index_name = ? AND status = 'active' ORDER BY updated_at DESC LIMIT 1""",
+            (index_name,)
+        ).fetchone()
+    if not row:
+        return None
+    return {
+        "elasticsearch_mapping": _json_load_maybe(row["elasticsearch_mapping"]),
+        "table_structures": _json_load_maybe(row["table_structures"]),
+        "oracle_query": row["oracle_query"]
+    }
+
+
+def load_oracle_into_index(oracle_env: Dict[str, Any], es_env: Dict[str, Any], query: str, index_name: str,
+                           mapping: Dict[str, Any], table_structures: Optional[Dict[str, Any]],
+                           doc_id_field: Optional[str] = None) -> Dict[str, Any]:
+    """Stream every row of the query into index_name in batches, without per-batch refreshes"""
+    es_client = Elasticsearch(
+        es_env["host_url"],
+        basic_auth=(es_env.get("username"), es_env.get("password")) if es_env.get("username") else None,
+        verify_certs=False,
+        ssl_show_warn=False,
+        request_timeout=300
+    )
+    mapper = OracleElasticsearchMapper(es_client)
+    rows = indexed = failed = 0
+
+    with oracledb.connect(user=oracle_env["username"], password=oracle_env["password"], dsn=oracle_env["url"]) as connection:
+        cursor = connection.cursor()
+        cursor.arraysize = BLUE_GREEN_FETCH_SIZE
+        cursor.execute(query)
+        columns = [c[0] for c in cursor.description]
+        mapper.analyze_mapping(extract_all_column_names(table_structures) if table_structures else columns, mapping)
+
+        while True:
+            batch = cursor.fetchmany(BLUE_GREEN_FETCH_SIZE)
+            if not batch:
+                break
+            rows += len(batch)
+            result = mapper.bulk_index([dict(zip(columns, row)) for row in batch], index_name,
+                                       doc_id_field=doc_id_field, refresh=False)
+            bulk_result = result.get("bulk_result", result)
+            if not bulk_result.get("success"):
+                raise Exception(f"Bulk load into {index_name} failed: {bulk_result.get('error')}")
+            indexed += bulk_result.get("success_count", 0)
+            failed += bulk_result.get("failed_count", 0) + len(batch) - result.get("converted_records", len(batch))
+
+    return {"rows": rows, "indexed": indexed, "failed": failed}
+
+
+@app.get("/api/blue-green/{env_id}/{alias}")
+async def get_blue_green_state(env_id: int, alias: str):
+    """Versions of an alias and which one is live"""
+    try:
+        host_url, auth = get_environment_target(env_id)
+        return {"success": True, **get_alias_state(host_url, auth, alias)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/blue-green/{env_id}/{alias}/rollout")
+async def rollout_index_version(env_id: int, alias: str, rollout: BlueGreenRolloutRequest):
+    """
+    Build a new version of an index behind its read alias: create it from the
+    mapping, load it from Oracle, validate doc counts, swap the alias in one
+    _aliases call and delete old versions. Searches keep hitting the previous
+    version until the swap.
+    """
+    result = await asyncio.to_thread(run_index_rollout, env_id, alias, rollout)
+    if result.get("swapped"):
+        # On the event loop: the in-process caches are not thread-safe
+        invalidate_index_caches(env_id, [alias, *result.get("deleted_versions", [])])
+    return result
+
+
+def run_index_rollout(env_id: int, alias: str, rollout: BlueGreenRolloutRequest) -> Dict[str, Any]:
+    """Blocking part of rollout_index_version; the caller invalidates caches after a swap"""
+    version_index = None
+    swapped = False
+    try:
+        host_url, auth = get_environment_target(env_id)
+        es_env = next(e for e in get_elasticsearch_environments() if e['id'] == env_id)
+        oracle_env = next((e for e in get_oracle_environments() if e['id'] == rollout.oracle_env_id), None)
+        if not oracle_env:
+            raise ValueError("Oracle environment not found")
+
+        workflow = get_active_workflow_mapping(alias) or {}
+        mapping = rollout.mapping or workflow.get("elasticsearch_mapping")
+        query = rollout.query or workflow.get("oracle_query")
+        if not mapping or not query:
+            raise ValueError(f"No mapping/query given and no active workflow mapping for '{alias}'")
+
+        state = get_alias_state(host_url, auth, alias)
+        if state["concrete_index"] and not rollout.replace_concrete_index:
+            raise ValueError(f"'{alias}' is a concrete index; set replace_concrete_index to replace it with the alias")
+        live_docs = count_index_docs(host_url, auth, alias) if state["live"] or state["concrete_index"] else None
+
+        version_index = index_version_name(alias)
+        create_index_version(host_url, auth, version_index, mapping)
+        load = load_oracle_into_index(oracle_env, es_env, query, version_index, mapping,
+                                      workflow.get("table_structures"), rollout.doc_id_field)
+        finish_index_version(host_url, auth, version_index, rollout.number_of_replicas, rollout.refresh_interval)
+
+        validation = validate_index_version(
+            host_url, auth, version_index, load["indexed"], live_docs,
+            BLUE_GREEN_MIN_DOC_RATIO if rollout.min_doc_ratio is None else rollout.min_doc_ratio,
+            failed=load["failed"], ids_from_rows=bool(rollout.doc_id_field)
+        )
+        if not validation["valid"]:
+            discard_index_version(host_url, auth, version_index)
+            return {
+                "success": False,
+                "error": "Validation failed; the alias was not changed and the new version was deleted",
+                "index": version_index,
+                "load": load,
+                "validation": validation
+            }
+
+        actions = swap_alias(host_url, auth, alias, version_index, rollout.replace_concrete_index)
+        swapped = True
+
+        # The new version is live; cleanup problems are reported, not turned into a failure
+        repointed, deleted, cleanup_error = 0, [], None
+        try:
+            repointed = repoint_form_configs(env_id, alias, [v["index"] for v in state["versions"]])
+            deleted = collect_index_versions(
+                host_url, auth, alias,
+                BLUE_GREEN_KEEP_VERSIONS if rollout.keep_versions is None else rollout.keep_versions,
+                preserve=state["live"]
+            )
+        except Exception as e:
+            cleanup_error = str(e)
+
+        return {
+            "success": True,
+            "swapped": True,
+            "alias": alias,
+            "index": version_index,
+            "previous": state["live"],
+            "load": load,
+            "validation": validation,
+            "alias_actions": actions,
+            "forms_repointed": repointed,
+            "deleted_versions": deleted,
+            "cleanup_error": cleanup_error
+        }
+    except Exception as e:
+        if version_index and not swapped:
+            discard_index_version(host_url, auth, version_index)
+        return {"success": False, "swapped": swapped, "error": str(e), "index": version_index}
+
+
+@app.post("/api/blue-green/{env_id}/{alias}/swap")
+async def swap_index_alias(env_id: int, alias: str, swap: AliasSwapRequest):
+    """Point the alias at an existing version (e.g. roll back to the previous one)"""
+    try:
+        host_url, auth = get_environment_target(env_id)
+        actions = swap_alias(host_url, auth, alias, swap.index, swap.replace_concrete_index)
+        invalidate_index_caches(env_id, alias)
+        return {"success": True, "alias": alias, "index": swap.index, "alias_actions": actions}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/blue-green/{env_id}/{alias}/gc")
+async def collect_old_index_versions(env_id: int, alias: str, keep: Optional[int] = None):
+    """Delete old versions of an alias, keeping the newest ones"""
+    try:
+        host_url, auth = get_environment_target(env_id)
+        deleted = collect_index_versions(host_url, auth, alias, BLUE_GREEN_KEEP_VERSIONS if keep is None else keep)
+        invalidate_index_caches(env_id, deleted)
+        return {"success": True, "deleted_versions": deleted}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+# ================================
+# Mapping diff and in-place updates
+# ================================
+
+# Field parameters PUT _mapping accepts on an existing field; any other difference needs a reindex
+UPDATABLE_FIELD_PARAMS = {
+    "ignore_above", "ignore_malformed", "search_analyzer", "search_quote_analyzer",
+    "meta", "eager_global_ordinals", "dynamic", "boost"
+}
+STRUCTURAL_FIELD_PARAMS = {"type", "properties", "fields"}
+
+
+class MappingDiffApplyRequest(BaseModel):
+    mapping_id: Optional[int] = None
+    mapping: Optional[Dict[str, Any]] = None
+    oracle_env_id: Optional[int] = None  # reindex through a blue/green rollout when the diff is breaking
+    # Workflow indices start as concrete indices; the first rollout replaces one with an alias of the same name
+    replace_concrete_index: bool = False
+
+
+def mapping_properties(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    if "mappings" in mapping:
+        mapping = mapping["mappings"]
+    return mapping.get("properties", {})
+
+
+def diff_field(path: str, stored: Dict[str, Any], live: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Changes needed to turn one live field definition into the stored one"""
+    stored_type, live_type = stored.get("type", "object"), live.get("type", "object")
+    if stored_type != live_type:
+        return [{"path": path, "change": "modify", "kind": "breaking", "from": live_type, "to": stored_type,
+                 "reason": f"type change {live_type} -> {stored_type} needs a reindex"}]
+
+    changes = []
+    for param in sorted((set(stored) | set(live)) - STRUCTURAL_FIELD_PARAMS):
+        if stored.get(param) == live.get(param):
+            continue
+        if param in UPDATABLE_FIELD_PARAMS:
+            kind, reason = "compatible", f"{param} can be updated in place"
+        elif param == "fielddata" and stored.get(param):
+            kind, reason = "compatible", "fielddata can be enabled in place"
+        else:
+            kind, reason = "breaking", f"{param} cannot change on an existing field"
+        changes.append({"path": path, "change": "modify", "kind": kind,
+                        "from": live.get(param), "to": stored.get(param), "param": param, "reason": reason})
+
+    changes.extend(diff_properties(stored.get("properties", {}), live.get("properties", {}), path))
+    changes.extend(diff_properties(stored.get("fields", {}), live.get("fields", {}), path, multi_field=True))
+    return changes
+
+
+def diff_properties(stored: Dict[str, Any], live: Dict[str, Any], prefix: str = "",
+                    multi_field: bool = False) -> List[Dict[str, Any]]:
+    """
+    Classify every difference between two property trees:
+    additive (new field, PUT _mapping), compatible (updatable parameter, or a
+    field only the live index has, which is left alone) and breaking (reindex).
+    """
+    changes = []
+    for name in sorted(set(stored) | set(live)):
+        path = f"{prefix}.{name}" if prefix else name
+        if name not in live:
+            changes.append({"path": path, "change": "add", "kind": "additive",
+                            "to": stored[name].get("type", "object"),
+                            "reason": "new multi-field" if multi_field else "new field"})
+        elif name not in stored:
+            changes.append({"path": path, "change": "remove", "kind": "compatible",
+                            "from": live[name].get("type", "object"),
+                            "reason": "mappings cannot drop fields; it stays in the live index unused"})
+        else:
+            changes.extend(diff_field(path, stored[name], live[name]))
+    return changes
+
+
+def property_chain(properties: Dict[str, Any], path: str) -> List[str]:
+    """Property names leading to a change; a multi-field path stops at its owning field"""
+    chain = []
+    for part in path.split("."):
+        if part not in properties:
+            break
+        chain.append(part)
+        properties = properties[part].get("properties", {})
+    return chain
+
+
+def build_mapping_update(stored_properties: Dict[str, Any], changes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    PUT _mapping body for the additive and compatible changes. Each changed
+    field is sent with its full stored definition, under its parent objects.
+    """
+    update: Dict[str, Any] = {}
+    for change in changes:
+        if change["kind"] == "breaking" or change["change"] == "remove":
+            continue
+        *parents, field = property_chain(stored_properties, change["path"])
+        source, target = stored_properties, update
+        for part in parents:
+            definition = source[part]
+            container = target.setdefault(part, {k: v for k, v in definition.items() if k != "properties"})
+            target = container.setdefault("properties", {})
+            source = definition["properties"]
+        target[field] = copy.deepcopy(source[field])
+    return {"properties": update}
+
+
+def plan_mapping_update(stored_mapping: Dict[str, Any], live_properties: Dict[str, Any]) -> Dict[str, Any]:
+    """Diff plus the action it needs: none, put_mapping (in place) or reindex"""
+    stored_properties = mapping_properties(stored_mapping)
+    changes = diff_properties(stored_properties, live_properties)
+    counts = {kind: sum(1 for c in changes if c["kind"] == kind) for kind in ("additive", "compatible", "breaking")}
+    update = build_mapping_update(stored_properties, changes)
+    if counts["breaking"]:
+        action = "reindex"
+    elif update["properties"]:
+        action = "put_mapping"
+    else:
+        action = "none"
+    return {
+        "action": action,
+        "counts": counts,
+        "changes": changes,
+        "put_mapping": update if update["properties"] else None
+    }
+
+
+def get_workflow_mapping_by_id(mapping_id: int) -> Optional[Dict[str, Any]]:
+    with sqlite3.connect("workflow_mappings.db") as sconn:
+        row = sconn.execute(
+            "SELECT elasticsearch_mapping FROM workflow_mappings WHERE id = ? AND status = 'active'",
+            (mapping_id,)
+        ).fetchone()
+    return _json_load_maybe(row[0]) if row else None
+
+
+def resolve_stored_mapping(index_name: str, mapping_id: Optional[int] = None,
+                           mapping: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    if mapping:
+        return mapping
+    if mapping_id is not None:
+        stored = get_workflow_mapping_by_id(mapping_id)
+    else:
+        stored = (get_active_workflow_mapping(index_name) or {}).get("elasticsearch_mapping")
+    if not stored:
+        raise ValueError(f"No active workflow mapping for '{index_name}'")
+    return stored
+
+
+def put_index_mapping(host_url: str, auth: Optional[tuple], index_name: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    response = requests.put(
+        f"{host_url}/{index_name}/_mapping",
+        json=body,
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"PUT _mapping on {index_name} failed: {response.text}")
+    mapping_cache.invalidate(host_url, index_name)
+    return response.json()
+
+
+def fetch_live_properties(host_url: str, auth: Optional[tuple], index_name: str) -> Optional[Dict[str, Any]]:
+    """Live mapping properties of an index or alias; None only when it does not exist"""
+    response = requests.head(f"{host_url}/{index_name}", auth=auth, timeout=10, verify=False)
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        raise Exception(f"Could not check index {index_name}: HTTP {response.status_code}")
+    return mapping_cache.get(host_url, auth, index_name)["properties"]
+
+
+@app.get("/api/mapping-diff/{env_id}/{index_name}")
+async def get_mapping_diff(env_id: int, index_name: str, mapping_id: Optional[int] = None):
+    """Compare the stored workflow mapping with the live index and plan the update"""
+    try:
+        host_url, auth = get_environment_target(env_id)
+        stored = resolve_stored_mapping(index_name, mapping_id)
+        live = await asyncio.to_thread(fetch_live_properties, host_url, auth, index_name)
+        if live is None:
+            raise ValueError(f"Index '{index_name}' not found")
+        return {"success": True, "index": index_name, **plan_mapping_update(stored, live)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/mapping-diff/{env_id}/{index_name}/apply")
+async def apply_mapping_diff(env_id: int, index_name: str, request: MappingDiffApplyRequest):
+    """
+    Apply additive and compatible changes with PUT _mapping. A breaking diff
+    is only reindexed (blue/green rollout from Oracle) when oracle_env_id is
+    given; replace_concrete_index lets the rollout replace a concrete index
+    with an alias of the same name.
+    """
+    try:
+        host_url, auth = get_environment_target(env_id)
+        stored = resolve_stored_mapping(index_name, request.mapping_id, request.mapping)
+        live = await asyncio.to_thread(fetch_live_properties, host_url, auth, index_name)
+        if live is None:
+            raise ValueError(f"Index '{index_name}' not found")
+        plan = plan_mapping_update(stored, live)
+
+        if plan["action"] == "none":
+            return {"success": True, "index": index_name, "applied": "none", **plan}
+
+        if plan["action"] == "put_mapping":
+            result = await asyncio.to_thread(put_index_mapping, host_url, auth, index_name, plan["put_mapping"])
+            invalidate_index_caches(env_id, index_name)
+            return {"success": True, "index": index_name, "applied": "put_mapping", "response": result, **plan}
+
+        if request.oracle_env_id is None:
+            return {"success": False, "error": "Breaking changes need a reindex; pass oracle_env_id to roll out a new version",
+                    "index": index_name, **plan}
+        rollout = await rollout_index_version(env_id, index_name, BlueGreenRolloutRequest(
+            oracle_env_id=request.oracle_env_id, mapping=stored,
+            replace_concrete_index=request.replace_concrete_index
+        ))
+        return {**rollout, "applied": "reindex", "replace_concrete_index": request.replace_concrete_index, "plan": plan}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 
 @app.get("/oracle/query-tables/{env_id}")
 async def get_oracle_tables_for_query(env_id: int):
@@ -1248,13 +1945,13 @@ def save_environment(env):
         if isinstance(env, ElasticsearchEnvironment):
             if env.id:
                 cursor.execute(
-                    "UPDATE elasticsearch_environments SET name=?, host_url=?, username=?, password=? WHERE id=?",
-                    (env.name, env.host_url, env.username, env.password, env.id)
+                    "UPDATE elasticsearch_environments SET name=?, host_url=?, username=?, password=?, bulk_concurrency=? WHERE id=?",
+                    (env.name, env.host_url, env.username, env.password, env.bulk_concurrency, env.id)
                 )
             else:
                 cursor.execute(
-                    "INSERT INTO elasticsearch_environments (name, host_url, username, password) VALUES (?, ?, ?, ?)",
-                    (env.name, env.host_url, env.username, env.password)
+                    "INSERT INTO elasticsearch_environments (name, host_url, username, password, bulk_concurrency) VALUES (?, ?, ?, ?, ?)",
+                    (env.name, env.host_url, env.username, env.password, env.bulk_concurrency)
                 )
         elif isinstance(env, OracleEnvironment):
             if env.id:
@@ -1478,27 +2175,217 @@ def get_elasticsearch_indices(host_url: str, username: Optional[str] = None, pas
     except Exception as e:
         raise Exception(f"Error fetching indices: {str(e)}")
 
-def get_elasticsearch_mapping(host_url: str, index_name: str, username: Optional[str] = None, password: Optional[str] = None):
-    """Get mapping for a specific index"""
-    try:
-        if not host_url.startswith(('http://', 'https://')):
-            host_url = f'http://{host_url}'
+# ================================
+# Mapping cache
+# ================================
 
-        auth = None
-        if username and password:
-            auth = (username, password)
+MAPPING_CACHE_TTL = int(os.getenv("MAPPING_CACHE_TTL", "300"))
+AGGREGATABLE_TYPES = {
+    "keyword", "constant_keyword", "long", "integer", "short", "byte", "double", "float",
+    "half_float", "scaled_float", "unsigned_long", "date", "date_nanos", "boolean", "ip", "version"
+}
+
+
+def build_field_index(properties: Dict[str, Any], prefix: str = "", nested_path: Optional[str] = None,
+                      index: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Flatten mapping properties into {dotted path: field info}. Multi-fields
+    (e.g. "name.keyword") get their own entries. Each entry has the type, the
+    nearest nested ancestor, the keyword field to aggregate on and whether the
+    field itself is aggregatable.
+    """
+    if index is None:
+        index = {}
+    for name, info in properties.items():
+        path = f"{prefix}{name}"
+        field_type = info.get("type", "object" if "properties" in info else None)
+        subfields = info.get("fields", {})
+
+        def subfield_of(sub_type, condition=lambda sub: True):
+            return next((f"{path}.{sub}" for sub, sub_info in subfields.items()
+                         if sub_info.get("type") == sub_type and condition(sub_info)), None)
+
+        index[path] = {
+            "type": field_type,
+            "nested_path": nested_path,
+            "keyword_field": path if field_type == "keyword" else subfield_of("keyword"),
+            "aggregatable": field_type in AGGREGATABLE_TYPES or (field_type == "text" and bool(info.get("fielddata"))),
+            "search_as_you_type": path if field_type == "search_as_you_type" else subfield_of("search_as_you_type"),
+            "index_prefixes": path if field_type == "text" and "index_prefixes" in info
+            else subfield_of("text", lambda sub: "index_prefixes" in sub)
+        }
+        for sub, sub_info in subfields.items():
+            sub_type = sub_info.get("type")
+            index[f"{path}.{sub}"] = {
+                "type": sub_type,
+                "nested_path": nested_path,
+                "keyword_field": f"{path}.{sub}" if sub_type == "keyword" else None,
+                "aggregatable": sub_type in AGGREGATABLE_TYPES,
+                "search_as_you_type": f"{path}.{sub}" if sub_type == "search_as_you_type" else None,
+                "index_prefixes": f"{path}.{sub}" if sub_type == "text" and "index_prefixes" in sub_info else None,
+                "multi_field_of": path
+            }
+        if "properties" in info:
+            build_field_index(info["properties"], f"{path}.",
+                              path if field_type == "nested" else nested_path, index)
+    return index
 
+
+class MappingCache:
+    """
+    Index mappings per (cluster, index) with a flat field index. After
+    MAPPING_CACHE_TTL the entry is revalidated against the cluster-state
+    mapping_version and only refetched when the mapping actually changed.
+    """
+
+    def __init__(self, ttl: int = MAPPING_CACHE_TTL):
+        self.ttl = ttl
+        self._entries: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(host_url: str, index_name: str) -> tuple:
+        if not host_url.startswith(('http://', 'https://')):
+            host_url = f'http://{host_url}'
+        return (host_url.rstrip('/'), index_name)
+
+    def get(self, host_url: str, auth: Optional[tuple], index_name: str) -> Dict[str, Any]:
+        """Cache entry with "mapping" (raw _mapping response), "properties" and "fields" """
+        key = self.make_key(host_url, index_name)
+        with self._lock:
+            entry = self._entries.get(key)
+        now = time.time()
+
+        if entry is not None:
+            if now - entry["checked_at"] < self.ttl:
+                self.hits += 1
+                return entry
+            version = self._fetch_mapping_version(key[0], auth, index_name)
+            if version is not None and version == entry["mapping_version"]:
+                entry["checked_at"] = now
+                self.revalidations += 1
+                return entry
+
+        self.misses += 1
+        entry = self._fetch(key[0], auth, index_name)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def field_info(self, host_url: str, auth: Optional[tuple], index_name: str, field_name: str) -> Optional[Dict[str, Any]]:
+        return self.get(host_url, auth, index_name)["fields"].get(field_name)
+
+    def _fetch(self, host_url: str, auth: Optional[tuple], index_name: str) -> Dict[str, Any]:
+        version = self._fetch_mapping_version(host_url, auth, index_name)
         response = requests.get(
             f"{host_url}/{index_name}/_mapping",
             auth=auth,
             timeout=10,
             verify=False
         )
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch mapping: {response.status_code}")
 
-        if response.status_code == 200:
-            return response.json()
+        mapping = response.json()
+        if index_name in mapping:
+            properties = mapping[index_name].get('mappings', {}).get('properties', {})
         else:
-            raise Exception(f"Failed to fetch mapping: {response.status_code}")
+            # Alias or pattern: merge the concrete indices' properties
+            properties = {}
+            for index_data in mapping.values():
+                properties.update(index_data.get('mappings', {}).get('properties', {}))
+
+        now = time.time()
+        return {
+            "mapping": mapping,
+            "properties": properties,
+            "fields": build_field_index(properties),
+            "mapping_version": version,
+            "fetched_at": now,
+            "checked_at": now
+        }
+
+    @staticmethod
+    def _fetch_mapping_version(host_url: str, auth: Optional[tuple], index_name: str) -> Optional[tuple]:
+        """Per-index mapping_version from cluster state; None if unavailable"""
+        try:
+            response = requests.get(
+                f"{host_url}/_cluster/state/metadata/{index_name}",
+                params={"filter_path": "metadata.indices.*.mapping_version"},
+                auth=auth,
+                timeout=5,
+                verify=False
+            )
+            if response.status_code != 200:
+                return None
+            indices = response.json().get("metadata", {}).get("indices", {})
+            return tuple(sorted((name, data.get("mapping_version")) for name, data in indices.items())) or None
+        except Exception:
+            return None
+
+    def invalidate(self, host_url: str, index_name: str):
+        host = self.make_key(host_url, index_name)[0]
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == host and _index_target_matches(k[1], index_name)]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def invalidate_env(self, env_id: Any, index_name: str):
+        env = next((e for e in get_elasticsearch_environments() if str(e['id']) == str(env_id)), None)
+        if env:
+            self.invalidate(env['host_url'], index_name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            fields = sum(len(e["fields"]) for e in self._entries.values())
+        return {
+            "entries": entries,
+            "indexed_fields": fields,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "invalidations": self.invalidations
+        }
+
+
+mapping_cache = MappingCache()
+
+
+@app.get("/api/mapping-cache/stats")
+async def get_mapping_cache_stats():
+    """Counters of the process-wide mapping cache"""
+    return {"success": True, "stats": mapping_cache.stats()}
+
+
+@app.delete("/api/mapping-cache")
+async def clear_mapping_cache():
+    """Drop all cached mappings and field lists"""
+    mapping_cache.clear()
+    _field_lists_cache.clear()
+    return {"success": True, "message": "Mapping cache cleared"}
+
+
+def get_elasticsearch_mapping(host_url: str, index_name: str, username: Optional[str] = None, password: Optional[str] = None):
+    """Get mapping for a specific index"""
+    try:
+        if not host_url.startswith(('http://', 'https://')):
+            host_url = f'http://{host_url}'
+
+        auth = None
+        if username and password:
+            auth = (username, password)
+
+        return mapping_cache.get(host_url, auth, index_name)["mapping"]
 
     except Exception as e:
         raise Exception(f"Error fetching mapping: {str(e)}")
@@ -1593,9 +2480,11 @@ async def create_elasticsearch_environment(
         name: str = Form(...),
         host_url: str = Form(...),
         username: str = Form(None),
-        password: str = Form(None)
+        password: str = Form(None),
+        bulk_concurrency: int = Form(None)
 ):
-    env = ElasticsearchEnvironment(name=name, host_url=host_url, username=username, password=password)
+    env = ElasticsearchEnvironment(name=name, host_url=host_url, username=username, password=password,
+                                   bulk_concurrency=bulk_concurrency)
     env_id = save_environment(env)
     return JSONResponse({"success": True, "id": env_id, "type": "elasticsearch"})
 
@@ -2395,7 +3284,8 @@ async def save_enhanced_form_configuration(request: Request):
             url=form_data['url'],
             environment=form_data['environment'],
             index=form_data['index'],
-            fields=form_data['fields']  # This now includes enhanced field configs
+            fields=form_data['fields'],  # This now includes enhanced field configs
+            query_options=form_data.get('queryOptions') or {}
         )
 
         form_id = save_form_configuration(enhanced_config)
@@ -2413,6 +3303,40 @@ async def save_enhanced_form_configuration(request: Request):
             "error": f"Failed to save enhanced form configuration: {str(e)}"
         })
 
+@app.put("/form-query-options/{form_url}")
+async def update_form_query_options(form_url: str, request: Request):
+    """Update per-form query compilation options, e.g. {"filter_context": true}"""
+    try:
+        form_config = get_form_configuration_by_url(form_url)
+        if not form_config:
+            raise HTTPException(status_code=404, detail="Form not found")
+
+        options = await request.json()
+        if not isinstance(options, dict):
+            return JSONResponse({"success": False, "error": "Query options must be a JSON object"})
+
+        query_options = {**form_config.get('query_options', {}), **options}
+        with get_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "UPDATE form_configurations SET query_options_json=? WHERE id=?",
+                (json.dumps(query_options), form_config['id'])
+            )
+            conn.commit()
+
+        # Compiled queries change shape, so cached results for this index are stale
+        invalidate_index_caches(form_config['environment'], [form_config['index_name']])
+
+        return JSONResponse({"success": True, "query_options": query_options})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "error": f"Failed to update query options: {str(e)}"
+        })
+
 @app.get("/enhanced-form-config/{form_url}")
 async def get_enhanced_form_configuration(form_url: str):
     """Get enhanced form configuration with all field mappings"""
@@ -2450,169 +3374,570 @@ async def get_enhanced_form_configuration(form_url: str):
             "error": f"Failed to load enhanced form configuration: {str(e)}"
         })
 
-def build_terms_aggregation(field_name: str,field_type: str) -> dict:
-    if '.' in field_name:
-        # Consider as nested
-        nested_path = field_name.split('.')[0]  # 'address.city' -> 'address'
+# ================================
+# Field values for dropdowns (cached)
+# ================================
 
-        field_name = field_name + ".keyword" if field_type != "keyword" else field_name
-        return {
-            "size": 0,
-            "aggs": {
-                "nested_agg": {
-                    "nested": {
-                        "path": nested_path
-                    },
-                    "aggs": {
-                        "unique_values": {
-                            "terms": {
-                                "field": field_name,
-                                "size": 1000
-                            }
-                        }
-                    }
-                }
-            }
-        }
-    else:
-        field_name = field_name + ".keyword" if field_type != "keyword" else field_name
-        return {
-            "size": 0,
-            "aggs": {
-                "unique_values": {
-                    "terms": {
-                        "field": field_name,
-                        "size": 1000
-                    }
-                }
-            }
-        }
+FIELD_VALUES_TTL = int(os.getenv("FIELD_VALUES_TTL", "300"))
+FIELD_VALUES_STALE_TTL = int(os.getenv("FIELD_VALUES_STALE_TTL", "3600"))
+FIELD_VALUES_CACHE_SIZE = int(os.getenv("FIELD_VALUES_CACHE_SIZE", "2000"))
+
+
+def get_environment_target(env_id: int) -> Tuple[str, Optional[tuple]]:
+    """(host_url, auth) for an environment id"""
+    environments = get_elasticsearch_environments()
+    env = next((e for e in environments if e['id'] == env_id), None)
+    if not env:
+        raise HTTPException(status_code=404, detail="Environment not found")
+
+    host_url = env['host_url']
+    if not host_url.startswith(('http://', 'https://')):
+        host_url = f"http://{host_url}"
+
+    auth = None
+    if env.get('username') and env.get('password'):
+        auth = (env['username'], env['password'])
+    return host_url, auth
+
+
+def fetch_field_index(host_url: str, auth: Optional[tuple], index_name: str) -> Dict[str, Dict[str, Any]]:
+    """Flat field index of an index from the mapping cache ({} if unavailable)"""
+    try:
+        return mapping_cache.get(host_url, auth, index_name)["fields"]
+    except Exception as e:
+        print(f"Error getting field mapping: {e}")
+        return {}
+
+
+def resolve_field_type(field_index: Dict[str, Dict[str, Any]], field_name: str) -> Optional[str]:
+    """Mapping type of a (possibly dotted) field name"""
+    return field_index.get(field_name, {}).get('type')
+
+
+def resolve_values_field(field_index: Dict[str, Dict[str, Any]], field_name: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Field to run a terms aggregation on and its nested path, from the mapping:
+    the field itself when aggregatable (keyword, numeric, date, ...), else its
+    keyword subfield. Returns (target, None) or (None, reason).
+    """
+    if not field_index:
+        # Mapping unavailable: the historical convention, without guessing nesting
+        return {"field": field_name if field_name.endswith('.keyword') else f"{field_name}.keyword",
+                "nested_path": None}, None
+    info = field_index.get(field_name)
+    if info is None:
+        return None, "field is not in the index mapping"
+    if info["aggregatable"]:
+        agg_field = field_name
+    elif info["keyword_field"]:
+        agg_field = info["keyword_field"]
+    else:
+        return None, f"{info['type']} field has no keyword subfield to aggregate on"
+    return {"field": agg_field, "nested_path": info["nested_path"]}, None
+
+
+def bucket_values(buckets: List[Dict[str, Any]], field_type: Optional[str]) -> List[Dict[str, Any]]:
+    """Dropdown values from terms buckets; booleans come back as 0/1 keys"""
+    values = []
+    for bucket in buckets:
+        bucket_value = bucket['key']
+        if field_type == 'boolean':
+            if bucket_value == 1:
+                bucket_value = True
+            elif bucket_value == 0:
+                bucket_value = False
+        values.append({
+            'value': bucket_value
+        })
+    return values
+
+
+def fetch_field_values(env_id: int, index_name: str, field_name: str) -> List[Dict[str, Any]]:
+    """Unique values of a field (terms aggregation), read from Elasticsearch"""
+    values, errors = fetch_multi_field_values(env_id, index_name, [field_name])
+    if field_name in errors:
+        raise Exception(f"Cannot list values of {field_name}: {errors[field_name]}")
+    return values[field_name]
+
+
+def build_multi_terms_aggregation(targets: Dict[str, Dict[str, Any]]) -> Tuple[dict, Dict[str, tuple]]:
+    """
+    One size-0 search with a terms aggregation per resolved field (see
+    resolve_values_field). Fields under the same nested path share one nested
+    aggregation. Returns the query and, per field, the aggregation path to its buckets.
+    """
+    aggs: Dict[str, Any] = {}
+    bucket_paths: Dict[str, tuple] = {}
+    nested_names: Dict[str, str] = {}
+
+    for position, (field_name, target) in enumerate(targets.items()):
+        agg_name = f"values_{position}"
+        terms = {"terms": {"field": target["field"], "size": 1000}}
+        nested_path = target["nested_path"]
+        if nested_path:
+            nested_name = nested_names.get(nested_path)
+            if nested_name is None:
+                nested_name = nested_names[nested_path] = f"nested_{len(nested_names)}"
+                aggs[nested_name] = {"nested": {"path": nested_path}, "aggs": {}}
+            aggs[nested_name]["aggs"][agg_name] = terms
+            bucket_paths[field_name] = (nested_name, agg_name)
+        else:
+            aggs[agg_name] = terms
+            bucket_paths[field_name] = (agg_name,)
+
+    return {"size": 0, "aggs": aggs}, bucket_paths
+
+
+def fetch_multi_field_values(env_id: int, index_name: str,
+                             field_names: List[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+    """
+    Values for several fields of one index: one mapping read and one _search.
+    Returns (values, errors); fields the mapping cannot aggregate on are
+    reported in errors instead of failing the whole request.
+    """
+    host_url, auth = get_environment_target(env_id)
+    field_index = fetch_field_index(host_url, auth, index_name)
+    targets, errors = {}, {}
+    for field_name in field_names:
+        target, error = resolve_values_field(field_index, field_name)
+        if target is None:
+            errors[field_name] = error
+        else:
+            targets[field_name] = target
+    if not targets:
+        return {}, errors
+
+    query, bucket_paths = build_multi_terms_aggregation(targets)
+    response = requests.post(
+        f"{host_url}/{index_name}/_search",
+        json=query,
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Elasticsearch query failed: {response.status_code}")
+
+    aggregations = response.json().get('aggregations', {})
+    values = {}
+    for field_name, path in bucket_paths.items():
+        node = aggregations
+        for name in path:
+            node = node.get(name, {})
+        values[field_name] = bucket_values(node.get('buckets', []), resolve_field_type(field_index, field_name))
+    return values, errors
+
+
+class FieldValuesCache:
+    """
+    Per-(environment, index, field) dropdown values. Entries younger than
+    FIELD_VALUES_TTL are served as-is; older ones up to FIELD_VALUES_STALE_TTL
+    are served stale while one background task refreshes them. Concurrent
+    misses for the same key share a single Elasticsearch fetch.
+    """
+
+    def __init__(self, max_entries: int = FIELD_VALUES_CACHE_SIZE, ttl: int = FIELD_VALUES_TTL,
+                 stale_ttl: int = FIELD_VALUES_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        # Bumped on every invalidation; fetches that overlap one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(env_id: Any, index_name: str, field_name: str) -> tuple:
+        return (str(env_id), index_name, field_name)
+
+    async def get(self, env_id: int, index_name: str, field_name: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Return (values, cache status) where status is hit, stale or miss"""
+        key = self.make_key(env_id, index_name, field_name)
+        entry = self._entries.get(key)
+        now = time.time()
+
+        if entry is not None:
+            age = now - entry["fetched_at"]
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["values"], "hit"
+            if age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_fetch(key, env_id, index_name, field_name)
+                return entry["values"], "stale"
+
+        self.misses += 1
+        task = self._inflight.get(key) or self._start_fetch(key, env_id, index_name, field_name)
+        return await asyncio.shield(task), "miss"
+
+    async def refresh(self, env_id: int, index_name: str, field_name: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Refetch one field; other fields and in-flight fetches of the index are untouched"""
+        key = self.make_key(env_id, index_name, field_name)
+        self._entries.pop(key, None)
+        self.refreshes += 1
+        # Supersedes an older in-flight fetch of this key, which then no longer stores its result
+        return await asyncio.shield(self._start_fetch(key, env_id, index_name, field_name)), "refresh"
+
+    def _start_fetch(self, key: tuple, env_id: int, index_name: str, field_name: str) -> asyncio.Task:
+        generation = self._generation
+
+        async def load():
+            task = asyncio.current_task()
+            try:
+                values = await asyncio.to_thread(fetch_field_values, env_id, index_name, field_name)
+                # The data may have changed under us if an index was written meanwhile
+                if generation == self._generation and self._inflight.get(key) is task:
+                    self._store(key, values)
+                return values
+            finally:
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+
+        task = asyncio.create_task(load())
+        # Background refreshes may fail unobserved; retrieve the exception to avoid warnings
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return task
+
+    def peek(self, env_id: Any, index_name: str, field_name: str) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+        """Cached values without fetching: (values, hit|stale) or (None, miss)"""
+        key = self.make_key(env_id, index_name, field_name)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < self.stale_ttl:
+                self._entries.move_to_end(key)
+                if age < self.ttl:
+                    self.hits += 1
+                    return entry["values"], "hit"
+                self.stale_hits += 1
+                return entry["values"], "stale"
+        self.misses += 1
+        return None, "miss"
+
+    async def load_many(self, env_id: int, index_name: str,
+                        field_names: List[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, str]]:
+        """Fetch several fields with one request and store each of them; returns (values, errors)"""
+        generation = self._generation
+        values, errors = await asyncio.to_thread(fetch_multi_field_values, env_id, index_name, field_names)
+        if generation == self._generation:
+            for field_name, field_values in values.items():
+                self._store(self.make_key(env_id, index_name, field_name), field_values)
+        return values, errors
+
+    def _store(self, key: tuple, values: List[Dict[str, Any]]):
+        self._entries[key] = {"values": values, "fetched_at": time.time()}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_index(self, env_id: Any, index_name: str):
+        self._generation += 1
+        for key in [k for k in self._entries if k[0] == str(env_id) and _index_target_matches(k[1], index_name)]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "stale_ttl_seconds": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "refreshing": len(self._inflight)
+        }
+
+
+field_values_cache = FieldValuesCache()
 
 
 @app.get("/field-values/{env_id}/{index_name}/{field_name}")
-async def get_field_values_for_dropdown_v1(env_id: int, index_name: str, field_name: str):
+async def get_field_values_for_dropdown_v1(env_id: int, index_name: str, field_name: str, refresh: bool = False):
     """Get unique values for a field from an index for dropdown/checkbox population"""
     try:
-        # Get Elasticsearch environment
-        print(field_name)
-        environments = get_elasticsearch_environments()
-        env = next((e for e in environments if e['id'] == env_id), None)
-        if not env:
-            raise HTTPException(status_code=404, detail="Environment not found")
+        if refresh:
+            values, cache_status = await field_values_cache.refresh(env_id, index_name, field_name)
+        else:
+            values, cache_status = await field_values_cache.get(env_id, index_name, field_name)
 
-        # Build Elasticsearch aggregation query to get unique values
+        return JSONResponse({
+            "success": True,
+            "values": values,
+            "total_count": len(values),
+            "cache": cache_status
+        })
 
+    except Exception as e:
+        return JSONResponse({
+            "success": False,
+            "error": f"Failed to get field values: {str(e)}",
+            "values": []
+        })
 
 
-        if not env['host_url'].startswith(('http://', 'https://')):
-            env['host_url'] = f"http://{env['host_url']}"
+# ================================
+# Paged field values and type-ahead
+# ================================
 
-        auth = None
-        if env.get('username') and env.get('password'):
-            auth = (env['username'], env['password'])
+FIELD_VALUES_PAGE_MAX = int(os.getenv("FIELD_VALUES_PAGE_MAX", "1000"))
+# The dropdown terms aggregation returns at most this many values
+FIELD_VALUES_TERMS_SIZE = 1000
 
 
-        # NEW: Get field mapping to check if it's boolean
-        def get_field_type():
-            try:
-                mapping_response = requests.get(
-                    f"{env['host_url']}/{index_name}/_mapping",
-                    auth=auth,
-                    timeout=10,
-                    verify=False
-                )
+def describe_value_field(field_index: Dict[str, Dict[str, Any]], field_name: str) -> Dict[str, Any]:
+    """
+    What the mapping offers for listing and prefix-matching a field's values:
+    the keyword field to aggregate on, the enclosing nested path, and any
+    search_as_you_type or index_prefixes field usable for type-ahead.
+    """
+    info = field_index.get(field_name)
+    if info is None:
+        # No mapping information: same conventions as resolve_values_field
+        return {
+            "field": field_name,
+            "type": None,
+            "keyword_field": field_name if field_name.endswith('.keyword') else f"{field_name}.keyword",
+            "nested_path": None,
+            "search_as_you_type": None,
+            "index_prefixes": None
+        }
 
-                if mapping_response.status_code == 200:
-                    mapping = mapping_response.json()
-                    properties = mapping.get(index_name, {}).get('mappings', {}).get('properties', {})
-
-                    if '.' in field_name:
-                        # Handle nested fields
-                        field_parts = field_name.split('.')
-                        current_properties = properties
-
-                        for part in field_parts:
-                            if part in current_properties:
-                                field_info = current_properties[part]
-                                if field_info.get('type') == 'nested' and 'properties' in field_info:
-                                    current_properties = field_info['properties']
-                                elif 'properties' in field_info:
-                                    current_properties = field_info['properties']
-                                else:
-                                    return field_info.get('type')
-                            else:
-                                return None
-                        return None
-                    else:
-                        # Handle regular fields
-                        return properties.get(field_name, {}).get('type')
-                return None
-            except Exception as e:
-                print(f"Error getting field mapping: {e}")
-                return None
+    return {
+        "field": field_name,
+        "type": info["type"],
+        "keyword_field": info["keyword_field"] or f"{field_name}.keyword",
+        "nested_path": info["nested_path"],
+        "search_as_you_type": info["search_as_you_type"],
+        "index_prefixes": info["index_prefixes"]
+    }
 
-        field_type = get_field_type()
-        is_boolean_field = (field_type == 'boolean')
-        print(f"Field type: {field_type}, is_boolean: {is_boolean_field}")
 
+# Type-ahead matches values that start with the typed text (case-insensitive),
+# on every path: local cache, search_as_you_type / index_prefixes and keyword.
+# The analyzed fields match word prefixes, so they only narrow the documents for
+# a single-word prefix (a value starting with it has a first word starting with
+# it) and returned values are always checked with value_matches_prefix.
+TYPEAHEAD_SINGLE_WORD = re.compile(r"\w+")
+LUCENE_REGEX_RESERVED = set('.?+*|{}[]()"\\#@&<>~')
 
-        query = build_terms_aggregation(field_name,field_type)
-        print(query)
 
+def build_typeahead_query(field: Dict[str, Any], prefix: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Prefix query for type-ahead, cheapest first: search_as_you_type, then an
+    index_prefixes text field, then a prefix seek on the keyword field. Never a
+    leading-wildcard scan. Returns (query, strategy).
+    """
+    if not TYPEAHEAD_SINGLE_WORD.fullmatch(prefix):
+        return {
+            "prefix": {field["keyword_field"]: {"value": prefix, "case_insensitive": True}}
+        }, "keyword_prefix"
+    if field["search_as_you_type"]:
+        sayt = field["search_as_you_type"]
+        return {
+            "multi_match": {
+                "query": prefix,
+                "type": "bool_prefix",
+                "fields": [sayt, f"{sayt}._2gram", f"{sayt}._3gram"]
+            }
+        }, "search_as_you_type"
+    if field["index_prefixes"]:
+        # Text fields are lower-cased at index time; prefix queries are not analyzed
+        return {"prefix": {field["index_prefixes"]: {"value": prefix.lower()}}}, "index_prefixes"
+    return {
+        "prefix": {field["keyword_field"]: {"value": prefix, "case_insensitive": True}}
+    }, "keyword_prefix"
 
-        response = requests.get(
-            f"{env['host_url']}/{index_name}/_search",
-            json= query,
-            auth=auth,
-            timeout=10,
-            verify=False
+
+def value_matches_prefix(value: Any, prefix: str) -> bool:
+    """The value starts with the prefix (case-insensitive)"""
+    return str(value).lower().startswith(prefix.lower())
+
+
+def prefix_include_pattern(prefix: str) -> str:
+    """terms aggregation `include` regex for values starting with the prefix, case-insensitive"""
+    parts = []
+    for char in prefix:
+        if char.lower() != char.upper():
+            parts.append(f"[{char.lower()}{char.upper()}]")
+        elif char in LUCENE_REGEX_RESERVED:
+            parts.append("\\" + char)
+        else:
+            parts.append(char)
+    return "".join(parts) + ".*"
+
+
+def local_prefix_values(env_id: int, index_name: str, field_name: str, prefix: str,
+                        limit: int) -> Optional[List[Dict[str, Any]]]:
+    """Type-ahead from cached dropdown values, if the cached list is complete"""
+    cached, _ = field_values_cache.peek(env_id, index_name, field_name)
+    if cached is None or len(cached) >= FIELD_VALUES_TERMS_SIZE:
+        return None
+    return [item for item in cached if value_matches_prefix(item['value'], prefix)][:limit]
+
+
+def encode_after_key(after_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not after_key:
+        return None
+    raw = json.dumps(after_key, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_after_key(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not token:
+        return None
+    try:
+        after_key = json.loads(base64.urlsafe_b64decode((token + "=" * (-len(token) % 4)).encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid after token")
+    if not isinstance(after_key, dict):
+        raise ValueError("Invalid after token")
+    return after_key
+
+
+def fetch_field_values_page(env_id: int, index_name: str, field_name: str, size: int,
+                            after_key: Optional[Dict[str, Any]] = None,
+                            prefix: Optional[str] = None) -> Dict[str, Any]:
+    """One page of a field's values in key order via a composite aggregation"""
+    host_url, auth = get_environment_target(env_id)
+    field = describe_value_field(fetch_field_index(host_url, auth, index_name), field_name)
+
+    match_query, strategy = build_typeahead_query(field, prefix) if prefix else (None, "all")
+    composite = {
+        "size": size,
+        "sources": [{"value": {"terms": {"field": field["keyword_field"]}}}]
+    }
+    if after_key:
+        composite["after"] = after_key
+    query, agg_path = wrap_values_aggregation(field, {"composite": composite}, match_query)
+
+    response = requests.post(
+        f"{host_url}/{index_name}/_search",
+        json=query,
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Elasticsearch query failed: {response.status_code}")
+
+    node = response.json().get('aggregations', {})
+    for name in agg_path:
+        node = node.get(name, {})
+
+    buckets = node.get('buckets', [])
+    values = [
+        {'value': bucket['key']['value'], 'count': bucket['doc_count']}
+        for bucket in buckets
+        # Multi-valued and nested documents can carry values that don't match the prefix
+        if not prefix or value_matches_prefix(bucket['key']['value'], prefix)
+    ]
+    return {
+        "values": values,
+        # A short page means the aggregation is exhausted
+        "next_after": encode_after_key(node.get('after_key')) if len(buckets) >= size else None,
+        "strategy": strategy,
+        "keyword_field": field["keyword_field"]
+    }
+
+
+@app.get("/field-values-page/{env_id}/{index_name}/{field_name}")
+async def get_field_values_page(env_id: int, index_name: str, field_name: str, size: int = 100,
+                                after: Optional[str] = None, prefix: Optional[str] = None):
+    """
+    Page through all values of a field, however many there are. Values come in
+    key order; pass next_after back as ?after= for the next page. With ?prefix=
+    only values starting with it (type-ahead) are returned.
+    """
+    try:
+        page = await asyncio.to_thread(
+            fetch_field_values_page, env_id, index_name, field_name,
+            max(1, min(size, FIELD_VALUES_PAGE_MAX)), decode_after_key(after), prefix or None
         )
+        return {"success": True, "field_name": field_name, "size": size, **page}
+    except Exception as e:
+        return {"success": False, "error": str(e), "values": [], "next_after": None}
 
-        if response.status_code == 200:
-            result = response.json()
-            if '.' in field_name:
-                buckets = result.get('aggregations', {}) \
-                    .get('nested_agg', {}) \
-                    .get('unique_values', {}) \
-                    .get('buckets', [])
-            else:
-                buckets = result.get('aggregations', {}) \
-                    .get('unique_values', {}) \
-                    .get('buckets', [])
-
-            values = []
-            for bucket in buckets:
-                bucket_value = bucket['key']
-
-                # NEW: Convert boolean values
-                if is_boolean_field:
-                    if bucket_value == 1:
-                        bucket_value = True
-                    elif bucket_value == 0:
-                        bucket_value = False
-
-                values.append({
-                    'value': bucket_value
-                })
 
-            print(values)
+class FieldValuesBatchRequest(BaseModel):
+    fields: List[str]
 
 
-            return JSONResponse({
-                "success": True,
-                "values": values,
-                "total_count": len(values)
-            })
-        else:
-            raise Exception(f"Elasticsearch query failed: {response.status_code}")
+@app.post("/field-values-batch/{env_id}/{index_name}")
+async def get_field_values_batch(env_id: int, index_name: str, batch: FieldValuesBatchRequest):
+    """
+    Dropdown values for all listed fields of one index. Cached fields are served
+    from the field values cache; the rest come from a single aggregation request.
+    Stale fields are served immediately and refreshed together in the background.
+    """
+    try:
+        field_names = list(dict.fromkeys(f for f in batch.fields if f))
+        values: Dict[str, List[Dict[str, Any]]] = {}
+        cache_status: Dict[str, str] = {}
+        missing, stale = [], []
+
+        for field_name in field_names:
+            cached, status = field_values_cache.peek(env_id, index_name, field_name)
+            cache_status[field_name] = status
+            if cached is None:
+                missing.append(field_name)
+            else:
+                values[field_name] = cached
+                if status == "stale":
+                    stale.append(field_name)
+
+        errors: Dict[str, str] = {}
+        if missing:
+            loaded, errors = await field_values_cache.load_many(env_id, index_name, missing)
+            values.update(loaded)
+            for field_name in errors:
+                cache_status[field_name] = "unresolved"
+        if stale:
+            refresh = asyncio.create_task(field_values_cache.load_many(env_id, index_name, stale))
+            refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
 
+        return JSONResponse({
+            "success": True,
+            "values": {field_name: values.get(field_name, []) for field_name in field_names},
+            "cache": cache_status,
+            "errors": errors
+        })
 
     except Exception as e:
         return JSONResponse({
             "success": False,
             "error": f"Failed to get field values: {str(e)}",
-            "values": []
+            "values": {}
         })
+
+
+@app.get("/api/field-values-cache/stats")
+async def get_field_values_cache_stats():
+    """Hit/stale/miss counters of the dropdown values cache"""
+    return {"success": True, "stats": field_values_cache.stats()}
+
+
+@app.delete("/api/field-values-cache")
+async def clear_field_values_cache():
+    """Drop all cached dropdown values"""
+    field_values_cache.clear()
+    return {"success": True, "message": "Field values cache cleared"}
 # Initialize database on startup
 
 
@@ -2629,9 +3954,23 @@ async def submit_form_with_logic(form_url: str, request: Request):
         form_data = await request.json()
         logical_structure = form_data.get('logicalStructure', [])
         field_values = form_data.get('fieldValues', {})
+        page_size = max(1, min(int(form_data.get('size') or 100), MAX_CURSOR_PAGE_SIZE))
 
         # Build complex Elasticsearch query with logical operators
-        query_body = build_logical_query(logical_structure, field_values, form_config)
+        query_body = build_logical_query(logical_structure, field_values, form_config, size=page_size)
+
+        # Cursor pagination (point-in-time + search_after) for deep pages
+        if form_data.get('cursor') or form_data.get('pagination') == 'cursor':
+            query_body.pop('sort', None)
+            result = execute_cursor_search(form_config, query_body, page_size, form_data.get('cursor'))
+            return JSONResponse({
+                "success": True,
+                "results": result["hits"],
+                "total": result["total"],
+                "next_cursor": result["next_cursor"],
+                "query": query_body,
+                "logical_structure": logical_structure
+            })
 
         # Execute query
         es_url = f"http://{form_config['host_url']}/{form_config['index_name']}/_search"
@@ -2672,10 +4011,10 @@ async def submit_form_with_logic(form_url: str, request: Request):
             "error": f"Failed to submit form: {str(e)}"
         })
 
-def build_logical_query(logical_structure, field_values, form_config):
+def build_logical_query(logical_structure, field_values, form_config, size: int = 100):
     """Build Elasticsearch query with logical operators"""
     if not logical_structure:
-        return {"query": {"match_all": {}}}
+        return {"query": {"match_all": {}}, "size": size}
 
     def process_structure(structure):
         query_parts = []
@@ -2718,7 +4057,7 @@ def build_logical_query(logical_structure, field_values, form_config):
 
     return {
         "query": main_query,
-        "size": 100,
+        "size": size,
         "sort": [{"_score": {"order": "desc"}}]
     }
 
@@ -2739,6 +4078,13 @@ def create_field_query(field_config, field_value):
 class FormSubmissionData(BaseModel):
     fields: Dict[str, Any]
     metadata: Dict[str, Any]
+    # Cursor pagination: pagination="cursor" opens a point-in-time for the first
+    # page, later pages send back the opaque next_cursor
+    pagination: Optional[str] = None
+    cursor: Optional[str] = None
+    size: Optional[int] = None
+    # Run the query with the Elasticsearch profiler and return per-field timings
+    profile: bool = False
 
 class MultiValueField(BaseModel):
     type: str = "multi_value"
@@ -2747,58 +4093,396 @@ class MultiValueField(BaseModel):
     sourceConfig: Optional[Dict[str, str]] = None
 
 
+# ================================
+# Generated question tickets
+# ================================
+# Question generation goes through an LLM and can take a long time, so it runs
+# as a background task. The search response carries a ticket (the normalized
+# query hash) and the questions are fetched afterwards or pushed over SSE.
+
+QUESTION_CACHE_SIZE = int(os.getenv("QUESTION_CACHE_SIZE", "500"))
+QUESTION_GENERATION_CONCURRENCY = int(os.getenv("QUESTION_GENERATION_CONCURRENCY", "2"))
+QUESTION_STREAM_TIMEOUT = int(os.getenv("QUESTION_STREAM_TIMEOUT", "300"))
+
+question_tickets: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_question_tasks: Dict[str, asyncio.Task] = {}
+_question_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def normalized_query_hash(query_body: Dict[str, Any], index_name: Optional[str] = None) -> str:
+    """Stable hash for a query body, see builder.query_fingerprint"""
+    query_hash = query_fingerprint(query_body)["query_hash"]
+    if index_name is None:
+        return query_hash
+    return hashlib.sha256(f"{index_name}:{query_hash}".encode("utf-8")).hexdigest()
+
+
+def _store_question_ticket(ticket: str, entry: Dict[str, Any]):
+    """Insert or refresh a ticket, evicting the least recently used ones and cancelling their generation"""
+    question_tickets[ticket] = entry
+    question_tickets.move_to_end(ticket)
+    while len(question_tickets) > QUESTION_CACHE_SIZE:
+        oldest, _ = question_tickets.popitem(last=False)
+        task = _question_tasks.pop(oldest, None)
+        if task is not None:
+            task.cancel()
+
+
+async def _generate_questions_for_ticket(ticket: str, request_obj: ElasticsearchQueryRequest):
+    """Background task: run the LLM question generation and store the outcome"""
+    global _question_semaphore
+    if _question_semaphore is None:
+        _question_semaphore = asyncio.Semaphore(QUESTION_GENERATION_CONCURRENCY)
+
+    started = time.perf_counter()
+    try:
+        async with _question_semaphore:
+            response = await convert_query_to_questions(request_obj)
+        _store_question_ticket(ticket, {
+            "status": "ready",
+            "questions": [q.model_dump() for q in response.generated_questions],
+            "generation_method": response.generation_method,
+            "execution_time_ms": int((time.perf_counter() - started) * 1000),
+            "updated_at": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.warning(f"Question generation failed for ticket {ticket[:12]}: {e}")
+        _store_question_ticket(ticket, {
+            "status": "failed",
+            "questions": None,
+            "error": str(getattr(e, "detail", e)),
+            "execution_time_ms": int((time.perf_counter() - started) * 1000),
+            "updated_at": datetime.now().isoformat()
+        })
+    finally:
+        # A ticket evicted and requested again may already have a newer task
+        if _question_tasks.get(ticket) is asyncio.current_task():
+            del _question_tasks[ticket]
+
+
+def schedule_question_generation(query_body: Dict[str, Any], index_name: Optional[str]) -> Dict[str, Any]:
+    """
+    Return the ticket for a query, starting generation only when the
+    normalized query has no cached or in-flight result.
+    """
+    ticket = normalized_query_hash(query_body, index_name)
+    entry = question_tickets.get(ticket)
+
+    if entry and entry["status"] in ("ready", "pending"):
+        question_tickets.move_to_end(ticket)
+        return {"ticket": ticket, **entry}
+
+    # New query or a previous failure: (re)start generation
+    entry = {"status": "pending", "questions": None, "updated_at": datetime.now().isoformat()}
+    _store_question_ticket(ticket, entry)
+
+    request_obj = ElasticsearchQueryRequest(query=query_body, index_name=index_name, context="")
+    _question_tasks[ticket] = asyncio.create_task(_generate_questions_for_ticket(ticket, request_obj))
+    return {"ticket": ticket, **entry}
+
+
+@app.get("/questions/{ticket}")
+async def get_generated_questions(ticket: str):
+    """Poll the generated questions for a search ticket"""
+    entry = question_tickets.get(ticket)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Question ticket not found")
+    return {"success": True, "ticket": ticket, **entry}
+
+
+@app.get("/questions/{ticket}/stream")
+async def stream_generated_questions(ticket: str):
+    """Push the generated questions for a search ticket over Server-Sent Events"""
+    if ticket not in question_tickets:
+        raise HTTPException(status_code=404, detail="Question ticket not found")
+
+    async def event_stream():
+        deadline = time.monotonic() + QUESTION_STREAM_TIMEOUT
+        while True:
+            entry = question_tickets.get(ticket)
+            if entry is None:
+                yield f"event: error\ndata: {json.dumps({'error': 'Ticket expired'})}\n\n"
+                return
+            if entry["status"] != "pending":
+                yield f"event: questions\ndata: {json.dumps({'ticket': ticket, **entry})}\n\n"
+                return
+            if time.monotonic() > deadline:
+                yield f"event: error\ndata: {json.dumps({'error': 'Timed out waiting for questions'})}\n\n"
+                return
+
+            task = _question_tasks.get(ticket)
+            if task is not None:
+                # Wake up as soon as generation finishes, but keep the connection alive
+                await asyncio.wait({task}, timeout=15)
+            else:
+                await asyncio.sleep(1)
+            yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ================================
+# Stage timings, latency histograms and slow query log
+# ================================
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "1000"))
+LATENCY_WINDOW_MINUTES = int(os.getenv("LATENCY_WINDOW_MINUTES", "60"))
+# Bucket upper bounds in ms, roughly logarithmic; the last bucket is open ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 300, 500, 750, 1000, 1500,
+                      2000, 3000, 5000, 10000, 30000, float("inf"))
+
+
+class StageTimer:
+    """Collects wall-clock time per named stage of a request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings[name] = round(self.timings.get(name, 0) + elapsed, 3)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+
+class LatencyTracker:
+    """
+    Rolling latency histograms keyed by (scope, name, stage), e.g.
+    ("form", "orders", "es"). Counts are kept per minute and the window drops
+    minutes older than LATENCY_WINDOW_MINUTES, so memory is bounded by
+    keys * window * buckets.
+    """
+
+    def __init__(self, window_minutes: int = LATENCY_WINDOW_MINUTES):
+        self.window_minutes = window_minutes
+        self._series: Dict[tuple, "OrderedDict[int, List[int]]"] = {}
+        self._lock = threading.Lock()
+
+    def record(self, scope: str, name: str, stage: str, value_ms: float):
+        minute = int(time.time() // 60)
+        bucket = next(i for i, bound in enumerate(LATENCY_BUCKETS_MS) if value_ms <= bound)
+        with self._lock:
+            series = self._series.setdefault((scope, name, stage), OrderedDict())
+            counts = series.get(minute)
+            if counts is None:
+                counts = series[minute] = [0] * len(LATENCY_BUCKETS_MS)
+                while series and next(iter(series)) <= minute - self.window_minutes:
+                    series.popitem(last=False)
+            counts[bucket] += 1
+
+    def record_submission(self, form_url: str, index_name: str, timings: Dict[str, float]):
+        for stage, value in timings.items():
+            self.record("form", form_url, stage, value)
+            self.record("index", index_name, stage, value)
+
+    def percentiles(self, scope: str, name: str, window_minutes: Optional[int] = None) -> Dict[str, Any]:
+        """p50/p95/p99 per stage; values are bucket upper bounds in ms"""
+        oldest = int(time.time() // 60) - min(window_minutes or self.window_minutes, self.window_minutes)
+        stats = {}
+        with self._lock:
+            items = [(key[2], dict(series)) for key, series in self._series.items()
+                     if key[0] == scope and key[1] == name]
+        for stage, series in items:
+            merged = [0] * len(LATENCY_BUCKETS_MS)
+            for minute, counts in series.items():
+                if minute > oldest:
+                    merged = [a + b for a, b in zip(merged, counts)]
+            total = sum(merged)
+            if not total:
+                continue
+            stats[stage] = {"count": total}
+            for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+                rank, seen = q * total, 0
+                for bound, count in zip(LATENCY_BUCKETS_MS, merged):
+                    seen += count
+                    if seen >= rank:
+                        stats[stage][label] = bound if bound != float("inf") else None
+                        break
+        return stats
+
+    def names(self, scope: str) -> List[str]:
+        with self._lock:
+            return sorted({key[1] for key in self._series if key[0] == scope})
+
+
+latency_tracker = LatencyTracker()
+
+
+def log_slow_query(form_url: str, index_name: str, query_body: Dict[str, Any],
+                   timings: Dict[str, float], total_ms: float, result: Dict[str, Any]):
+    """Store the normalized query of a submission slower than SLOW_QUERY_THRESHOLD_MS"""
+    try:
+        fingerprint = query_fingerprint(query_body)
+        with get_db() as conn:
+            conn.execute(
+                """
+                INSERT INTO slow_queries
+                    (form_url, index_name, query_hash, shape_hash, normalized_query,
+                     stage_timings, total_ms, took_ms, result_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (form_url, index_name, fingerprint["query_hash"], fingerprint["shape_hash"],
+                 json.dumps(fingerprint["normalized"], default=str), json.dumps(timings),
+                 total_ms, result.get("took", 0), result.get("total", 0))
+            )
+            conn.commit()
+    except Exception as e:
+        print(f"Failed to log slow query: {str(e)}")
+
+
+@app.get("/api/latency")
+async def get_latency_stats(form_url: Optional[str] = None, index: Optional[str] = None,
+                            window_minutes: Optional[int] = None):
+    """
+    Rolling p50/p95/p99 per submission stage for a form or an index. Without
+    a filter, lists the forms and indices that have data.
+    """
+    if not form_url and not index:
+        return {
+            "success": True,
+            "forms": latency_tracker.names("form"),
+            "indices": latency_tracker.names("index")
+        }
+    scope, name = ("form", form_url) if form_url else ("index", index)
+    return {
+        "success": True,
+        "scope": scope,
+        "name": name,
+        "window_minutes": min(window_minutes or LATENCY_WINDOW_MINUTES, LATENCY_WINDOW_MINUTES),
+        "stages": latency_tracker.percentiles(scope, name, window_minutes)
+    }
+
+
+@app.get("/api/slow-queries")
+async def get_slow_queries(form_url: Optional[str] = None, index: Optional[str] = None, limit: int = 50):
+    """Most recent submissions that exceeded the slow query threshold"""
+    conditions, params = [], []
+    if form_url:
+        conditions.append("form_url = ?")
+        params.append(form_url)
+    if index:
+        conditions.append("index_name = ?")
+        params.append(index)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with get_db() as conn:
+        rows = conn.execute(
+            f"SELECT * FROM slow_queries {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            (*params, max(1, min(limit, 500)))
+        ).fetchall()
+
+    slow = []
+    for row in rows:
+        entry = dict(row)
+        entry["normalized_query"] = json.loads(entry["normalized_query"])
+        entry["stage_timings"] = json.loads(entry["stage_timings"] or "{}")
+        slow.append(entry)
+    return {"success": True, "threshold_ms": SLOW_QUERY_THRESHOLD_MS, "slow_queries": slow}
+
+
 @app.post("/submit-form/{form_url}")
 async def submit_enhanced_form(form_url: str, submission_data: FormSubmissionData):
     """
     Enhanced form submission handler that captures all parameter types
     """
+    timer = StageTimer()
     try:
         # Get form configuration
-        form_config = get_form_configuration_by_url(form_url)
-        if not form_config:
-            raise HTTPException(status_code=404, detail="Form not found")
+        with timer.stage("config"):
+            form_config = get_form_configuration_by_url(form_url)
+            if not form_config:
+                raise HTTPException(status_code=404, detail="Form not found")
 
-        # Parse enhanced fields configuration
-        if isinstance(form_config.get('fields_json'), str):
-            form_config['fields'] = json.loads(form_config['fields_json'])
+            # Parse enhanced fields configuration
+            if isinstance(form_config.get('fields_json'), str):
+                form_config['fields'] = json.loads(form_config['fields_json'])
+
+        use_cursor = bool(submission_data.cursor) or submission_data.pagination == "cursor"
+        page_size = max(1, min(int(submission_data.size or 10), MAX_CURSOR_PAGE_SIZE))
 
         # Build comprehensive Elasticsearch query
-        query_body = build_enhanced_elasticsearch_query(
-            submission_data.fields,
-            form_config,
-            submission_data.metadata
-        )
+        with timer.stage("build"):
+            query_body = build_enhanced_elasticsearch_query(
+                submission_data.fields,
+                form_config,
+                submission_data.metadata,
+                pagination={"size": page_size} if use_cursor else None
+            )
+            fingerprint = query_fingerprint(query_body)
 
         # Execute query
-        print(query_body)
-        result = await execute_elasticsearch_query(form_config, query_body)
-        request_obj = ElasticsearchQueryRequest(
-            query=query_body,
-            index_name=form_config.get("index_name"),
-            context=""
+        print(f"query {fingerprint['query_hash'][:12]} shape {fingerprint['shape_hash'][:12]}: {json.dumps(query_body)}")
+        profile = None
+        with timer.stage("es"):
+            if use_cursor:
+                result = execute_cursor_search(form_config, query_body, page_size, submission_data.cursor)
+            elif submission_data.profile:
+                # Profiled runs bypass the result cache so the timings are real
+                result = await execute_elasticsearch_query(form_config, {**query_body, "profile": True}, use_cache=False)
+            else:
+                result = await execute_elasticsearch_query(form_config, query_body)
+
+        # Natural-language questions are optional and generated off the critical path
+        question_ticket = None
+        with timer.stage("questions"):
+            if submission_data.metadata.get("generateQuestions", True):
+                try:
+                    question_ticket = schedule_question_generation(query_body, form_config.get("index_name"))
+                except Exception as e:
+                    print(f"Failed to schedule question generation: {e}")
+
+        with timer.stage("post_process"):
+            if submission_data.profile and not use_cursor:
+                profile = summarize_profile(result.pop("profile", None), list(submission_data.fields))
+            response = {
+                "success": True,
+                "results": result.get("hits", []),
+                "total": result.get("total", 0),
+                "took": result.get("took", 0),
+                "query": query_body,
+                "query_hash": fingerprint["query_hash"],
+                "shape_hash": fingerprint["shape_hash"],
+                "profile": profile,
+                "metadata": {
+                    "form_url": form_url,
+                    "field_count": len(submission_data.fields),
+                    "timestamp": submission_data.metadata.get("timestamp")
+                },
+                "next_cursor": result.get("next_cursor"),
+                "generated_questions": question_ticket.get("questions") if question_ticket else None,
+                "questions_ticket": question_ticket.get("ticket") if question_ticket else None,
+                "questions_status": question_ticket.get("status") if question_ticket else None,
+                "timings": dict(timer.timings)
+            }
+
+        # Render here so serialization is part of the measured time
+        with timer.stage("serialize"):
+            json_response = JSONResponse(response)
+
+        timings = {**timer.timings, "es_took": result.get("took", 0), "total": timer.total_ms()}
+        json_response.headers["Server-Timing"] = ", ".join(
+            f"{stage};dur={value}" for stage, value in timings.items() if stage != "es_took"
         )
-        generated_questions=None
-        try:
-            generated_questions= await convert_query_to_questions(request_obj)
-        except Exception as e:
-            print(generated_questions)
+
+        latency_tracker.record_submission(form_url, form_config.get("index_name"), timings)
+        if timings["total"] >= SLOW_QUERY_THRESHOLD_MS:
+            log_slow_query(form_url, form_config.get("index_name"), query_body, timings, timings["total"], result)
 
         # Log submission for analytics
-        log_form_submission(form_url, submission_data, result)
+        log_form_submission(form_url, submission_data, result, timings)
 
-        return {
-            "success": True,
-            "results": result.get("hits", []),
-            "total": result.get("total", 0),
-            "took": result.get("took", 0),
-            "query": query_body,
-            "metadata": {
-                "form_url": form_url,
-                "field_count": len(submission_data.fields),
-                "timestamp": submission_data.metadata.get("timestamp")
-            },
-            "generated_questions": generated_questions.generated_questions if generated_questions is not None else None
-        }
+        return json_response
 
     except Exception as e:
         print(f"Form submission error: {str(e)}")
@@ -2808,7 +4492,8 @@ async def submit_enhanced_form(form_url: str, submission_data: FormSubmissionDat
             "details": f"Failed to process form submission for {form_url}"
         }
 
-def build_enhanced_elasticsearch_query(fields: Dict[str, Any], form_config: Dict, metadata: Dict) -> Dict:
+def build_enhanced_elasticsearch_query(fields: Dict[str, Any], form_config: Dict, metadata: Dict,
+                                       pagination: Optional[Dict[str, Any]] = None) -> Dict:
     """
     Build comprehensive Elasticsearch query from form fields with enhanced logic
     """
@@ -2819,6 +4504,11 @@ def build_enhanced_elasticsearch_query(fields: Dict[str, Any], form_config: Dict
     #print(temp2)
     #query=build_es_query_v2(temp2)
 
+    # Non-scoring clauses go to bool.filter when the form opts in
+    query_options = form_config.get("query_options", {})
+    filter_context = bool(query_options.get("filter_context", False))
+    optimize = bool(query_options.get("optimize", True))
+
     try:
         root_field_list, inner_field_list, _, nested_field_list, _ ,parent_child_list= fetch_field_lists(form_config.get("environment"), form_config.get("index_name"))
         print(parent_child_list)
@@ -2832,10 +4522,12 @@ def build_enhanced_elasticsearch_query(fields: Dict[str, Any], form_config: Dict
             tempv3=build_query_v6(fieldsv1,"AND",form_config.get("index_name"),nested_field_list,inner_field_list)
             print(tempv3)
             print("......")
-            tempv5=transform_query_v6(tempv3)
+            tempv5=transform_query_v6(tempv3, pagination)
             print(tempv5)
             print("......")
-            queryv3=build_es_query_v3(tempv5)
+            queryv3=build_es_query_v3(tempv5, filter_context=filter_context)
+            if optimize:
+                queryv3=optimize_es_query(queryv3)
             print(queryv3)
             print("*******************************************************###########")
             return queryv3
@@ -2843,9 +4535,11 @@ def build_enhanced_elasticsearch_query(fields: Dict[str, Any], form_config: Dict
             print("*******************************************************")
             tempv1=build_query_v6(fields,"AND",form_config.get("index_name"))
             print(tempv1)
-            tempv2=transform_query_v6(tempv1)
+            tempv2=transform_query_v6(tempv1, pagination)
             print(tempv2)
-            queryv2=build_es_query_v3(tempv2)
+            queryv2=build_es_query_v3(tempv2, filter_context=filter_context)
+            if optimize:
+                queryv2=optimize_es_query(queryv2)
             print(queryv2)
             print("*******************************************************")
             return queryv2
@@ -3068,66 +4762,685 @@ def build_multi_value_query(field_name: str, field_data: Dict, field_config: Dic
         # Default to OR
         return {"terms": {f"{field_name}": values}}
 
-def build_date_query(field_name: str, field_value: str, field_config: Dict) -> Dict:
-    """
-    Build date range query
-    """
+def build_date_query(field_name: str, field_value: str, field_config: Dict) -> Dict:
+    """
+    Build date range query
+    """
+    try:
+        # Handle date range if value contains special syntax
+        if ' TO ' in field_value:
+            start_date, end_date = field_value.split(' TO ')
+            return {
+                "range": {
+                    field_name: {
+                        "gte": start_date.strip(),
+                        "lte": end_date.strip(),
+                        "format": "yyyy-MM-dd||yyyy-MM-dd HH:mm:ss"
+                    }
+                }
+            }
+        else:
+            # Single date - match the entire day
+            return {
+                "range": {
+                    field_name: {
+                        "gte": field_value,
+                        "lt": field_value + "||+1d",
+                        "format": "yyyy-MM-dd"
+                    }
+                }
+            }
+    except Exception:
+        # Fallback to exact match
+        return {"term": {field_name: field_value}}
+
+def build_search_aggregations(form_config: Dict) -> Dict:
+    """
+    Build aggregations for faceted search
+    """
+    aggs = {}
+
+    for field_name, field_config in form_config.get('fields', {}).items():
+        input_type = field_config.get('inputType')
+
+        # Add aggregations for facetable fields
+        if input_type in ['dropdown', 'checkbox', 'radio']:
+            aggs[f"{field_name}_facet"] = {
+                "terms": {
+                    "field": f"{field_name}",
+                    "size": 10
+                }
+            }
+        elif input_type in ['date', 'date-range']:
+            aggs[f"{field_name}_histogram"] = {
+                "date_histogram": {
+                    "field": field_name,
+                    "calendar_interval": "month"
+                }
+            }
+
+    return aggs
+
+def format_search_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a raw Elasticsearch search response for the form UI"""
+    return {
+        "hits": [
+            {
+                "id": hit.get("_id"),
+                "score": hit.get("_score"),
+                "data": hit.get("_source", {}),
+                "highlight": hit.get("highlight", {})
+            }
+            for hit in result.get("hits", {}).get("hits", [])
+        ],
+        "total": result.get("hits", {}).get("total", {}).get("value", 0),
+        "took": result.get("took", 0),
+        "aggregations": result.get("aggregations", {}),
+        **({"profile": result["profile"]} if "profile" in result else {})
+    }
+
+
+# ================================
+# Query profiling
+# ================================
+
+PROFILE_DESCRIPTION_LENGTH = 200
+# Field references inside Lucene query descriptions: "status:A", "[field=status]"
+PROFILE_FIELD_PATTERN = re.compile(r"(?:field=)?([A-Za-z_@][\w.@-]*)(?=:|\])")
+
+
+def query_structure_fields(group: Dict[str, Any]) -> List[str]:
+    """Condition fields of a build_es_query_v3 query structure"""
+    fields = [c["field"] for c in group.get("conditions", []) if c.get("field")]
+    for subgroup in group.get("groups", []):
+        fields.extend(query_structure_fields(subgroup))
+    return fields
+
+
+def _profile_form_fields(description: str, form_fields: List[str]) -> List[str]:
+    """Map field names in a profile description back to form field names"""
+    matched = []
+    for name in PROFILE_FIELD_PATTERN.findall(description or ""):
+        if name.endswith(".keyword"):
+            name = name[:-len(".keyword")]
+        if name in form_fields and name not in matched:
+            matched.append(name)
+    return matched
+
+
+def condense_profile_node(node: Dict[str, Any], form_fields: List[str]) -> Dict[str, Any]:
+    """Keep type, time and field attribution of one profiled query clause"""
+    children = [condense_profile_node(child, form_fields) for child in node.get("children", [])]
+    description = node.get("description", "")
+    if children:
+        fields = []
+        for child in children:
+            fields.extend(f for f in child["fields"] if f not in fields)
+    else:
+        fields = _profile_form_fields(description, form_fields)
+
+    condensed = {
+        "type": node.get("type"),
+        "description": description[:PROFILE_DESCRIPTION_LENGTH],
+        "time_ms": round(node.get("time_in_nanos", 0) / 1e6, 3),
+        "fields": fields
+    }
+    if node.get("type") == "ToParentBlockJoinQuery":
+        condensed["nested"] = True
+    if children:
+        condensed["children"] = children
+    return condensed
+
+
+def _merge_profile_nodes(total: Dict[str, Any], node: Dict[str, Any]):
+    """Add one shard's timings into the running tree, matching children by position"""
+    total["time_ms"] = round(total["time_ms"] + node["time_ms"], 3)
+    total_children = total.get("children", [])
+    for index, child in enumerate(node.get("children", [])):
+        if index < len(total_children) and total_children[index]["type"] == child["type"]:
+            _merge_profile_nodes(total_children[index], child)
+        else:
+            total_children.append(json.loads(json.dumps(child)))
+    if total_children:
+        total["children"] = total_children
+
+
+def summarize_profile(profile: Optional[Dict[str, Any]], form_fields: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Condense an Elasticsearch profile response: query trees summed over shards,
+    leaf time per form field and the field whose clauses cost the most.
+    """
+    if not profile:
+        return None
+
+    query_tree: List[Dict[str, Any]] = []
+    rewrite_ms = 0.0
+    collector_ms = 0.0
+    shards = profile.get("shards", [])
+    for shard in shards:
+        for search in shard.get("searches", []):
+            rewrite_ms += search.get("rewrite_time", 0) / 1e6
+            collector_ms += sum(c.get("time_in_nanos", 0) for c in search.get("collector", [])) / 1e6
+            for index, node in enumerate(search.get("query", [])):
+                condensed = condense_profile_node(node, form_fields)
+                if index < len(query_tree):
+                    _merge_profile_nodes(query_tree[index], condensed)
+                else:
+                    query_tree.append(condensed)
+
+    by_field: Dict[str, float] = {}
+
+    def collect_leaves(node):
+        if node.get("children"):
+            for child in node["children"]:
+                collect_leaves(child)
+            return
+        for field in node["fields"] or ["(unmapped)"]:
+            by_field[field] = round(by_field.get(field, 0) + node["time_ms"] / max(len(node["fields"]), 1), 3)
+
+    for node in query_tree:
+        collect_leaves(node)
+
+    return {
+        "shards": len(shards),
+        "query_ms": round(sum(node["time_ms"] for node in query_tree), 3),
+        "rewrite_ms": round(rewrite_ms, 3),
+        "collector_ms": round(collector_ms, 3),
+        "by_field": dict(sorted(by_field.items(), key=lambda item: item[1], reverse=True)),
+        "dominant_field": max(by_field, key=by_field.get) if by_field else None,
+        "query_tree": query_tree
+    }
+
+
+# ================================
+# Cursor pagination (point-in-time + search_after)
+# ================================
+
+MAX_CURSOR_PAGE_SIZE = int(os.getenv("MAX_CURSOR_PAGE_SIZE", "1000"))
+PIT_KEEP_ALIVE = os.getenv("PIT_KEEP_ALIVE", "2m")
+
+
+class CursorError(Exception):
+    """Raised for malformed, mismatched or expired continuation tokens"""
+
+
+def encode_search_cursor(state: Dict[str, Any]) -> str:
+    """Opaque, URL-safe continuation token"""
+    raw = json.dumps(state, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(token: str) -> Dict[str, Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise CursorError("Invalid cursor")
+    if not isinstance(state, dict) or "pit" not in state or "after" not in state:
+        raise CursorError("Invalid cursor")
+    return state
+
+
+def get_search_target(form_config: Dict) -> Tuple[str, Optional[tuple], str]:
+    """Resolve (host_url, auth, index_name) for a form configuration"""
+    env_id = form_config.get('environment')
+    index_name = form_config.get('index_name')
+    if not env_id or not index_name:
+        raise Exception("Missing environment or index configuration")
+
+    environments = get_elasticsearch_environments()
+    env = next((e for e in environments if e['id'] == env_id), None)
+    if not env:
+        raise Exception(f"Environment {env_id} not found")
+
+    host_url = env['host_url']
+    if not host_url.startswith(('http://', 'https://')):
+        host_url = f"http://{host_url}"
+
+    auth = None
+    if env.get('username') and env.get('password'):
+        auth = (env['username'], env['password'])
+
+    return host_url, auth, index_name
+
+
+def open_point_in_time(host_url: str, index_name: str, auth: Optional[tuple], keep_alive: str = PIT_KEEP_ALIVE) -> str:
+    response = requests.post(
+        f"{host_url}/{index_name}/_pit?keep_alive={keep_alive}",
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to open point-in-time: {response.status_code} - {response.text}")
+    return response.json()["id"]
+
+
+def close_point_in_time(host_url: str, pit_id: str, auth: Optional[tuple]):
+    try:
+        requests.delete(f"{host_url}/_pit", json={"id": pit_id}, auth=auth, timeout=10, verify=False)
+    except Exception as e:
+        print(f"Failed to close point-in-time: {e}")
+
+
+def execute_cursor_search(form_config: Dict, query_body: Dict, size: int, cursor: Optional[str] = None) -> Dict:
+    """
+    Run one page of a search with point-in-time + search_after.
+
+    The first call (no cursor) opens a PIT; each page returns an opaque
+    ``next_cursor`` until the results are exhausted, at which point the PIT is
+    closed. The cursor is bound to the query it was issued for.
+    """
+    host_url, auth, index_name = get_search_target(form_config)
+    query_hash = normalized_query_hash(query_body.get("query", {}), index_name)
+
+    if cursor:
+        state = decode_search_cursor(cursor)
+        if state.get("q") != query_hash:
+            raise CursorError("Cursor does not belong to this query")
+        pit_id, search_after = state["pit"], state["after"]
+        # The cursor comes from the client; never trust its page size
+        size = max(1, min(int(state.get("size", size)), MAX_CURSOR_PAGE_SIZE))
+    else:
+        pit_id, search_after = open_point_in_time(host_url, index_name, auth), None
+
+    body = {key: value for key, value in query_body.items() if key not in ("from", "size", "sort", "pit", "search_after")}
+    body["size"] = size
+    body["pit"] = {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}
+    body["sort"] = with_sort_tiebreaker(query_body.get("sort"))
+    if search_after:
+        body["search_after"] = search_after
+        body["track_total_hits"] = False
+
+    # PIT searches must not name an index in the URL
+    response = requests.post(f"{host_url}/_search", json=body, auth=auth, timeout=30, verify=False)
+    if response.status_code == 404 and "search_context_missing" in response.text:
+        raise CursorError("Cursor expired, please restart the search")
+    if response.status_code != 200:
+        raise Exception(f"Elasticsearch query failed: {response.status_code} - {response.text}")
+
+    result = response.json()
+    hits = result.get("hits", {}).get("hits", [])
+    pit_id = result.get("pit_id", pit_id)
+
+    next_cursor = None
+    if len(hits) == size and hits:
+        next_cursor = encode_search_cursor({
+            "pit": pit_id,
+            "after": hits[-1].get("sort"),
+            "size": size,
+            "q": query_hash
+        })
+    else:
+        close_point_in_time(host_url, pit_id, auth)
+
+    formatted_result = format_search_response(result)
+    formatted_result["total"] = formatted_result["total"] if not search_after else None
+    formatted_result["next_cursor"] = next_cursor
+    return formatted_result
+
+
+# ================================
+# Streaming export of form results
+# ================================
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_MAX_SLICES = int(os.getenv("EXPORT_MAX_SLICES", "8"))
+
+
+class FormExportRequest(BaseModel):
+    fields: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    format: str = "ndjson"  # ndjson | csv
+    source: Optional[List[str]] = None  # _source filtering
+    slices: int = 1  # parallel sliced PIT readers
+
+
+def iterate_pit_hits(host_url: str, auth: Optional[tuple], pit_id: str, query_body: Dict,
+                     batch_size: int = EXPORT_BATCH_SIZE, slice_spec: Optional[Dict[str, int]] = None):
+    """Yield every hit of a query page by page with search_after over an open PIT"""
+    search_after = None
+    while True:
+        body = dict(query_body)
+        body["size"] = batch_size
+        body["pit"] = {"id": pit_id, "keep_alive": PIT_KEEP_ALIVE}
+        body["sort"] = [{"_shard_doc": {"order": "asc"}}]
+        body["track_total_hits"] = False
+        if slice_spec:
+            body["slice"] = slice_spec
+        if search_after:
+            body["search_after"] = search_after
+
+        response = requests.post(f"{host_url}/_search", json=body, auth=auth, timeout=60, verify=False)
+        if response.status_code != 200:
+            raise Exception(f"Export query failed: {response.status_code} - {response.text}")
+
+        hits = response.json().get("hits", {}).get("hits", [])
+        for hit in hits:
+            yield hit
+        if len(hits) < batch_size:
+            return
+        search_after = hits[-1]["sort"]
+
+
+def iterate_all_hits(host_url: str, auth: Optional[tuple], index_name: str, query_body: Dict, slices: int = 1):
+    """
+    Yield all hits for a query using a point-in-time. With slices > 1 the PIT is
+    read by parallel sliced workers that feed a bounded queue, so memory stays
+    constant whatever the result size.
+    """
+    body = {key: value for key, value in query_body.items()
+            if key not in ("from", "size", "sort", "aggs", "aggregations", "pit", "search_after")}
+    pit_id = open_point_in_time(host_url, index_name, auth)
+
+    try:
+        if slices <= 1:
+            yield from iterate_pit_hits(host_url, auth, pit_id, body)
+            return
+
+        hit_queue: "queue.Queue" = queue.Queue(maxsize=EXPORT_BATCH_SIZE * 2)
+        done_marker = object()
+        stop_event = threading.Event()
+
+        def offer(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    hit_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_slice(slice_id: int):
+            try:
+                for hit in iterate_pit_hits(host_url, auth, pit_id, body,
+                                            slice_spec={"id": slice_id, "max": slices}):
+                    if not offer(hit):
+                        return
+            except Exception as e:
+                offer(e)
+            finally:
+                offer(done_marker)
+
+        with ThreadPoolExecutor(max_workers=slices) as executor:
+            for slice_id in range(slices):
+                executor.submit(read_slice, slice_id)
+            try:
+                finished = 0
+                while finished < slices:
+                    item = hit_queue.get()
+                    if item is done_marker:
+                        finished += 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                # Stop the workers if the client went away or a slice failed
+                stop_event.set()
+    finally:
+        close_point_in_time(host_url, pit_id, auth)
+
+
+def export_columns(field_index: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    CSV columns from the mapping, so fields missing from the first documents
+    still get a column: every leaf field, with a nested field as one column
+    holding its objects as JSON. Multi-fields are not in _source.
+    """
+    return [path for path, info in field_index.items()
+            if not info.get("multi_field_of") and info["type"] != "object" and info["nested_path"] is None]
+
+
+def source_value(data: Any, parts: List[str]) -> Any:
+    """Value at a dotted path in _source; arrays of objects give the list of their values"""
+    if not parts:
+        return data
+    if isinstance(data, list):
+        values = [v for v in (source_value(item, parts) for item in data) if v is not None]
+        return values or None
+    if isinstance(data, dict):
+        # _source may hold the path as nested objects or as literal dotted keys
+        for end in range(len(parts), 0, -1):
+            key = ".".join(parts[:end])
+            if key in data:
+                return source_value(data[key], parts[end:])
+    return None
+
+
+def export_cell(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return "" if value is None else value
+
+
+def stream_export_rows(hits, export_format: str, columns: List[str]):
+    """
+    Serialize hits one line at a time as NDJSON or CSV. If reading fails
+    midway an error line is written and the error re-raised, which aborts the
+    response so the download fails instead of looking complete.
+    """
+    rows = 0
+    try:
+        if export_format == "ndjson":
+            for hit in hits:
+                yield json.dumps({"_id": hit.get("_id"), **hit.get("_source", {})}, default=str) + "\n"
+                rows += 1
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["_id"] + columns)
+        split_columns = [column.split(".") for column in columns]
+        for hit in hits:
+            source = hit.get("_source", {})
+            writer.writerow([hit.get("_id")] + [export_cell(source_value(source, parts)) for parts in split_columns])
+            rows += 1
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if rows == 0:
+            yield buffer.getvalue()
+    except Exception as e:
+        logger.error(f"Export failed after {rows} rows: {e}")
+        if export_format == "ndjson":
+            yield json.dumps({"_export_error": str(e), "rows_written": rows}) + "\n"
+        else:
+            yield f"# EXPORT FAILED after {rows} rows: {e}\n"
+        raise
+
+
+@app.post("/export-form/{form_url}")
+async def export_form_results(form_url: str, export_request: FormExportRequest):
+    """Stream every document matching a form query as CSV or NDJSON"""
+    form_config = get_form_configuration_by_url(form_url)
+    if not form_config:
+        raise HTTPException(status_code=404, detail="Form not found")
+
+    export_format = export_request.format.lower()
+    if export_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+
+    query_body = build_enhanced_elasticsearch_query(export_request.fields, form_config, export_request.metadata)
+    if not query_body:
+        raise HTTPException(status_code=400, detail="Failed to build query for export")
+    if export_request.source:
+        query_body["_source"] = export_request.source
+
     try:
-        # Handle date range if value contains special syntax
-        if ' TO ' in field_value:
-            start_date, end_date = field_value.split(' TO ')
-            return {
-                "range": {
-                    field_name: {
-                        "gte": start_date.strip(),
-                        "lte": end_date.strip(),
-                        "format": "yyyy-MM-dd||yyyy-MM-dd HH:mm:ss"
-                    }
-                }
-            }
+        host_url, auth, index_name = get_search_target(form_config)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    columns = []
+    if export_format == "csv":
+        if export_request.source and not any("*" in field for field in export_request.source):
+            columns = list(export_request.source)
         else:
-            # Single date - match the entire day
-            return {
-                "range": {
-                    field_name: {
-                        "gte": field_value,
-                        "lt": field_value + "||+1d",
-                        "format": "yyyy-MM-dd"
-                    }
-                }
-            }
-    except Exception:
-        # Fallback to exact match
-        return {"term": {field_name: field_value}}
+            field_index = await asyncio.to_thread(fetch_field_index, host_url, auth, index_name)
+            if not field_index:
+                raise HTTPException(status_code=502, detail="Could not read the index mapping for the CSV header")
+            columns = [c for c in export_columns(field_index)
+                       if not export_request.source or any(fnmatch.fnmatch(c, f) for f in export_request.source)]
+
+    slices = max(1, min(export_request.slices, EXPORT_MAX_SLICES))
+    hits = iterate_all_hits(host_url, auth, index_name, query_body, slices)
+
+    filename = f"{form_url}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export_rows(hits, export_format, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-def build_search_aggregations(form_config: Dict) -> Dict:
+
+# ================================
+# Search result cache
+# ================================
+
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", "60"))
+
+
+class SearchResultCache:
     """
-    Build aggregations for faceted search
+    Byte-bounded LRU cache with TTL for formatted search results, keyed by
+    (environment, index, query hash). Entries for an index are dropped when the
+    application writes to that index.
     """
-    aggs = {}
 
-    for field_name, field_config in form_config.get('fields', {}).items():
-        input_type = field_config.get('inputType')
-
-        # Add aggregations for facetable fields
-        if input_type in ['dropdown', 'checkbox', 'radio']:
-            aggs[f"{field_name}_facet"] = {
-                "terms": {
-                    "field": f"{field_name}",
-                    "size": 10
-                }
-            }
-        elif input_type in ['date', 'date-range']:
-            aggs[f"{field_name}_histogram"] = {
-                "date_histogram": {
-                    "field": field_name,
-                    "calendar_interval": "month"
-                }
+    def __init__(self, max_bytes: int = SEARCH_CACHE_MAX_BYTES, ttl: int = SEARCH_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(env_id: Any, index_name: str, query_body: Dict[str, Any]) -> tuple:
+        return (str(env_id), index_name, normalized_query_hash(query_body))
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry["expires_at"] < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def put(self, key: tuple, value: Dict[str, Any]):
+        size = len(json.dumps(value, default=str))
+        if self.ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"value": value, "size": size, "expires_at": time.monotonic() + self.ttl}
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_index(self, env_id: Any, index_name: str) -> int:
+        """Drop every entry whose search target covers the written index"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[0] == str(env_id) and _index_target_matches(key[1], index_name)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
             }
 
-    return aggs
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry["size"]
+
+
+def _index_target_matches(search_target: str, written_index: str) -> bool:
+    """Check whether a search target (name, comma list or wildcard) covers an index"""
+    for part in str(search_target).split(','):
+        part = part.strip()
+        if part and (part == written_index or fnmatch.fnmatch(written_index, part)
+                     or fnmatch.fnmatch(part, written_index)):
+            return True
+    return False
+
+
+search_result_cache = SearchResultCache()
+
+
+def invalidate_index_caches(env_id: Any, index_names):
+    """Called after the application writes to one or more indices"""
+    if isinstance(index_names, str):
+        index_names = [index_names]
+    for index_name in index_names or []:
+        if index_name:
+            search_result_cache.invalidate_index(env_id, index_name)
+            field_values_cache.invalidate_index(env_id, index_name)
+            mapping_cache.invalidate_env(env_id, index_name)
+
+
+@app.post("/api/query-fingerprint")
+async def get_query_fingerprint(request: Request):
+    """Normalized form, exact hash and shape hash of an Elasticsearch search body"""
+    try:
+        query_body = await request.json()
+        if not isinstance(query_body, dict):
+            return JSONResponse({"success": False, "error": "Query body must be a JSON object"})
+        return {"success": True, **query_fingerprint(query_body)}
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)})
+
+
+@app.get("/api/search-cache/stats")
+async def get_search_cache_stats():
+    """Hit/miss counters and size of the search result cache"""
+    return {"success": True, "stats": search_result_cache.stats()}
+
 
-async def execute_elasticsearch_query(form_config: Dict, query_body: Dict) -> Dict:
+@app.delete("/api/search-cache")
+async def clear_search_cache():
+    """Drop all cached search results"""
+    search_result_cache.clear()
+    return {"success": True, "message": "Search cache cleared"}
+
+
+async def execute_elasticsearch_query(form_config: Dict, query_body: Dict, use_cache: bool = True) -> Dict:
     """
     Execute the query against Elasticsearch
     """
@@ -3139,6 +5452,12 @@ async def execute_elasticsearch_query(form_config: Dict, query_body: Dict) -> Di
         if not env_id or not index_name:
             raise Exception("Missing environment or index configuration")
 
+        cache_key = SearchResultCache.make_key(env_id, index_name, query_body) if use_cache else None
+        if cache_key:
+            cached = search_result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         # Get Elasticsearch environment details
         environments = get_elasticsearch_environments()
         env = next((e for e in environments if e['id'] == env_id), None)
@@ -3169,20 +5488,10 @@ async def execute_elasticsearch_query(form_config: Dict, query_body: Dict) -> Di
         result = response.json()
 
         # Format response
-        formatted_result = {
-            "hits": [
-                {
-                    "id": hit.get("_id"),
-                    "score": hit.get("_score"),
-                    "data": hit.get("_source", {}),
-                    "highlight": hit.get("highlight", {})
-                }
-                for hit in result.get("hits", {}).get("hits", [])
-            ],
-            "total": result.get("hits", {}).get("total", {}).get("value", 0),
-            "took": result.get("took", 0),
-            "aggregations": result.get("aggregations", {})
-        }
+        formatted_result = format_search_response(result)
+
+        if cache_key:
+            search_result_cache.put(cache_key, formatted_result)
 
         return formatted_result
 
@@ -3190,46 +5499,382 @@ async def execute_elasticsearch_query(form_config: Dict, query_body: Dict) -> Di
         print(f"Elasticsearch query error: {str(e)}")
         raise Exception(f"Search execution failed: {str(e)}")
 
-def log_form_submission(form_url: str, submission_data: FormSubmissionData, result: Dict):
+# ================================
+# Batch search (_msearch)
+# ================================
+
+class BatchSearchItem(BaseModel):
+    # Either a saved form submission ...
+    form_url: Optional[str] = None
+    fields: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    # ... or a raw query structure for build_es_query_v3
+    env_id: Optional[int] = None
+    index: Optional[str] = None
+    query_structure: Optional[Dict[str, Any]] = None
+    profile: bool = False
+
+
+class BatchSearchRequest(BaseModel):
+    searches: List[BatchSearchItem]
+
+
+def compile_batch_search_item(item: BatchSearchItem) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Return (search target, query body) for one batch entry"""
+    if item.form_url:
+        form_config = get_form_configuration_by_url(item.form_url)
+        if not form_config:
+            raise ValueError(f"Form '{item.form_url}' not found")
+        query_body = build_enhanced_elasticsearch_query(item.fields, form_config, item.metadata)
+        if not query_body:
+            raise ValueError("Failed to build query from form fields")
+        return {"environment": form_config["environment"], "index_name": form_config["index_name"]}, query_body
+
+    if item.query_structure is not None:
+        if not item.env_id:
+            raise ValueError("env_id is required for raw query structures")
+        index_name = item.index or item.query_structure.get("index_name")
+        if not index_name:
+            raise ValueError("index is required for raw query structures")
+        return {"environment": item.env_id, "index_name": index_name}, build_es_query_v3(item.query_structure)
+
+    raise ValueError("Each search needs either form_url or query_structure")
+
+
+def execute_msearch(target: Dict[str, Any], requests_batch: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Send (index, body) pairs to one cluster as a single _msearch request"""
+    host_url, auth, _ = get_search_target(target)
+
+    lines = []
+    for index_name, body in requests_batch:
+        lines.append(json.dumps({"index": index_name}))
+        lines.append(json.dumps(body, default=str))
+    payload = "\n".join(lines) + "\n"
+
+    response = requests.post(
+        f"{host_url}/_msearch",
+        data=payload.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+        auth=auth,
+        timeout=60,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Elasticsearch _msearch failed: {response.status_code} - {response.text}")
+    return response.json().get("responses", [])
+
+
+def batch_search_result(formatted_result: Dict[str, Any], query_body: Dict[str, Any], cached: bool,
+                        profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Per-query entry in the same shape as a /submit-form response"""
+    return {
+        "success": True,
+        "results": formatted_result.get("hits", []),
+        "total": formatted_result.get("total", 0),
+        "took": formatted_result.get("took", 0),
+        "aggregations": formatted_result.get("aggregations", {}),
+        "query": query_body,
+        "cached": cached,
+        "profile": profile
+    }
+
+
+@app.post("/api/batch-search")
+async def batch_search(batch: BatchSearchRequest):
+    """
+    Compile many form submissions or raw query structures and run them with one
+    _msearch per Elasticsearch environment. Results and errors keep the request order.
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(batch.searches)
+    pending_by_env: Dict[Any, List[Tuple[int, Dict[str, Any], Dict[str, Any], Optional[tuple]]]] = {}
+    profile_fields: Dict[int, List[str]] = {}
+
+    for position, item in enumerate(batch.searches):
+        try:
+            target, query_body = compile_batch_search_item(item)
+        except Exception as e:
+            results[position] = {"success": False, "error": str(e)}
+            continue
+
+        if item.profile:
+            # Profiled entries are never served from or written to the cache
+            cache_key = None
+            query_body = {**query_body, "profile": True}
+            profile_fields[position] = list(item.fields) if item.form_url else \
+                query_structure_fields(item.query_structure.get("query", {}))
+        else:
+            cache_key = SearchResultCache.make_key(target["environment"], target["index_name"], query_body)
+            cached = search_result_cache.get(cache_key)
+            if cached is not None:
+                results[position] = batch_search_result(cached, query_body, cached=True)
+                continue
+
+        pending_by_env.setdefault(target["environment"], []).append((position, target, query_body, cache_key))
+
+    async def run_environment(pending):
+        try:
+            responses = await asyncio.to_thread(
+                execute_msearch,
+                pending[0][1],
+                [(target["index_name"], query_body) for _, target, query_body, _ in pending]
+            )
+        except Exception as e:
+            for position, *_ in pending:
+                results[position] = {"success": False, "error": str(e)}
+            return
+
+        for (position, _, query_body, cache_key), response in zip(pending, responses):
+            if "error" in response:
+                error = response["error"]
+                results[position] = {
+                    "success": False,
+                    "error": error.get("reason", str(error)) if isinstance(error, dict) else str(error)
+                }
+                continue
+            formatted_result = format_search_response(response)
+            if cache_key:
+                search_result_cache.put(cache_key, formatted_result)
+                results[position] = batch_search_result(formatted_result, query_body, cached=False)
+            else:
+                profile = summarize_profile(formatted_result.pop("profile", None), profile_fields.get(position, []))
+                results[position] = batch_search_result(formatted_result, query_body, cached=False, profile=profile)
+
+    await asyncio.gather(*(run_environment(pending) for pending in pending_by_env.values()))
+
+    return {
+        "success": all(r and r.get("success") for r in results),
+        "count": len(results),
+        "results": results
+    }
+
+
+
+class QueryModeCompareRequest(BaseModel):
+    fields: Dict[str, Any]
+    metadata: Optional[Dict[str, Any]] = {}
+    size: int = 1000
+    repeats: int = 5
+
+
+@app.post("/api/query-mode-compare/{form_url}")
+async def compare_query_modes(form_url: str, compare: QueryModeCompareRequest):
     """
-    Log form submission for analytics (optional)
+    Run the same submission compiled as-is (unoptimized scoring query), through
+    the optimizer, and in filter-context mode, bypassing the result cache. Reports
+    whether each variant returns the same documents as the unoptimized query along
+    with the Elasticsearch "took" figures for each.
     """
+    form_config = get_form_configuration_by_url(form_url)
+    if not form_config:
+        raise HTTPException(status_code=404, detail="Form not found")
+
+    size = max(1, min(compare.size, MAX_CURSOR_PAGE_SIZE))
+    repeats = max(1, min(compare.repeats, 50))
+    modes = {}
+
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+        for mode, filter_context, optimize in (("unoptimized", False, False),
+                                               ("optimized", False, True),
+                                               ("filter", True, True)):
+            mode_config = {
+                **form_config,
+                "query_options": {**form_config.get("query_options", {}),
+                                  "filter_context": filter_context, "optimize": optimize}
+            }
+            query_body = build_enhanced_elasticsearch_query(compare.fields, mode_config, compare.metadata or {})
+            query_body = {**query_body, "size": size, "track_total_hits": True}
+            query_body.pop("from", None)
+
+            timings = []
+            result = None
+            for _ in range(repeats):
+                result = await execute_elasticsearch_query(form_config, query_body, use_cache=False)
+                timings.append(result.get("took", 0))
+
+            first_run = timings[0]
+            timings.sort()
+            modes[mode] = {
+                "query": query_body,
+                "total": result.get("total", 0),
+                "ids": {hit["id"] for hit in result.get("hits", [])},
+                "took_ms": {
+                    "first": first_run,
+                    "min": timings[0],
+                    "median": timings[len(timings) // 2],
+                    "max": timings[-1]
+                }
+            }
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)})
 
-            # Create submissions log table if it doesn't exist
-            cursor.execute('''
-                           CREATE TABLE IF NOT EXISTS form_submissions (
-                                                                           id INTEGER PRIMARY KEY AUTOINCREMENT,
-                                                                           form_url TEXT NOT NULL,
-                                                                           fields_data TEXT NOT NULL,
-                                                                           result_count INTEGER,
-                                                                           response_time INTEGER,
-                                                                           user_agent TEXT,
-                                                                           ip_address TEXT,
-                                                                           created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                           )
-                           ''')
-
-            # Insert submission log
-            cursor.execute('''
-                           INSERT INTO form_submissions
-                               (form_url, fields_data, result_count, response_time, user_agent)
-                           VALUES (?, ?, ?, ?, ?)
-                           ''', (
-                               form_url,
-                               json.dumps(submission_data.fields),
-                               result.get("total", 0),
-                               result.get("took", 0),
-                               submission_data.metadata.get("userAgent", "")
-                           ))
+    baseline = modes["unoptimized"]
+    # ID sets are only comparable when the whole result set fits in one page
+    complete = baseline["total"] <= size
+    report = {}
+    for mode, data in modes.items():
+        report[mode] = {
+            "total": data["total"],
+            "took_ms": data["took_ms"],
+            "query": data["query"],
+            "same_total": data["total"] == baseline["total"],
+            "same_ids": (data["ids"] == baseline["ids"]) if complete else None,
+            "missing": sorted(baseline["ids"] - data["ids"]) if complete else [],
+            "extra": sorted(data["ids"] - baseline["ids"]) if complete else []
+        }
 
-            conn.commit()
+    return {
+        "success": True,
+        "equivalent": all(m["same_total"] and m["same_ids"] is not False for m in report.values()),
+        "modes": report
+    }
+
+# ================================
+# Submission analytics writer
+# ================================
+
+SUBMISSION_LOG_QUEUE_SIZE = int(os.getenv("SUBMISSION_LOG_QUEUE_SIZE", "5000"))
+SUBMISSION_LOG_BATCH_SIZE = int(os.getenv("SUBMISSION_LOG_BATCH_SIZE", "200"))
+SUBMISSION_LOG_FLUSH_INTERVAL = float(os.getenv("SUBMISSION_LOG_FLUSH_INTERVAL", "1.0"))
+SUBMISSION_RETENTION_DAYS = int(os.getenv("SUBMISSION_RETENTION_DAYS", "90"))
+SUBMISSION_PURGE_INTERVAL = 3600
+
+submission_log_queue: Optional[asyncio.Queue] = None
+_submission_log_task: Optional[asyncio.Task] = None
+submission_log_stats = {"queued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0, "purged": 0}
+
+
+def _write_submission_rows(rows: List[tuple]):
+    """Insert a batch of submission rows in one transaction"""
+    with get_db() as conn:
+        conn.executemany(
+            """
+            INSERT INTO form_submissions
+                (form_url, fields_data, result_count, response_time, user_agent, stage_timings)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+        conn.commit()
+
+
+def purge_old_submissions(retention_days: int = SUBMISSION_RETENTION_DAYS) -> int:
+    """Delete submission rows older than the retention window"""
+    if retention_days <= 0:
+        return 0
+    with get_db() as conn:
+        cursor = conn.execute(
+            "DELETE FROM form_submissions WHERE created_at < datetime('now', ?)",
+            (f"-{retention_days} days",)
+        )
+        conn.commit()
+        return cursor.rowcount
 
+
+def log_form_submission(form_url: str, submission_data: FormSubmissionData, result: Dict,
+                        timings: Optional[Dict[str, float]] = None):
+    """
+    Queue a form submission for analytics. Rows are written in batches by the
+    background writer; when the queue is full the row is dropped and counted.
+    """
+    # response_time is end-to-end, not just ES "took"
+    row = (
+        form_url,
+        json.dumps(submission_data.fields),
+        result.get("total", 0),
+        round(timings["total"]) if timings else result.get("took", 0),
+        submission_data.metadata.get("userAgent", ""),
+        json.dumps(timings) if timings else None
+    )
+
+    if submission_log_queue is None:
+        # Writer not running (e.g. called outside the app lifecycle)
+        try:
+            _write_submission_rows([row])
+            submission_log_stats["written"] += 1
+        except Exception as e:
+            submission_log_stats["failed"] += 1
+            print(f"Failed to log form submission: {str(e)}")
+        return
+
+    try:
+        submission_log_queue.put_nowait(row)
+        submission_log_stats["queued"] += 1
+    except asyncio.QueueFull:
+        # Don't slow down or fail the request if analytics can't keep up
+        submission_log_stats["dropped"] += 1
+
+
+async def _flush_submission_rows(rows: List[tuple]):
+    try:
+        await asyncio.to_thread(_write_submission_rows, rows)
+        submission_log_stats["written"] += len(rows)
+        submission_log_stats["batches"] += 1
     except Exception as e:
-        print(f"Failed to log form submission: {str(e)}")
-        # Don't fail the request if logging fails
+        submission_log_stats["failed"] += len(rows)
+        print(f"Failed to write {len(rows)} form submissions: {str(e)}")
+
+
+async def submission_log_writer():
+    """Drain the submission queue in batches; also applies the retention policy"""
+    last_purge = 0.0
+    stopping = False
+    while not stopping:
+        rows = []
+        deadline = time.monotonic() + SUBMISSION_LOG_FLUSH_INTERVAL
+        row = await submission_log_queue.get()
+        while True:
+            if row is None:
+                # Shutdown sentinel: flush what we have and exit
+                stopping = True
+                break
+            rows.append(row)
+            remaining = deadline - time.monotonic()
+            if len(rows) >= SUBMISSION_LOG_BATCH_SIZE or remaining <= 0:
+                break
+            try:
+                row = await asyncio.wait_for(submission_log_queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+        if rows:
+            await _flush_submission_rows(rows)
+
+        if time.monotonic() - last_purge > SUBMISSION_PURGE_INTERVAL:
+            last_purge = time.monotonic()
+            try:
+                submission_log_stats["purged"] += await asyncio.to_thread(purge_old_submissions)
+            except Exception as e:
+                print(f"Failed to purge old form submissions: {str(e)}")
+
+
+def start_submission_log_writer():
+    global submission_log_queue, _submission_log_task
+    submission_log_queue = asyncio.Queue(maxsize=SUBMISSION_LOG_QUEUE_SIZE)
+    _submission_log_task = asyncio.create_task(submission_log_writer())
+
+
+async def stop_submission_log_writer():
+    """Stop the writer after it has flushed whatever is still queued"""
+    global submission_log_queue, _submission_log_task
+    if _submission_log_task is not None and submission_log_queue is not None:
+        # Queue order guarantees every row queued before the sentinel is written
+        await submission_log_queue.put(None)
+        await _submission_log_task
+    submission_log_queue = None
+    _submission_log_task = None
+
+
+@app.get("/api/submission-log/stats")
+async def get_submission_log_stats():
+    """Counters of the batched submission analytics writer"""
+    return {
+        "success": True,
+        "stats": {
+            **submission_log_stats,
+            "pending": submission_log_queue.qsize() if submission_log_queue is not None else 0,
+            "queue_size": SUBMISSION_LOG_QUEUE_SIZE,
+            "retention_days": SUBMISSION_RETENTION_DAYS
+        }
+    }
 
 # Enhanced field values endpoint with filtering and pagination
 @app.get("/field-values_v1/{env_id}/{index_name}/{field_name}")
@@ -3244,44 +5889,44 @@ async def get_enhanced_field_values_v1(
     Get field values with search filtering and pagination
     """
     try:
+        # Type-ahead over a complete cached value list needs no Elasticsearch call
+        if search:
+            local_values = local_prefix_values(env_id, index_name, field_name, search, limit)
+            if local_values is not None:
+                return {
+                    "success": True,
+                    "values": local_values,
+                    "total_count": len(local_values),
+                    "search_term": search,
+                    "field_name": field_name,
+                    "strategy": "local"
+                }
+
         # Get environment
-        environments = get_elasticsearch_environments()
-        env = next((e for e in environments if e['id'] == env_id), None)
-        if not env:
-            raise HTTPException(status_code=404, detail="Environment not found")
+        host_url, auth = get_environment_target(env_id)
 
         # Build aggregation query
-        query = {
-            "size": 0,
-            "aggs": {
-                "unique_values": {
-                    "terms": {
-                        "field": f"{field_name}.keyword" if not field_name.endswith('.keyword') else field_name,
-                        "size": limit,
-                        "order": {"_count": "desc"}
-                    }
-                }
+        terms = {
+            "terms": {
+                "field": f"{field_name}.keyword" if not field_name.endswith('.keyword') else field_name,
+                "size": limit,
+                "order": {"_count": "desc"}
             }
         }
-
-        # Add search filter if provided
+        strategy = "all"
         if search:
-            query["query"] = {
-                "wildcard": {
-                    f"{field_name}.keyword": f"*{search.lower()}*"
-                }
-            }
-
-        # Execute query
-        if not env['host_url'].startswith(('http://', 'https://')):
-            env['host_url'] = f"http://{env['host_url']}"
-
-        auth = None
-        if env.get('username') and env.get('password'):
-            auth = (env['username'], env['password'])
+            # Prefix matching instead of a leading-wildcard scan of the term dictionary
+            field = describe_value_field(fetch_field_index(host_url, auth, index_name), field_name)
+            terms["terms"]["field"] = field["keyword_field"]
+            # Keeps the top buckets to matching values even when the query matched on another word
+            terms["terms"]["include"] = prefix_include_pattern(search)
+            match_query, strategy = build_typeahead_query(field, search)
+            query, agg_path = wrap_values_aggregation(field, terms, match_query)
+        else:
+            query, agg_path = {"size": 0, "aggs": {"values": terms}}, ["values"]
 
         response = requests.post(
-            f"{env['host_url']}/{index_name}/_search",
+            f"{host_url}/{index_name}/_search",
             json=query,
             auth=auth,
             timeout=10,
@@ -3289,8 +5934,13 @@ async def get_enhanced_field_values_v1(
         )
 
         if response.status_code == 200:
-            result = response.json()
-            buckets = result.get('aggregations', {}).get('unique_values', {}).get('buckets', [])
+            node = response.json().get('aggregations', {})
+            for name in agg_path:
+                node = node.get(name, {})
+            buckets = [
+                bucket for bucket in node.get('buckets', [])
+                if not search or value_matches_prefix(bucket['key'], search)
+            ]
 
             values = [
                 {
@@ -3306,7 +5956,8 @@ async def get_enhanced_field_values_v1(
                 "values": values,
                 "total_count": len(values),
                 "search_term": search,
-                "field_name": field_name
+                "field_name": field_name,
+                "strategy": strategy
             }
         else:
             raise Exception(f"Elasticsearch query failed: {response.status_code}")
@@ -4115,14 +6766,54 @@ async def generate_workflow_mapping(env_id: int, request: Request, dry_run: bool
         if mapping_exists(mapping_name):
             raise ValueError(f"Mapping with name '{mapping_name}' already exists")
 
+        # Size shards and infer field types from Oracle statistics when the client says which Oracle environment to ask
+        shard_plan = None
+        column_stats = None
+        oracle_env = next((e for e in get_oracle_environments() if str(e['id']) == str(data.get('oracleEnvId'))), None)
+        if oracle_env:
+            try:
+                column_stats = await asyncio.to_thread(fetch_oracle_column_stats, oracle_env, tables)
+            except Exception as e:
+                logger.info(f"⚠️ Oracle column statistics unavailable: {e}")
+            try:
+                host_url, auth = get_environment_target(env_id)
+                volumes = await asyncio.to_thread(fetch_oracle_table_volumes, oracle_env, tables)
+                data_nodes = await asyncio.to_thread(count_data_nodes, host_url, auth)
+                shard_plan = recommend_workflow_shards(volumes, tables, relationships, data_nodes)
+                logger.info(f"📐 Shard plan: {shard_plan['number_of_shards']} shards for ~{shard_plan['estimated_gb']} GB")
+            except Exception as e:
+                logger.info(f"⚠️ Shard sizing skipped: {e}")
+
         # Generate Elasticsearch mapping
         elasticsearch_mapping = generate_elasticsearch_mapping_v1(
-            tables, relationships, table_structures, field_mappings
+            tables, relationships, table_structures, field_mappings,
+            number_of_shards=shard_plan["number_of_shards"] if shard_plan else 1,
+            number_of_replicas=shard_plan["number_of_replicas"] if shard_plan else 0,
+            column_stats=column_stats
         )
 
         total_fields = count_mapping_fields(elasticsearch_mapping)
         logger.info(f"📝 Generated mapping with {total_fields} fields")
 
+        cost_estimate = None
+        type_inference = None
+        if column_stats:
+            cost_estimate = estimate_mapping_cost(elasticsearch_mapping, column_stats, tables, relationships)
+            type_inference = type_inference_savings(
+                generate_elasticsearch_mapping_v1(tables, relationships, table_structures, field_mappings),
+                cost_estimate, column_stats, tables, relationships
+            )
+
+        # An existing index is updated in place when the diff allows it instead of being recreated
+        update_plan = None
+        try:
+            host_url, auth = get_environment_target(env_id)
+            live = await asyncio.to_thread(fetch_live_properties, host_url, auth, index_name)
+            if live is not None:
+                update_plan = plan_mapping_update(elasticsearch_mapping, live)
+        except Exception as e:
+            update_plan = {"action": "unknown", "error": str(e)}
+
         if dry_run:
             return {
                 "success": True,
@@ -4130,6 +6821,10 @@ async def generate_workflow_mapping(env_id: int, request: Request, dry_run: bool
                 "indexName": index_name,
                 "mapping": elasticsearch_mapping,
                 "totalFields": total_fields,
+                "shardPlan": shard_plan,
+                "costEstimate": cost_estimate,
+                "typeInference": type_inference,
+                "updatePlan": update_plan,
                 "status": "preview",
             }
 
@@ -4141,7 +6836,20 @@ async def generate_workflow_mapping(env_id: int, request: Request, dry_run: bool
         es_error = None
 
         try:
-            es_success = create_elasticsearch_index_v2(env['host_url'], index_name, elasticsearch_mapping, env.get('username'), env.get('password'))
+            if update_plan is None:
+                es_success = create_elasticsearch_index_v2(env['host_url'], index_name, elasticsearch_mapping, env.get('username'), env.get('password'))
+            elif update_plan["action"] == "unknown":
+                es_error = f"Could not compare with the existing index '{index_name}': {update_plan['error']}"
+            elif update_plan["action"] == "reindex":
+                es_error = (f"Index '{index_name}' exists and {update_plan['counts']['breaking']} breaking mapping changes "
+                            f"need a reindex (POST /api/mapping-diff/{env_id}/{index_name}/apply with oracle_env_id, "
+                            f"plus replace_concrete_index while '{index_name}' is a concrete index rather than an alias)")
+            else:
+                if update_plan["action"] == "put_mapping":
+                    await asyncio.to_thread(put_index_mapping, host_url, auth, index_name, update_plan["put_mapping"])
+                    invalidate_index_caches(env_id, index_name)
+                    logger.info(f"🔧 Updated {index_name} in place: {update_plan['counts']}")
+                es_success = True
         except Exception as e:
             es_error = str(e)
             logger.info(f"❌ Elasticsearch creation failed: {es_error}")
@@ -4169,6 +6877,9 @@ async def generate_workflow_mapping(env_id: int, request: Request, dry_run: bool
             "totalFields": total_fields,
             "tablesProcessed": len(tables),
             "relationshipsApplied": len(relationships),
+            "shardPlan": shard_plan,
+            "typeInference": type_inference,
+            "updatePlan": update_plan,
             "elasticsearchCreated": es_success,
             "status": "completed" if es_success else "mapping_saved_es_failed",
             "message": "Mapping generated and saved successfully" +
@@ -4206,6 +6917,109 @@ def oracle_to_elastic_type(oracle_type: str) -> str:
     return type_mapping.get(oracle_type.upper(), 'text')
 
 
+# Column-statistics-driven type inference
+KEYWORD_MAX_DISTINCT = int(os.getenv("KEYWORD_MAX_DISTINCT", "1000"))
+KEYWORD_MAX_DISTINCT_RATIO = 0.01
+SHORT_CODE_LENGTH = 32
+LONG_TEXT_LENGTH = 512
+ORACLE_DATE_FORMAT = "strict_date_optional_time||yyyy-MM-dd HH:mm:ss||epoch_millis"
+
+
+def text_with_keyword(ignore_above: int = 256) -> Dict[str, Any]:
+    return {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": ignore_above}}}
+
+
+def code_keyword() -> Dict[str, Any]:
+    # Form queries and dropdown aggregations address exact values as <field>.keyword
+    return {"type": "keyword", "fields": {"keyword": {"type": "keyword"}}}
+
+
+def infer_elastic_field(column_name: str, column: Dict[str, Any], num_rows: int = 0) -> Tuple[Dict[str, Any], str]:
+    """
+    Field mapping for an Oracle column from its declared type, precision,
+    scale and length and its optimizer statistics (num_distinct,
+    avg_col_len). Returns (mapping, reason).
+    """
+    data_type = (column.get("data_type") or "VARCHAR2").upper()
+    precision, scale = column.get("data_precision"), column.get("data_scale")
+    length = column.get("data_length") or 0
+    ndv, avg_len = column.get("num_distinct"), column.get("avg_col_len")
+    looks_like_key = bool(re.search(r"(^|_)(ID|NO|NUM|KEY)$", column_name.upper()))
+
+    if data_type == "NUMBER" or data_type in ("INTEGER", "INT", "SMALLINT", "DECIMAL", "NUMERIC"):
+        if data_type in ("INTEGER", "INT", "SMALLINT"):
+            scale = 0
+        if scale and scale > 0:
+            if scale <= 4 and (precision or 38) <= 15:
+                return {"type": "scaled_float", "scaling_factor": 10 ** scale}, \
+                    f"NUMBER({precision},{scale}): exact decimals stored as scaled longs"
+            return {"type": "double"}, f"NUMBER({precision},{scale}): too precise for scaled_float"
+        if scale == 0 and precision:
+            if precision <= 9:
+                return {"type": "integer"}, f"NUMBER({precision}) fits in 32 bits"
+            if precision <= 18:
+                return {"type": "long"}, f"NUMBER({precision}) fits in 64 bits"
+            return {"type": "double"}, f"NUMBER({precision}) can exceed a long; stored as double (approximate beyond 2^53)"
+        if scale == 0:
+            # INTEGER and NUMBER(*,0) report a NULL precision with scale 0
+            return {"type": "long"}, "whole NUMBER without precision"
+        if looks_like_key:
+            return {"type": "long"}, "unconstrained NUMBER named like a key"
+        # Unconstrained NUMBER may hold decimals; long would truncate them
+        return {"type": "double"}, "unconstrained NUMBER may hold decimals"
+
+    if data_type in ("BINARY_FLOAT", "FLOAT", "REAL"):
+        return ({"type": "float"} if data_type == "BINARY_FLOAT" else {"type": "double"}), f"{data_type} is approximate"
+    if data_type == "BINARY_DOUBLE":
+        return {"type": "double"}, "BINARY_DOUBLE is approximate"
+    if data_type == "DATE":
+        return {"type": "date", "format": ORACLE_DATE_FORMAT}, "DATE has second precision"
+    if data_type.startswith("TIMESTAMP"):
+        match = re.search(r"\((\d)\)", data_type)
+        fraction = int(match.group(1)) if match else (scale if scale is not None else 6)
+        if fraction > 3:
+            return {"type": "date_nanos", "format": ORACLE_DATE_FORMAT}, f"{data_type} keeps sub-millisecond precision"
+        return {"type": "date", "format": ORACLE_DATE_FORMAT}, f"{data_type} fits millisecond dates"
+    if data_type in ("BLOB", "RAW", "LONG RAW", "BFILE"):
+        return {"type": "binary"}, f"{data_type} is binary"
+    if data_type in ("CLOB", "NCLOB", "LONG"):
+        return {"type": "text"}, f"{data_type} is free text; no keyword copy"
+    if data_type in ("CHAR", "NCHAR"):
+        return code_keyword(), f"{data_type} is a fixed-width code"
+
+    # VARCHAR2 / NVARCHAR2 and anything else string-like. Only few, short,
+    # often repeated values are codes; names and cities stay searchable text.
+    low_cardinality = ndv is not None and bool(num_rows) and ndv <= KEYWORD_MAX_DISTINCT \
+        and ndv / num_rows < KEYWORD_MAX_DISTINCT_RATIO
+    short_values = avg_len is not None and avg_len <= SHORT_CODE_LENGTH
+    if low_cardinality and short_values:
+        return code_keyword(), f"{ndv} distinct short values in {num_rows} rows: a code column, exact match only"
+    if (avg_len and avg_len > 256) or length > LONG_TEXT_LENGTH:
+        return {"type": "text"}, "long free text; a keyword copy would mostly exceed ignore_above"
+    return text_with_keyword(min(256, length) if length else 256), "searchable text with a keyword copy for sorting and aggregations"
+
+
+def infer_table_fields(table_name: str, columns: List[Any], column_stats: Dict[str, Dict[str, Any]],
+                       overrides: Dict[str, str]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Field mappings and inference reasons for one table's columns; explicit overrides win"""
+    table_stats = column_stats.get(table_name.upper(), {})
+    properties, reasons = {}, {}
+    for column in columns:
+        field_name = get_field_name(column).lower()
+        if field_name in overrides:
+            elastic_type = overrides[field_name]
+            properties[field_name] = text_with_keyword() if elastic_type == "text" \
+                else code_keyword() if elastic_type == "keyword" else {"type": elastic_type}
+            reasons[field_name] = "user override"
+            continue
+        info = dict(table_stats.get("columns", {}).get(field_name.upper(), {}))
+        info.setdefault("data_type", get_field_type(column))
+        if isinstance(column, dict):
+            info.setdefault("data_length", column.get("length"))
+        properties[field_name], reasons[field_name] = infer_elastic_field(field_name, info, table_stats.get("num_rows", 0))
+    return properties, reasons
+
+
 
 
 @app.get("/workflow-mappings/{mapping_id}")
@@ -4458,8 +7272,14 @@ def count_mapping_fields(mapping: Dict) -> int:
 
     return count
 
-def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dict], table_structures: Dict, field_mappings: Dict = None) -> Dict:
-    """Generate complete Elasticsearch mapping from tables and relationships"""
+def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dict], table_structures: Dict, field_mappings: Dict = None,
+                                      number_of_shards: int = 1, number_of_replicas: int = 0,
+                                      column_stats: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict:
+    """
+    Generate complete Elasticsearch mapping from tables and relationships.
+    With column_stats (fetch_oracle_column_stats) field types are inferred
+    from precision, scale, length and cardinality instead of the type name.
+    """
 
     field_mappings = field_mappings or {}
 
@@ -4488,8 +7308,8 @@ def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dic
 
     mapping = {
         "settings": {
-            "number_of_shards": 1,
-            "number_of_replicas": 0,
+            "number_of_shards": number_of_shards,
+            "number_of_replicas": number_of_replicas,
             "analysis": {
                 "analyzer": {
                     "standard_analyzer": {
@@ -4516,7 +7336,11 @@ def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dic
         child_overrides = aggregated_overrides.get(child_table.lower(), {}) if child_table else {}
 
         # Add parent table fields (normalize case for comparison)
-        if parent_table and parent_table.upper() not in processed_tables:
+        if parent_table and parent_table.upper() not in processed_tables and column_stats is not None:
+            properties, _ = infer_table_fields(parent_table, table_structures.get(parent_table, []), column_stats, parent_overrides)
+            mapping["mappings"]["properties"].update(properties)
+            processed_tables.add(parent_table.upper())
+        elif parent_table and parent_table.upper() not in processed_tables:
             parent_columns = table_structures.get(parent_table, [])
             for column in parent_columns:
                 field_name = get_field_name(column).lower()
@@ -4543,6 +7367,9 @@ def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dic
             # Create nested object for child table
             child_columns = table_structures.get(child_table, [])
             nested_properties = {}
+            if column_stats is not None:
+                nested_properties, _ = infer_table_fields(child_table, child_columns, column_stats, child_overrides)
+                child_columns = []
 
             for column in child_columns:
                 field_name = get_field_name(column).lower()
@@ -4582,6 +7409,10 @@ def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dic
             join_field["relations"][parent_type] = child_type
             mapping["mappings"]["properties"][relation_name] = join_field
             child_columns = table_structures.get(child_table, [])
+            if column_stats is not None:
+                properties, _ = infer_table_fields(child_table, child_columns, column_stats, child_overrides)
+                mapping["mappings"]["properties"].update(properties)
+                child_columns = []
             for column in child_columns:
                 field_name = get_field_name(column).lower()
                 oracle_type = get_field_type(column)
@@ -4597,6 +7428,11 @@ def generate_elasticsearch_mapping_v1(tables: List[str], relationships: List[Dic
     for table_name in tables:
         if table_name.upper() not in processed_tables:  # Case-insensitive check
             table_columns = table_structures.get(table_name, [])
+            if column_stats is not None:
+                properties, _ = infer_table_fields(table_name, table_columns, column_stats, {})
+                for field_name, field_mapping in properties.items():
+                    mapping["mappings"]["properties"].setdefault(field_name, field_mapping)
+                table_columns = []
             for column in table_columns:
                 field_name = get_field_name(column).lower()
                 oracle_type = get_field_type(column)
@@ -4679,6 +7515,7 @@ async def save_mapping_update(update: MappingUpdate):
                 datetime.now().isoformat()
             ))
             conn.commit()
+        _field_lists_cache.pop((str(update.env_id), update.index_name), None)
         return {"success": True}
 
     except Exception as e:
@@ -4701,8 +7538,19 @@ SELECT_SQL = """
                  LIMIT 1; \
              """
 
+# (env_id, index_name) -> fetch_field_lists result; cleared by save_mapping_update
+_field_lists_cache: Dict[tuple, tuple] = {}
+
+
 def fetch_field_lists(env_id: int,index_name: str) -> Tuple[List[str], List[str], Optional[str], List[str], List[str]]:
+    key = (str(env_id), index_name)
+    cached = _field_lists_cache.get(key)
+    if cached is None:
+        cached = _field_lists_cache[key] = _load_field_lists(env_id, index_name)
+    return tuple(list(v) if isinstance(v, list) else v for v in cached)
+
 
+def _load_field_lists(env_id: int, index_name: str) -> tuple:
     with sqlite3.connect('workflow_mappings.db') as conn:
         cur = conn.cursor()
         cur.execute(SELECT_SQL, (env_id, index_name))
@@ -4763,24 +7611,46 @@ def _extract_list(value: Any) -> List[str]:
 
 
 @app.get("/api/enhanced-indices/{env_id}")
-async def get_enhanced_indices(env_id: int):
-    """Get enhanced indices with detailed metadata"""
+async def get_enhanced_indices(
+        env_id: int,
+        search: Optional[str] = None,
+        sort: str = 'name',
+        order: str = 'asc',
+        page: int = 1,
+        size: Optional[int] = None
+):
+    """Get enhanced indices with detailed metadata, optionally filtered by name, sorted and paged"""
     try:
         environments = get_elasticsearch_environments()
         env = next((e for e in environments if e['id'] == env_id), None)
         if not env:
             raise HTTPException(status_code=404, detail="Environment not found")
 
+        page, size = enhanced_indices_page(page, size)
+
         # Get indices with enhanced metadata
-        indices = get_elasticsearch_indices_enhanced(
+        listing = get_elasticsearch_indices_enhanced(
             env['host_url'],
             env.get('username'),
-            env.get('password')
+            env.get('password'),
+            name_filter=search,
+            sort_by=sort,
+            order=order,
+            offset=(page - 1) * size if size else 0,
+            limit=size
         )
-        return {"success": True, "indices": indices}
+        return {"success": True, "indices": listing["indices"], "total": listing["total"], "page": page, "size": size}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
+
+def enhanced_indices_page(page: int, size: Optional[int]) -> Tuple[int, Optional[int]]:
+    """Clamp listing paging parameters; no size returns every index as before"""
+    page = max(1, page)
+    if size is not None:
+        size = max(1, min(size, ENHANCED_INDICES_PAGE_MAX))
+    return page, size
+
 @app.get("/api/enhanced-mapping/{env_id}/{index_name}")
 async def get_enhanced_mapping(env_id: int, index_name: str):
     """Get enhanced mapping with performance analysis"""
@@ -4816,6 +7686,8 @@ async def update_enhanced_settings(env_id: int, index_name: str, settings: dict)
             env.get('username'),
             env.get('password')
         )
+        invalidate_index_caches(env_id, index_name)
+        cluster_snapshot_cache.invalidate(env_id)
         return {"success": True, "result": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -4824,24 +7696,72 @@ async def update_enhanced_settings(env_id: int, index_name: str, settings: dict)
 async def execute_bulk_operations(env_id: int, operation: dict):
     """Execute bulk operations on multiple indices"""
     try:
-        environments = get_elasticsearch_environments()
+        environments = await asyncio.to_thread(get_elasticsearch_environments)
         env = next((e for e in environments if e['id'] == env_id), None)
         if not env:
             raise HTTPException(status_code=404, detail="Environment not found")
 
-        result = execute_elasticsearch_bulk_operation(
+        # Blocking HTTP calls (and their worker pool) stay off the event loop
+        result = await asyncio.to_thread(
+            execute_elasticsearch_bulk_operation,
             env['host_url'],
             operation,
             env.get('username'),
-            env.get('password')
+            env.get('password'),
+            concurrency=env.get('bulk_concurrency')
         )
+        invalidate_index_caches(env_id, bulk_operation_written_indices(operation, result))
+        cluster_snapshot_cache.invalidate(env_id)
+        record_reindex_tasks(env_id, result, operation.get('parameters', {}))
         return {"success": True, "result": result}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def get_elasticsearch_indices_enhanced(host_url: str, username: Optional[str] = None, password: Optional[str] = None):
-    """Get indices with enhanced metadata including health, settings, and performance"""
+def bulk_operation_written_indices(operation: Dict[str, Any], result: Dict[str, Any]) -> List[str]:
+    """Indices (and aliases) whose search results a bulk operation may change"""
+    written = list(operation.get('indices', []))
+    alias_name = operation.get('parameters', {}).get('alias_name')
+    if alias_name:
+        written.append(alias_name)
+    for item in result.get('results', []) if isinstance(result, dict) else []:
+        if item.get('destination'):
+            written.append(item['destination'])
+    return written
+
+
+ENHANCED_INDICES_PAGE_MAX = int(os.getenv("ENHANCED_INDICES_PAGE_MAX", "500"))
+# Listing sort keys -> _cat/indices columns (sorted by Elasticsearch on the raw values)
+ENHANCED_INDEX_SORT_COLUMNS = {
+    'name': 'index', 'status': 'status', 'health': 'health', 'primary': 'pri', 'replica': 'rep',
+    'docs': 'docs.count', 'size': 'store.size', 'created': 'creation.date'
+}
+# Settings shown in the listing; the full settings are loaded per index on demand
+ENHANCED_INDEX_SETTINGS_FILTER = ",".join(
+    f"*.settings.index.{key}" for key in (
+        "number_of_shards", "number_of_replicas", "codec", "refresh_interval",
+        "creation_date", "uuid", "provided_name", "blocks", "lifecycle"
+    )
+)
+# Longest comma-joined index list put into a URL path before falling back to the pattern
+MAX_INDEX_LIST_URL_LENGTH = 2048
+
+
+def index_request_target(index_names: List[str], pattern: str) -> str:
+    """Comma-joined names for a single multi-index request, or the pattern if that gets too long"""
+    joined = ",".join(index_names)
+    return joined if joined and len(joined) <= MAX_INDEX_LIST_URL_LENGTH else pattern
+
+
+def get_elasticsearch_indices_enhanced(host_url: str, username: Optional[str] = None, password: Optional[str] = None,
+                                       name_filter: Optional[str] = None, sort_by: str = 'name', order: str = 'asc',
+                                       offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Get indices with enhanced metadata including health and settings.
+    Filtering and sorting are done by _cat/indices, settings for the requested
+    page come from one multi-index _settings call, so the number of requests
+    does not depend on the number of indices.
+    """
     try:
         if not host_url.startswith(('http://', 'https://')):
             host_url = f'http://{host_url}'
@@ -4850,50 +7770,86 @@ def get_elasticsearch_indices_enhanced(host_url: str, username: Optional[str] =
         if username and password:
             auth = (username, password)
 
-        # Get basic indices info
+        sort_column = ENHANCED_INDEX_SORT_COLUMNS.get(sort_by)
+        if sort_column is None:
+            raise ValueError(f"Unsupported sort field: {sort_by}")
+        direction = 'desc' if order == 'desc' else 'asc'
+        pattern = f"*{name_filter}*" if name_filter else "*"
+
+        # Get basic indices info, filtered and sorted by the cluster
         indices_response = requests.get(
-            f"{host_url}/_cat/indices?format=json&h=index,status,health,pri,rep,docs.count,store.size,creation.date",
+            f"{host_url}/_cat/indices/{pattern}",
+            params={
+                "format": "json",
+                "h": "index,status,health,pri,rep,docs.count,store.size,creation.date",
+                "s": f"{sort_column}:{direction}"
+            },
             auth=auth,
-            timeout=10,
+            timeout=30,
             verify=False
         )
+        if indices_response.status_code != 200:
+            raise Exception(f"Failed to fetch indices: {indices_response.status_code}")
 
-        if indices_response.status_code == 200:
-            indices_data = indices_response.json()
-            enhanced_indices = []
-
-            for index_info in indices_data:
-                # Get additional metadata
-                settings_response = requests.get(
-                    f"{host_url}/{index_info['index']}/_settings",
-                    auth=auth,
-                    timeout=10,
-                    verify=False
-                )
-
-                enhanced_index = {
-                    'name': index_info['index'],
-                    'status': index_info['status'],
-                    'health': index_info['health'],
-                    'primary': int(index_info['pri']),
-                    'replica': int(index_info['rep']),
-                    'docs': int(index_info['docs.count'] or 0),
-                    'size': index_info['store.size'],
-                    'created': index_info.get('creation.date'),
-                    'settings': settings_response.json() if settings_response.status_code == 200 else {}
-                }
+        indices_data = indices_response.json()
+        total = len(indices_data)
+        page = indices_data[offset:offset + limit] if limit is not None else indices_data[offset:]
 
-                enhanced_indices.append(enhanced_index)
+        settings_data = {}
+        if page:
+            settings_response = requests.get(
+                f"{host_url}/{index_request_target([i['index'] for i in page], pattern)}/_settings",
+                params={"filter_path": ENHANCED_INDEX_SETTINGS_FILTER, "expand_wildcards": "all"},
+                auth=auth,
+                timeout=30,
+                verify=False
+            )
+            if settings_response.status_code == 200:
+                settings_data = settings_response.json()
+
+        enhanced_indices = []
+        for index_info in page:
+            name = index_info['index']
+            enhanced_indices.append({
+                'name': name,
+                'status': index_info['status'],
+                'health': index_info['health'],
+                'primary': int(index_info['pri'] or 0),
+                'replica': int(index_info['rep'] or 0),
+                'docs': int(index_info['docs.count'] or 0),
+                'size': index_info['store.size'],
+                'created': index_info.get('creation.date'),
+                'settings': {name: settings_data[name]} if name in settings_data else {}
+            })
 
-            return enhanced_indices
-        else:
-            raise Exception(f"Failed to fetch indices: {indices_response.status_code}")
+        return {"indices": enhanced_indices, "total": total}
 
     except Exception as e:
         raise Exception(f"Error fetching enhanced indices: {str(e)}")
 
 
+def get_indices_performance_metrics(host_url: str, index_names: List[str], pattern: str = "*",
+                                    username: Optional[str] = None, password: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Performance metrics for several indices from a single _stats call"""
+    if not host_url.startswith(('http://', 'https://')):
+        host_url = f'http://{host_url}'
 
+    auth = None
+    if username and password:
+        auth = (username, password)
+
+    response = requests.get(
+        f"{host_url}/{index_request_target(index_names, pattern)}/_stats/search,indexing,store,query_cache",
+        params={"level": "indices", "filter_path": "indices.*.total", "expand_wildcards": "all"},
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
+    if response.status_code != 200:
+        raise Exception(f"Failed to get stats: {response.status_code}")
+
+    stats = response.json().get('indices', {})
+    return {name: performance_metrics_from_stats(stats[name]) for name in index_names if name in stats}
 
 
 def get_elasticsearch_mapping_enhanced(host_url: str, index_name: str, username: Optional[str] = None, password: Optional[str] = None):
@@ -4907,12 +7863,7 @@ def get_elasticsearch_mapping_enhanced(host_url: str, index_name: str, username:
             auth = (username, password)
 
         # Get mapping
-        mapping_response = requests.get(
-            f"{host_url}/{index_name}/_mapping",
-            auth=auth,
-            timeout=10,
-            verify=False
-        )
+        mapping_data = mapping_cache.get(host_url, auth, index_name)["mapping"]
 
         # Get stats
         stats_response = requests.get(
@@ -4921,18 +7872,13 @@ def get_elasticsearch_mapping_enhanced(host_url: str, index_name: str, username:
             timeout=10,
             verify=False
         )
+        stats_data = stats_response.json() if stats_response.status_code == 200 else {}
 
-        if mapping_response.status_code == 200:
-            mapping_data = mapping_response.json()
-            stats_data = stats_response.json() if stats_response.status_code == 200 else {}
-
-            return {
-                'mapping': mapping_data,
-                'stats': stats_data,
-                'analysis': analyze_mapping_performance(mapping_data, stats_data)
-            }
-        else:
-            raise Exception(f"Failed to fetch mapping: {mapping_response.status_code}")
+        return {
+            'mapping': mapping_data,
+            'stats': stats_data,
+            'analysis': analyze_mapping_performance(mapping_data, stats_data)
+        }
 
     except Exception as e:
         raise Exception(f"Error fetching enhanced mapping: {str(e)}")
@@ -4970,6 +7916,14 @@ def analyze_mapping_performance(mapping_data: dict, stats_data: dict) -> dict:
         if 'mappings' in index_data and 'properties' in index_data['mappings']:
             count_fields(index_data['mappings']['properties'])
 
+    # Memory estimate from the field costs at the current document count
+    doc_count = stats_data.get('_all', {}).get('primaries', {}).get('docs', {}).get('count', 0) if stats_data else 0
+    first_index = next(iter(mapping_data.values()), None)
+    if first_index:
+        cost = estimate_mapping_cost(first_index.get('mappings', {}), doc_count=doc_count)
+        analysis['memory_estimate'] = cost['memory_estimate']
+        analysis['estimated_gb'] = cost['estimated_gb']
+
     # Generate recommendations
     if analysis['text_fields'] > 50:
         analysis['recommendations'].append("Consider using keyword type for non-analyzed fields")
@@ -4983,6 +7937,506 @@ def analyze_mapping_performance(mapping_data: dict, stats_data: dict) -> dict:
     return analysis
 
 
+# ================================
+# Mapping cost estimation
+# ================================
+
+# Rough per-value costs; estimates are meant for comparing fields, not capacity planning
+TEXT_INDEX_BYTES_PER_CHAR = 0.6
+NUMERIC_POINT_BYTES = {"long": 8, "double": 8, "date": 8, "integer": 4, "float": 4, "short": 2, "byte": 1,
+                       "scaled_float": 8, "half_float": 2, "unsigned_long": 8, "boolean": 1}
+DEFAULT_KEYWORD_IGNORE_ABOVE = 256
+MAPPING_FIELD_LIMIT = 1000
+NESTED_DOCS_PER_PARENT_WARN = 50
+MEMORY_ESTIMATE_BUCKETS_GB = ((1, "Low"), (10, "Medium"))
+
+
+def iter_mapping_fields(properties: Dict[str, Any], prefix: str = "", nested_path: Optional[str] = None):
+    """(path, field config, nearest nested path) for every leaf field and keyword/text subfield"""
+    for name, config in properties.items():
+        path = f"{prefix}{name}"
+        if "properties" in config:
+            yield from iter_mapping_fields(config["properties"], f"{path}.",
+                                           path if config.get("type") == "nested" else nested_path)
+            continue
+        yield path, config, nested_path
+        for sub, sub_config in config.get("fields", {}).items():
+            yield f"{path}.{sub}", {**sub_config, "_parent": config}, nested_path
+
+
+def column_for_field(path: str, is_subfield: bool, nested_path: Optional[str], column_stats: Dict[str, Dict[str, Any]],
+                     root_tables: List[str]) -> Tuple[Optional[str], str, Optional[Dict[str, Any]]]:
+    """(table, column, column stats) a generated field came from: <child>_items.<col> or a root table column"""
+    parts = path.split(".")
+    column = (parts[-2] if is_subfield else parts[-1]).upper()
+    if nested_path and nested_path.endswith("_items"):
+        table = nested_path[:-len("_items")].upper()
+        return table, column, column_stats.get(table, {}).get("columns", {}).get(column)
+    for table in root_tables:
+        stats = column_stats.get(table, {}).get("columns", {}).get(column)
+        if stats:
+            return table, column, stats
+    return None, column, None
+
+
+def estimate_field_cost(field_type: str, config: Dict[str, Any], values: float, ndv: float, avg_len: float) -> Dict[str, float]:
+    """Index, doc_values and fielddata bytes of one field for `values` non-null values"""
+    ndv = max(1.0, min(ndv or values or 1.0, values or 1.0))
+    ordinal_bytes = max(1, math.ceil(math.log2(ndv + 1) / 8))
+    index_bytes = doc_values_bytes = fielddata_bytes = 0.0
+
+    if field_type == "text":
+        if config.get("index", True):
+            index_bytes = values * avg_len * TEXT_INDEX_BYTES_PER_CHAR
+        if config.get("fielddata"):
+            # Uninverted on heap: term dictionary plus per-document ordinals
+            fielddata_bytes = ndv * avg_len + values * ordinal_bytes * max(1.0, avg_len / 6)
+    elif field_type in ("keyword", "constant_keyword", "wildcard"):
+        ignore_above = config.get("ignore_above")
+        kept = 0.0 if ignore_above is not None and avg_len > ignore_above else 1.0
+        if config.get("index", True):
+            index_bytes = (ndv * avg_len + values * ordinal_bytes) * kept
+        if config.get("doc_values", True):
+            doc_values_bytes = (ndv * avg_len + values * ordinal_bytes) * kept
+    elif field_type in NUMERIC_POINT_BYTES:
+        width = NUMERIC_POINT_BYTES[field_type]
+        if config.get("index", True):
+            index_bytes = values * width
+        if config.get("doc_values", True):
+            # Doc values are bit-packed to the range of distinct values
+            doc_values_bytes = values * min(width, ordinal_bytes)
+    return {"index_bytes": index_bytes, "doc_values_bytes": doc_values_bytes, "fielddata_bytes": fielddata_bytes}
+
+
+def recommend_field_changes(path: str, field_type: str, config: Dict[str, Any], values: float,
+                            ndv: Optional[float], avg_len: Optional[float]) -> List[Dict[str, Any]]:
+    """Mapping changes worth making before creation, from the column's distribution"""
+    suggestions = []
+    is_subfield = "_parent" in config
+    uniqueness = (ndv / values) if ndv and values else None
+
+    if field_type == "text" and not is_subfield and avg_len is not None:
+        if uniqueness is not None and uniqueness < 0.01 and avg_len <= 64:
+            suggestions.append({"change": "keyword_only", "mapping": {"type": "keyword"},
+                                "reason": f"only {int(ndv)} distinct short values: a code/enum, full-text analysis is wasted"})
+        elif uniqueness is not None and uniqueness > 0.95 and avg_len <= 40:
+            suggestions.append({"change": "keyword_only", "mapping": {"type": "keyword"},
+                                "reason": "values are unique identifiers; exact match on keyword is enough"})
+    if field_type == "keyword" and is_subfield and avg_len is not None:
+        ignore_above = config.get("ignore_above")
+        if ignore_above is not None and avg_len > ignore_above:
+            suggestions.append({"change": "drop_keyword_subfield", "mapping": None,
+                                "reason": f"average length {avg_len:.0f} exceeds ignore_above {ignore_above}; most values are not indexed"})
+        elif uniqueness is not None and uniqueness > 0.9 and avg_len > 32:
+            suggestions.append({"change": "doc_values_false", "mapping": {"doc_values": False},
+                                "reason": "near-unique long strings are rarely sorted or aggregated on"})
+    if field_type == "keyword" and not is_subfield and avg_len is not None and config.get("ignore_above") is None \
+            and avg_len > DEFAULT_KEYWORD_IGNORE_ABOVE / 2:
+        suggestions.append({"change": "ignore_above", "mapping": {"ignore_above": DEFAULT_KEYWORD_IGNORE_ABOVE},
+                            "reason": f"average length {avg_len:.0f}; cap indexed keyword length"})
+    if field_type in NUMERIC_POINT_BYTES and field_type != "date" and uniqueness is not None and uniqueness > 0.5 \
+            and not re.search(r"(^|_)(id|no|num|code|key)$", path.rsplit(".", 1)[-1]):
+        suggestions.append({"change": "index_false", "mapping": {"index": False},
+                            "reason": "high-cardinality measure; doc_values still serve sorting, aggregations and slow range queries"})
+    if field_type == "text" and config.get("fielddata"):
+        suggestions.append({"change": "disable_fielddata", "mapping": {"fielddata": False},
+                            "reason": "fielddata loads the uninverted field on heap; aggregate on a keyword subfield instead"})
+    return suggestions
+
+
+def estimate_mapping_cost(mapping: Dict[str, Any], column_stats: Optional[Dict[str, Dict[str, Any]]] = None,
+                          tables: Optional[List[str]] = None, relationships: Optional[List[Dict[str, Any]]] = None,
+                          doc_count: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Predict per-field index, doc_values and fielddata size and nested
+    document multiplication for a mapping. Column statistics come from
+    fetch_oracle_column_stats; without them every field assumes doc_count
+    unique 16-character values.
+    """
+    column_stats = column_stats or {}
+    tables = [t.upper() for t in (tables or column_stats.keys())]
+    children = {str(r.get('childTable', '')).upper() for r in relationships or []}
+    root_tables = [t for t in tables if t not in children] or tables
+    root_docs = doc_count if doc_count is not None else sum(column_stats.get(t, {}).get("num_rows", 0) for t in root_tables)
+
+    properties = mapping.get("mappings", mapping).get("properties", {})
+    fields = []
+    totals = {"index_bytes": 0.0, "doc_values_bytes": 0.0, "fielddata_bytes": 0.0}
+    nested: Dict[str, Dict[str, Any]] = {}
+    field_count = 0
+
+    for path, config, nested_path in iter_mapping_fields(properties):
+        field_count += 1
+        field_type = config.get("type", "object")
+        table, column, stats = column_for_field(path, "_parent" in config, nested_path, column_stats, root_tables)
+        rows = column_stats.get(table, {}).get("num_rows", root_docs) if table else root_docs
+        if stats:
+            values = max(0, rows - (stats.get("num_nulls") or 0))
+            ndv, avg_len = stats.get("num_distinct"), stats.get("avg_col_len")
+        else:
+            values, ndv, avg_len = rows, None, None
+
+        cost = estimate_field_cost(field_type, config, values, ndv or values, avg_len or 16)
+        for key in totals:
+            totals[key] += cost[key]
+        fields.append({
+            "field": path,
+            "type": field_type,
+            "source_column": f"{table}.{column}" if stats else None,
+            "values": int(values),
+            "distinct": ndv,
+            "avg_length": avg_len,
+            **{key: int(value) for key, value in cost.items()},
+            "recommendations": recommend_field_changes(path, field_type, config, values, ndv, avg_len)
+        })
+        if nested_path and nested_path not in nested:
+            child_table = nested_path[:-len("_items")].upper() if nested_path.endswith("_items") else None
+            child_rows = column_stats.get(child_table, {}).get("num_rows") if child_table else None
+            nested[nested_path] = {
+                "path": nested_path,
+                "nested_docs": child_rows,
+                "per_parent": round(child_rows / root_docs, 2) if child_rows is not None and root_docs else None
+            }
+
+    findings = []
+    for info in nested.values():
+        if info["per_parent"] and info["per_parent"] > NESTED_DOCS_PER_PARENT_WARN:
+            findings.append(f"{info['path']} adds {info['per_parent']} hidden nested documents per parent "
+                            f"({info['nested_docs']} in total); consider a join or a separate index")
+    if field_count > MAPPING_FIELD_LIMIT * 0.8:
+        findings.append(f"{field_count} fields is close to index.mapping.total_fields.limit ({MAPPING_FIELD_LIMIT})")
+
+    lucene_docs = root_docs + sum(info["nested_docs"] or 0 for info in nested.values())
+    memory_gb = (totals["doc_values_bytes"] + totals["fielddata_bytes"]) / GB
+    fields.sort(key=lambda f: f["index_bytes"] + f["doc_values_bytes"] + f["fielddata_bytes"], reverse=True)
+    return {
+        "documents": root_docs,
+        "lucene_documents": lucene_docs,
+        "field_count": field_count,
+        "estimated_gb": {key.replace("_bytes", ""): round(value / GB, 3) for key, value in totals.items()},
+        "memory_estimate": next((label for limit, label in MEMORY_ESTIMATE_BUCKETS_GB if memory_gb < limit), "High"),
+        "nested": list(nested.values()),
+        "findings": findings,
+        "fields": fields,
+        "based_on_oracle_statistics": bool(column_stats)
+    }
+
+
+def type_inference_savings(baseline_mapping: Dict[str, Any], inferred_cost: Dict[str, Any],
+                           column_stats: Dict[str, Dict[str, Any]], tables: List[str],
+                           relationships: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Estimated size of the name-based mapping against the statistics-inferred one"""
+    baseline = estimate_mapping_cost(baseline_mapping, column_stats, tables, relationships)
+
+    def total_gb(cost: Dict[str, Any]) -> float:
+        return sum(f["index_bytes"] + f["doc_values_bytes"] + f["fielddata_bytes"] for f in cost["fields"]) / GB
+
+    before, after = total_gb(baseline), total_gb(inferred_cost)
+    inferred_types = {f["field"]: f["type"] for f in inferred_cost["fields"]}
+    return {
+        "baseline_gb": round(before, 3),
+        "inferred_gb": round(after, 3),
+        "saved_gb": round(before - after, 3),
+        "saved_percent": round((before - after) / before * 100, 1) if before else 0.0,
+        "baseline_fields": baseline["field_count"],
+        "inferred_fields": inferred_cost["field_count"],
+        "changed_types": {
+            f["field"]: {"from": f["type"], "to": inferred_types[f["field"]]}
+            for f in baseline["fields"] if inferred_types.get(f["field"], f["type"]) != f["type"]
+        }
+    }
+
+
+# ================================
+# Shard sizing and hot-spot analysis
+# ================================
+
+GB = 1024 ** 3
+SHARD_TARGET_GB = float(os.getenv("SHARD_TARGET_GB", "30"))
+SHARD_MAX_GB = float(os.getenv("SHARD_MAX_GB", "50"))
+SHARD_MIN_GB = float(os.getenv("SHARD_MIN_GB", "1"))
+SHARD_MAX_DOCS = int(os.getenv("SHARD_MAX_DOCS", "200000000"))
+SEGMENTS_PER_SHARD_WARN = int(os.getenv("SEGMENTS_PER_SHARD_WARN", "50"))
+# A node holding this many times the mean shard count (or bytes) is a hot spot
+NODE_SKEW_RATIO = float(os.getenv("NODE_SKEW_RATIO", "1.5"))
+# Elasticsearch size of a row relative to Oracle avg_row_len (source, inverted index, doc values)
+ORACLE_TO_ES_SIZE_FACTOR = float(os.getenv("ORACLE_TO_ES_SIZE_FACTOR", "1.5"))
+
+
+def fetch_shard_layout(host_url: str, auth: Optional[tuple], index_pattern: str = "*") -> Dict[str, Any]:
+    """Shards, per-index segment counts and node allocation in three cluster-wide calls"""
+    shards = requests.get(
+        f"{host_url}/_cat/shards/{index_pattern}",
+        params={"format": "json", "bytes": "b", "h": "index,shard,prirep,state,docs,store,node"},
+        auth=auth, timeout=30, verify=False
+    )
+    shards.raise_for_status()
+    segments = requests.get(
+        f"{host_url}/{index_pattern}/_stats/segments",
+        params={"level": "indices", "filter_path": "indices.*.primaries.segments.count,indices.*.total.segments.count"},
+        auth=auth, timeout=30, verify=False
+    )
+    allocation = requests.get(
+        f"{host_url}/_cat/allocation",
+        params={"format": "json", "bytes": "b", "h": "node,shards,disk.indices,disk.percent"},
+        auth=auth, timeout=10, verify=False
+    )
+    return {
+        "shards": shards.json(),
+        "segments": segments.json().get("indices", {}) if segments.status_code == 200 else {},
+        "allocation": allocation.json() if allocation.status_code == 200 else []
+    }
+
+
+def recommend_shard_count(total_bytes: float, expected_docs: int = 0, data_nodes: int = 0) -> int:
+    """Primary shards keeping each near SHARD_TARGET_GB and under SHARD_MAX_DOCS"""
+    shards = max(1, math.ceil(total_bytes / (SHARD_TARGET_GB * GB)), math.ceil(expected_docs / SHARD_MAX_DOCS))
+    # Spread evenly: round up to a multiple of the data nodes once there is more than one shard
+    if shards > 1 and data_nodes > 1 and shards % data_nodes:
+        shards += data_nodes - shards % data_nodes
+    return shards
+
+
+def analyze_shards(layout: Dict[str, Any]) -> Dict[str, Any]:
+    """Flag oversized/undersized shards, segment build-up and uneven node distribution"""
+    def as_int(value) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    findings: List[Dict[str, Any]] = []
+    indices: Dict[str, Dict[str, Any]] = {}
+    nodes: Dict[str, Dict[str, Any]] = {}
+    index_nodes: Dict[str, Dict[str, int]] = {}
+
+    for shard in layout.get("shards", []):
+        index = indices.setdefault(shard["index"], {
+            "primaries": 0, "replicas": 0, "primary_bytes": 0, "primary_docs": 0,
+            "max_shard_bytes": 0, "unassigned": 0
+        })
+        if shard.get("state") == "UNASSIGNED" or not shard.get("node"):
+            index["unassigned"] += 1
+            continue
+        size, docs = as_int(shard.get("store")), as_int(shard.get("docs"))
+        if shard.get("prirep") == "p":
+            index["primaries"] += 1
+            index["primary_bytes"] += size
+            index["primary_docs"] += docs
+            index["max_shard_bytes"] = max(index["max_shard_bytes"], size)
+            if size > SHARD_MAX_GB * GB or docs > SHARD_MAX_DOCS:
+                findings.append({
+                    "severity": "high", "type": "oversized_shard", "index": shard["index"],
+                    "message": f"{shard['index']} shard {shard['shard']} holds {size / GB:.1f} GB / {docs} docs; "
+                               f"keep shards under {SHARD_MAX_GB:.0f} GB and {SHARD_MAX_DOCS} docs"
+                })
+        else:
+            index["replicas"] += 1
+        node = nodes.setdefault(shard["node"], {"shards": 0, "bytes": 0})
+        node["shards"] += 1
+        node["bytes"] += size
+        per_node = index_nodes.setdefault(shard["index"], {})
+        per_node[shard["node"]] = per_node.get(shard["node"], 0) + 1
+
+    data_nodes = len({a["node"] for a in layout.get("allocation", []) if a.get("node") != "UNASSIGNED"}) or len(nodes)
+
+    for name, index in indices.items():
+        primaries = index["primaries"]
+        index["avg_primary_gb"] = round(index["primary_bytes"] / primaries / GB, 3) if primaries else 0
+        index["recommended_primaries"] = recommend_shard_count(index["primary_bytes"], index["primary_docs"], data_nodes)
+        segment_count = layout.get("segments", {}).get(name, {}).get("primaries", {}).get("segments", {}).get("count")
+        index["segments_per_primary"] = round(segment_count / primaries, 1) if segment_count is not None and primaries else None
+
+        if primaries > 1 and index["primary_bytes"] / primaries < SHARD_MIN_GB * GB:
+            findings.append({
+                "severity": "medium", "type": "undersized_shards", "index": name,
+                "message": f"{name} spreads {index['primary_bytes'] / GB:.2f} GB over {primaries} primaries; "
+                           f"{index['recommended_primaries']} would do (shrink or reindex)"
+            })
+        if index["segments_per_primary"] and index["segments_per_primary"] > SEGMENTS_PER_SHARD_WARN:
+            findings.append({
+                "severity": "low", "type": "segment_count", "index": name,
+                "message": f"{name} averages {index['segments_per_primary']} segments per primary; "
+                           f"force merge once it stops receiving writes"
+            })
+        if index["unassigned"]:
+            findings.append({
+                "severity": "high", "type": "unassigned_shards", "index": name,
+                "message": f"{name} has {index['unassigned']} unassigned shard copies"
+            })
+        # Hot spot: one node carries more of this index than an even spread would give it
+        copies = sum(index_nodes.get(name, {}).values())
+        if data_nodes > 1 and copies > 1:
+            fair_share = math.ceil(copies / data_nodes)
+            busiest, count = max(index_nodes[name].items(), key=lambda item: item[1])
+            if count > fair_share and len(index_nodes[name]) < min(copies, data_nodes):
+                findings.append({
+                    "severity": "medium", "type": "index_hot_spot", "index": name,
+                    "message": f"{busiest} holds {count} of {name}'s {copies} shard copies "
+                               f"while only {len(index_nodes[name])} of {data_nodes} nodes carry any"
+                })
+
+    if len(nodes) > 1:
+        mean_shards = sum(n["shards"] for n in nodes.values()) / len(nodes)
+        mean_bytes = sum(n["bytes"] for n in nodes.values()) / len(nodes)
+        for node_name, node in nodes.items():
+            if node["shards"] > mean_shards * NODE_SKEW_RATIO or (mean_bytes and node["bytes"] > mean_bytes * NODE_SKEW_RATIO):
+                findings.append({
+                    "severity": "medium", "type": "node_skew", "node": node_name,
+                    "message": f"{node_name} holds {node['shards']} shards / {node['bytes'] / GB:.1f} GB "
+                               f"against a mean of {mean_shards:.1f} / {mean_bytes / GB:.1f} GB"
+                })
+
+    severity_order = {"high": 0, "medium": 1, "low": 2}
+    findings.sort(key=lambda f: severity_order[f["severity"]])
+    return {
+        "data_nodes": data_nodes,
+        "nodes": nodes,
+        "indices": indices,
+        "findings": findings,
+        "thresholds": {
+            "target_gb": SHARD_TARGET_GB, "max_gb": SHARD_MAX_GB, "min_gb": SHARD_MIN_GB,
+            "max_docs": SHARD_MAX_DOCS, "segments_per_shard": SEGMENTS_PER_SHARD_WARN
+        }
+    }
+
+
+def fetch_oracle_table_volumes(oracle_env: Dict[str, Any], tables: List[str]) -> Dict[str, Dict[str, Any]]:
+    """num_rows and avg_row_len optimizer statistics of the given tables"""
+    if not tables:
+        return {}
+    names = [t.upper() for t in tables]
+    binds = ",".join(f":t{i}" for i in range(len(names)))
+    with oracledb.connect(user=oracle_env['username'], password=oracle_env['password'], dsn=oracle_env['url']) as connection:
+        cursor = connection.cursor()
+        cursor.execute(
+            f"SELECT table_name, num_rows, avg_row_len, last_analyzed FROM user_tables WHERE table_name IN ({binds})",
+            {f"t{i}": name for i, name in enumerate(names)}
+        )
+        return {
+            row[0]: {
+                "num_rows": row[1] or 0,
+                "avg_row_len": row[2] or 0,
+                "last_analyzed": row[3].isoformat() if row[3] else None
+            } for row in cursor.fetchall()
+        }
+
+
+def recommend_workflow_shards(volumes: Dict[str, Dict[str, Any]], tables: List[str],
+                              relationships: List[Dict[str, Any]], data_nodes: int = 0) -> Dict[str, Any]:
+    """
+    Shard plan for a workflow index. Child tables are nested into their
+    parents, so documents come from the root tables while every table
+    contributes bytes.
+    """
+    children = {str(r.get('childTable', '')).upper() for r in relationships}
+    roots = [t.upper() for t in tables if t.upper() not in children] or [t.upper() for t in tables]
+
+    expected_docs = sum(volumes.get(t, {}).get("num_rows", 0) for t in roots)
+    estimated_bytes = sum(
+        v.get("num_rows", 0) * v.get("avg_row_len", 0) for t, v in volumes.items() if t in {x.upper() for x in tables}
+    ) * ORACLE_TO_ES_SIZE_FACTOR
+    missing = [t.upper() for t in tables if t.upper() not in volumes or not volumes[t.upper()]["last_analyzed"]]
+
+    return {
+        "number_of_shards": recommend_shard_count(estimated_bytes, expected_docs, data_nodes),
+        "number_of_replicas": 1 if data_nodes > 1 else 0,
+        "expected_docs": expected_docs,
+        "estimated_gb": round(estimated_bytes / GB, 3),
+        "root_tables": roots,
+        "tables_without_statistics": missing,
+        "data_nodes": data_nodes
+    }
+
+
+def count_data_nodes(host_url: str, auth: Optional[tuple]) -> int:
+    response = requests.get(
+        f"{host_url}/_cat/nodes", params={"format": "json", "h": "name,node.role"},
+        auth=auth, timeout=10, verify=False
+    )
+    response.raise_for_status()
+    # Data roles: d (data) and the data tiers h/w/c/f/s
+    return sum(1 for n in response.json() if set(n.get("node.role", "")) & set("dhwcfs"))
+
+
+def fetch_oracle_column_stats(oracle_env: Dict[str, Any], tables: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Optimizer statistics per table: num_rows from user_tables plus, per
+    column, type, precision/scale, NDV, nulls and average length from
+    user_tab_columns.
+    """
+    if not tables:
+        return {}
+    names = [t.upper() for t in tables]
+    binds = ",".join(f":t{i}" for i in range(len(names)))
+    params = {f"t{i}": name for i, name in enumerate(names)}
+    with oracledb.connect(user=oracle_env['username'], password=oracle_env['password'], dsn=oracle_env['url']) as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"SELECT table_name, num_rows FROM user_tables WHERE table_name IN ({binds})", params)
+        stats = {row[0]: {"num_rows": row[1] or 0, "columns": {}} for row in cursor.fetchall()}
+        cursor.execute(
+            f"""SELECT table_name, column_name, data_type, data_length, data_precision, data_scale,
+                       num_distinct, num_nulls, avg_col_len
+                FROM user_tab_columns WHERE table_name IN ({binds})""",
+            params
+        )
+        for row in cursor.fetchall():
+            stats.setdefault(row[0], {"num_rows": 0, "columns": {}})["columns"][row[1]] = {
+                "data_type": row[2],
+                "data_length": row[3],
+                "data_precision": row[4],
+                "data_scale": row[5],
+                "num_distinct": row[6],
+                "num_nulls": row[7],
+                "avg_col_len": row[8]
+            }
+    return stats
+
+
+@app.get("/api/shard-analysis/{env_id}")
+async def get_shard_analysis(env_id: int, index: str = "*"):
+    """Shard sizing, segment and distribution findings for an index pattern"""
+    try:
+        host_url, auth = get_environment_target(env_id)
+        layout = await asyncio.to_thread(fetch_shard_layout, host_url, auth, index)
+        return {"success": True, "analysis": analyze_shards(layout)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/oracle/mapping-cost/{env_id}")
+async def get_mapping_cost(env_id: int, request: Request):
+    """Estimate a mapping's size and suggest field changes from Oracle column statistics"""
+    try:
+        data = await request.json()
+        oracle_env = next((e for e in get_oracle_environments() if e['id'] == env_id), None)
+        if not oracle_env:
+            raise ValueError("Oracle environment not found")
+        tables = data.get('tables', [])
+        column_stats = await asyncio.to_thread(fetch_oracle_column_stats, oracle_env, tables)
+        return {"success": True, "estimate": estimate_mapping_cost(data.get('mapping', {}), column_stats, tables,
+                                                                   data.get('relationships', []))}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/oracle/shard-recommendation/{env_id}")
+async def get_shard_recommendation(env_id: int, request: Request):
+    """Shard and replica counts for a workflow index from Oracle table statistics"""
+    try:
+        data = await request.json()
+        oracle_env = next((e for e in get_oracle_environments() if str(e['id']) == str(data.get('oracleEnvId'))), None)
+        if not oracle_env:
+            raise ValueError("Oracle environment not found")
+        host_url, auth = get_environment_target(env_id)
+        tables = data.get('tables', [])
+        volumes = await asyncio.to_thread(fetch_oracle_table_volumes, oracle_env, tables)
+        data_nodes = await asyncio.to_thread(count_data_nodes, host_url, auth)
+        return {"success": True, "plan": recommend_workflow_shards(volumes, tables, data.get('relationships', []), data_nodes)}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 
 
 def update_elasticsearch_settings(
@@ -5207,13 +8661,86 @@ def validate_index_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
         'warnings': warnings
     }
 
+# ================================
+# Bulk operation executor
+# ================================
+
+BULK_OPERATION_CONCURRENCY = int(os.getenv("BULK_OPERATION_CONCURRENCY", "4"))
+
+# host_url -> (limit, semaphore) shared by every bulk operation against that cluster
+_cluster_bulk_slots: Dict[str, tuple] = {}
+_cluster_bulk_slots_lock = threading.Lock()
+
+
+def cluster_bulk_slots(host_url: str, limit: int) -> threading.BoundedSemaphore:
+    """Semaphore capping in-flight bulk requests on one cluster across concurrent operations"""
+    with _cluster_bulk_slots_lock:
+        current = _cluster_bulk_slots.get(host_url)
+        if current is None or current[0] != limit:
+            current = _cluster_bulk_slots[host_url] = (limit, threading.BoundedSemaphore(limit))
+        return current[1]
+
+
+def run_per_index(
+        host_url: str,
+        indices: List[str],
+        operation: str,
+        task,
+        concurrency: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Run task(index_name) for every index with bounded concurrency. Results
+    keep the order of indices; a raised exception becomes a failed result.
+    """
+    limit = max(1, concurrency or BULK_OPERATION_CONCURRENCY)
+    slots = cluster_bulk_slots(host_url, limit)
+
+    def guarded(index_name: str) -> Dict[str, Any]:
+        with slots:
+            try:
+                return task(index_name)
+            except Exception as e:
+                return {
+                    "index": index_name,
+                    "operation": operation,
+                    "success": False,
+                    "error": str(e)
+                }
+
+    if len(indices) <= 1:
+        return [guarded(index_name) for index_name in indices]
+    with ThreadPoolExecutor(max_workers=min(limit, len(indices))) as executor:
+        return list(executor.map(guarded, indices))
+
+
+def chunk_index_names(indices: List[str], max_length: int = MAX_INDEX_LIST_URL_LENGTH) -> List[List[str]]:
+    """Split index names into groups whose comma-joined form fits in a URL path"""
+    chunks, current, length = [], [], 0
+    for index_name in indices:
+        added = len(index_name) + (1 if current else 0)
+        if current and length + added > max_length:
+            chunks.append(current)
+            current, length = [], 0
+            added = len(index_name)
+        current.append(index_name)
+        length += added
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 def execute_elasticsearch_bulk_operation(
         host_url: str,
         operation: Dict[str, Any],
         username: Optional[str] = None,
-        password: Optional[str] = None
+        password: Optional[str] = None,
+        concurrency: Optional[int] = None
 ) -> Dict[str, Any]:
-    """Execute bulk operations on multiple Elasticsearch indices"""
+    """
+    Execute bulk operations on multiple Elasticsearch indices. Per-index
+    requests run with at most `concurrency` (the environment's
+    bulk_concurrency) in flight on the cluster.
+    """
     try:
         if not host_url.startswith(('http://', 'https://')):
             host_url = f'http://{host_url}'
@@ -5232,11 +8759,13 @@ def execute_elasticsearch_bulk_operation(
                 "error": "No indices specified for bulk operation"
             }
 
+        concurrency = max(1, concurrency or BULK_OPERATION_CONCURRENCY)
+
         results = []
 
         # Execute operation based on type
         if operation_type == 'update_settings':
-            results = bulk_update_settings(host_url, indices, parameters, auth)
+            results = bulk_update_settings(host_url, indices, parameters, auth, concurrency)
 
         elif operation_type == 'create_aliases':
             results = bulk_create_aliases(host_url, indices, parameters, auth)
@@ -5245,25 +8774,25 @@ def execute_elasticsearch_bulk_operation(
             results = bulk_delete_aliases(host_url, indices, parameters, auth)
 
         elif operation_type == 'reindex':
-            results = bulk_reindex(host_url, indices, parameters, auth)
+            results = bulk_reindex(host_url, indices, parameters, auth, concurrency)
 
         elif operation_type == 'close':
-            results = bulk_close_indices(host_url, indices, auth)
+            results = bulk_close_indices(host_url, indices, auth, concurrency)
 
         elif operation_type == 'open':
-            results = bulk_open_indices(host_url, indices, auth)
+            results = bulk_open_indices(host_url, indices, auth, concurrency)
 
         elif operation_type == 'delete':
-            results = bulk_delete_indices(host_url, indices, auth)
+            results = bulk_delete_indices(host_url, indices, auth, concurrency)
 
         elif operation_type == 'force_merge':
-            results = bulk_force_merge(host_url, indices, parameters, auth)
+            results = bulk_force_merge(host_url, indices, parameters, auth, concurrency)
 
         elif operation_type == 'refresh':
-            results = bulk_refresh_indices(host_url, indices, auth)
+            results = bulk_refresh_indices(host_url, indices, auth, concurrency)
 
         elif operation_type == 'flush':
-            results = bulk_flush_indices(host_url, indices, auth)
+            results = bulk_flush_indices(host_url, indices, auth, concurrency)
 
         else:
             return {
@@ -5298,33 +8827,25 @@ def bulk_update_settings(
         host_url: str,
         indices: List[str],
         settings: Dict[str, Any],
-        auth: Optional[tuple]
+        auth: Optional[tuple],
+        concurrency: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """Update settings for multiple indices"""
-    results = []
-
-    for index_name in indices:
-        try:
-            result = update_elasticsearch_settings(
-                host_url, index_name, settings,
-                auth[0] if auth else None,
-                auth[1] if auth else None
-            )
-            results.append({
-                "index": index_name,
-                "operation": "update_settings",
-                "success": result.get('success', False),
-                "details": result
-            })
-        except Exception as e:
-            results.append({
-                "index": index_name,
-                "operation": "update_settings",
-                "success": False,
-                "error": str(e)
-            })
+    # Per index: static settings need the index closed and reopened
+    def update(index_name: str) -> Dict[str, Any]:
+        result = update_elasticsearch_settings(
+            host_url, index_name, settings,
+            auth[0] if auth else None,
+            auth[1] if auth else None
+        )
+        return {
+            "index": index_name,
+            "operation": "update_settings",
+            "success": result.get('success', False),
+            "details": result
+        }
 
-    return results
+    return run_per_index(host_url, indices, "update_settings", update, concurrency)
 
 def bulk_create_aliases(
         host_url: str,
@@ -5458,196 +8979,396 @@ def bulk_reindex(
         host_url: str,
         indices: List[str],
         parameters: Dict[str, Any],
-        auth: Optional[tuple]
+        auth: Optional[tuple],
+        concurrency: Optional[int] = None
 ) -> List[Dict[str, Any]]:
-    """Reindex multiple indices"""
-    results = []
+    """
+    Start a reindex task per index (wait_for_completion=false, slices=auto).
+    Results carry the Elasticsearch task id; progress is polled through
+    /api/reindex-tasks.
+    """
     dest_suffix = parameters.get('dest_suffix', '_reindexed')
+    params = {"wait_for_completion": "false", "slices": parameters.get('slices', 'auto')}
+    if parameters.get('requests_per_second') is not None:
+        params["requests_per_second"] = parameters['requests_per_second']
 
-    for index_name in indices:
-        try:
-            dest_index = f"{index_name}{dest_suffix}"
+    def reindex(index_name: str) -> Dict[str, Any]:
+        dest_index = f"{index_name}{dest_suffix}"
+
+        reindex_body = {
+            "source": {"index": index_name},
+            "dest": {"index": dest_index}
+        }
+
+        # Add any additional reindex parameters
+        if 'query' in parameters:
+            reindex_body['source']['query'] = parameters['query']
+
+        if 'script' in parameters:
+            reindex_body['script'] = parameters['script']
+
+        response = requests.post(
+            f"{host_url}/_reindex",
+            params=params,
+            json=reindex_body,
+            auth=auth,
+            timeout=30,
+            verify=False
+        )
 
-            reindex_body = {
-                "source": {"index": index_name},
-                "dest": {"index": dest_index}
+        if response.status_code == 200 and 'task' in response.json():
+            return {
+                "index": index_name,
+                "operation": "reindex",
+                "success": True,
+                "destination": dest_index,
+                "task_id": response.json()['task'],
+                "status": "running"
             }
+        return {
+            "index": index_name,
+            "operation": "reindex",
+            "success": False,
+            "error": response.text
+        }
+
+    return run_per_index(host_url, indices, "reindex", reindex, concurrency)
+
+# ================================
+# Reindex task tracking
+# ================================
+
+def record_reindex_tasks(env_id: int, result: Dict[str, Any], parameters: Dict[str, Any]):
+    """Store the task ids of a bulk reindex so they can be polled, rethrottled or cancelled"""
+    tasks = [item for item in result.get('results', []) if item.get('task_id')] if isinstance(result, dict) else []
+    if not tasks:
+        return
+    with get_db() as conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO reindex_tasks
+               (env_id, task_id, source_index, dest_index, status, requests_per_second)
+               VALUES (?, ?, ?, ?, 'running', ?)""",
+            [(env_id, item['task_id'], item['index'], item['destination'], parameters.get('requests_per_second'))
+             for item in tasks]
+        )
+        conn.commit()
+
+
+def get_reindex_task_row(env_id: int, task_id: str) -> Dict[str, Any]:
+    with get_db() as conn:
+        row = conn.execute(
+            "SELECT * FROM reindex_tasks WHERE env_id = ? AND task_id = ?", (env_id, task_id)
+        ).fetchone()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Reindex task not found")
+    return dict(row)
+
+
+def reindex_task_progress(task_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Progress, rates and failures from a GET _tasks/{id} response"""
+    task = task_data.get('task', {})
+    status = task.get('status', {})
+    running_seconds = task.get('running_time_in_nanos', 0) / 1e9
+    total = status.get('total', 0)
+    processed = status.get('created', 0) + status.get('updated', 0) + status.get('deleted', 0) \
+        + status.get('noops', 0) + status.get('version_conflicts', 0)
+    response = task_data.get('response', {})
+
+    failures = list(response.get('failures', []))
+    error = task_data.get('error')
+    if task_data.get('completed'):
+        cancelled = status.get('canceled') or response.get('canceled')
+        state = 'failed' if error or failures else ('cancelled' if cancelled else 'completed')
+    else:
+        state = 'cancelling' if task.get('cancelled') else 'running'
+
+    return {
+        "status": state,
+        "total": total,
+        "processed": processed,
+        "percent": round(processed / total * 100, 2) if total else (100.0 if task_data.get('completed') else 0.0),
+        "created": status.get('created', 0),
+        "updated": status.get('updated', 0),
+        "version_conflicts": status.get('version_conflicts', 0),
+        "batches": status.get('batches', 0),
+        "docs_per_second": round(processed / running_seconds, 2) if running_seconds else 0.0,
+        "requests_per_second": status.get('requests_per_second'),
+        "throttled_millis": status.get('throttled_millis', 0),
+        "running_seconds": round(running_seconds, 2),
+        "failures": failures[:20],
+        "failure_count": len(failures),
+        "error": (error or {}).get('reason') if isinstance(error, dict) else error,
+        "cancellable": task.get('cancellable', False) and not task_data.get('completed')
+    }
+
+
+def lost_reindex_task_progress(host_url: str, auth: Optional[tuple], row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Progress for a task _tasks no longer knows (result dropped from .tasks,
+    cluster restarted): the outcome is unknown, the destination doc count is
+    what can still be checked.
+    """
+    try:
+        dest_docs, count_error = count_index_docs(host_url, auth, row['dest_index']), None
+    except Exception as e:
+        dest_docs, count_error = None, str(e)
+    return {
+        "status": "unknown",
+        "dest_docs": dest_docs,
+        "error": "Task no longer known to the cluster; check the destination index"
+                 + (f" ({count_error})" if count_error else ""),
+        "requests_per_second": None,
+        "cancellable": False
+    }
 
-            # Add any additional reindex parameters
-            if 'query' in parameters:
-                reindex_body['source']['query'] = parameters['query']
 
-            if 'script' in parameters:
-                reindex_body['script'] = parameters['script']
+@app.get("/api/reindex-tasks/{env_id}")
+async def list_reindex_tasks(env_id: int, status: Optional[str] = None, limit: int = 100):
+    """Tracked reindex tasks of an environment, newest first (last polled state)"""
+    try:
+        query = "SELECT * FROM reindex_tasks WHERE env_id = ?"
+        params: List[Any] = [env_id]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with get_db() as conn:
+            rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+        for row in rows:
+            row['progress'] = json.loads(row.pop('progress_json') or 'null')
+        return {"success": True, "tasks": rows}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.get("/api/reindex-tasks/{env_id}/{task_id}")
+async def get_reindex_task_status(env_id: int, task_id: str):
+    """Poll _tasks for a reindex task and store its progress"""
+    try:
+        row = get_reindex_task_row(env_id, task_id)
+        host_url, auth = get_environment_target(env_id)
+
+        response = requests.get(
+            f"{host_url}/_tasks/{task_id}",
+            auth=auth,
+            timeout=10,
+            verify=False
+        )
+        if response.status_code == 404:
+            progress = lost_reindex_task_progress(host_url, auth, row)
+        elif response.status_code != 200:
+            raise Exception(f"Failed to fetch task: {response.status_code} {response.text}")
+        else:
+            progress = reindex_task_progress(response.json())
+        completed = progress['status'] not in ('running', 'cancelling')
+        with get_db() as conn:
+            conn.execute(
+                """UPDATE reindex_tasks
+                   SET status = ?, progress_json = ?, error = ?, requests_per_second = COALESCE(?, requests_per_second),
+                       updated_at = CURRENT_TIMESTAMP,
+                       completed_at = CASE WHEN ? THEN COALESCE(completed_at, CURRENT_TIMESTAMP) ELSE NULL END
+                   WHERE env_id = ? AND task_id = ?""",
+                (progress['status'], json.dumps(progress), progress['error'], progress['requests_per_second'],
+                 completed, env_id, task_id)
+            )
+            conn.commit()
+
+        if completed and row['status'] in ('running', 'cancelling'):
+            invalidate_index_caches(env_id, row['dest_index'])
+
+        return {
+            "success": True,
+            "task_id": task_id,
+            "source_index": row['source_index'],
+            "dest_index": row['dest_index'],
+            **progress
+        }
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@app.post("/api/reindex-tasks/{env_id}/{task_id}/rethrottle")
+async def rethrottle_reindex_task(env_id: int, task_id: str, requests_per_second: float = -1):
+    """Change the throttle of a running reindex (-1 removes it)"""
+    try:
+        get_reindex_task_row(env_id, task_id)
+        host_url, auth = get_environment_target(env_id)
+
+        response = requests.post(
+            f"{host_url}/_reindex/{task_id}/_rethrottle",
+            params={"requests_per_second": requests_per_second},
+            auth=auth,
+            timeout=10,
+            verify=False
+        )
+        if response.status_code != 200:
+            raise Exception(f"Failed to rethrottle task: {response.status_code} {response.text}")
 
-            response = requests.post(
-                f"{host_url}/_reindex",
-                json=reindex_body,
-                auth=auth,
-                timeout=300,  # Longer timeout for reindex
-                verify=False
+        with get_db() as conn:
+            conn.execute(
+                "UPDATE reindex_tasks SET requests_per_second = ?, updated_at = CURRENT_TIMESTAMP WHERE env_id = ? AND task_id = ?",
+                (None if requests_per_second < 0 else requests_per_second, env_id, task_id)
             )
+            conn.commit()
+        return {"success": True, "task_id": task_id, "requests_per_second": requests_per_second}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-            if response.status_code == 200:
-                reindex_result = response.json()
-                results.append({
-                    "index": index_name,
-                    "operation": "reindex",
-                    "success": True,
-                    "destination": dest_index,
-                    "documents_processed": reindex_result.get('total', 0),
-                    "time_taken": reindex_result.get('took', 0)
-                })
-            else:
-                results.append({
-                    "index": index_name,
-                    "operation": "reindex",
-                    "success": False,
-                    "error": response.text
-                })
 
-        except Exception as e:
-            results.append({
-                "index": index_name,
-                "operation": "reindex",
-                "success": False,
-                "error": str(e)
-            })
+@app.post("/api/reindex-tasks/{env_id}/{task_id}/cancel")
+async def cancel_reindex_task(env_id: int, task_id: str):
+    """Cancel a running reindex; documents already copied stay in the destination"""
+    try:
+        get_reindex_task_row(env_id, task_id)
+        host_url, auth = get_environment_target(env_id)
 
-    return results
+        response = requests.post(
+            f"{host_url}/_tasks/{task_id}/_cancel",
+            auth=auth,
+            timeout=10,
+            verify=False
+        )
+        if response.status_code != 200:
+            raise Exception(f"Failed to cancel task: {response.status_code} {response.text}")
+
+        with get_db() as conn:
+            conn.execute(
+                "UPDATE reindex_tasks SET status = 'cancelling', updated_at = CURRENT_TIMESTAMP WHERE env_id = ? AND task_id = ?",
+                (env_id, task_id)
+            )
+            conn.commit()
+        return {"success": True, "task_id": task_id, "status": "cancelling"}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
 
-def bulk_close_indices(host_url: str, indices: List[str], auth: Optional[tuple]) -> List[Dict[str, Any]]:
+def bulk_close_indices(host_url: str, indices: List[str], auth: Optional[tuple],
+                       concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
     """Close multiple indices"""
-    return bulk_index_operation(host_url, indices, "close", auth)
+    return bulk_index_operation(host_url, indices, "close", auth, concurrency)
 
-def bulk_open_indices(host_url: str, indices: List[str], auth: Optional[tuple]) -> List[Dict[str, Any]]:
+def bulk_open_indices(host_url: str, indices: List[str], auth: Optional[tuple],
+                      concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
     """Open multiple indices"""
-    return bulk_index_operation(host_url, indices, "open", auth)
+    return bulk_index_operation(host_url, indices, "open", auth, concurrency)
 
-def bulk_delete_indices(host_url: str, indices: List[str], auth: Optional[tuple]) -> List[Dict[str, Any]]:
+def bulk_delete_indices(host_url: str, indices: List[str], auth: Optional[tuple],
+                        concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
     """Delete multiple indices"""
-    results = []
-
-    for index_name in indices:
-        try:
-            response = requests.delete(
-                f"{host_url}/{index_name}",
-                auth=auth,
-                timeout=30,
-                verify=False
-            )
-
-            results.append({
-                "index": index_name,
-                "operation": "delete",
-                "success": response.status_code == 200,
-                "error": response.text if response.status_code != 200 else None
-            })
-
-        except Exception as e:
-            results.append({
-                "index": index_name,
-                "operation": "delete",
-                "success": False,
-                "error": str(e)
-            })
-
-    return results
+    return bulk_index_operation(host_url, indices, "delete", auth, concurrency)
 
 def bulk_force_merge(
         host_url: str,
         indices: List[str],
         parameters: Dict[str, Any],
-        auth: Optional[tuple]
+        auth: Optional[tuple],
+        concurrency: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """Force merge multiple indices"""
-    results = []
     max_num_segments = parameters.get('max_num_segments', 1)
 
-    for index_name in indices:
-        try:
-            response = requests.post(
-                f"{host_url}/{index_name}/_forcemerge?max_num_segments={max_num_segments}",
-                auth=auth,
-                timeout=300,  # Longer timeout for force merge
-                verify=False
-            )
-
-            if response.status_code == 200:
-                merge_result = response.json()
-                results.append({
-                    "index": index_name,
-                    "operation": "force_merge",
-                    "success": True,
-                    "segments_merged": merge_result.get('_shards', {}).get('successful', 0)
-                })
-            else:
-                results.append({
-                    "index": index_name,
-                    "operation": "force_merge",
-                    "success": False,
-                    "error": response.text
-                })
+    # One request per index so a slow merge only holds its own slot
+    def force_merge(index_name: str) -> Dict[str, Any]:
+        response = requests.post(
+            f"{host_url}/{index_name}/_forcemerge?max_num_segments={max_num_segments}",
+            auth=auth,
+            timeout=300,  # Longer timeout for force merge
+            verify=False
+        )
 
-        except Exception as e:
-            results.append({
+        if response.status_code == 200:
+            merge_result = response.json()
+            return {
                 "index": index_name,
                 "operation": "force_merge",
-                "success": False,
-                "error": str(e)
-            })
+                "success": True,
+                "segments_merged": merge_result.get('_shards', {}).get('successful', 0)
+            }
+        return {
+            "index": index_name,
+            "operation": "force_merge",
+            "success": False,
+            "error": response.text
+        }
 
-    return results
+    return run_per_index(host_url, indices, "force_merge", force_merge, concurrency)
 
-def bulk_refresh_indices(host_url: str, indices: List[str], auth: Optional[tuple]) -> List[Dict[str, Any]]:
+def bulk_refresh_indices(host_url: str, indices: List[str], auth: Optional[tuple],
+                         concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
     """Refresh multiple indices"""
-    return bulk_index_operation(host_url, indices, "refresh", auth)
+    return bulk_index_operation(host_url, indices, "refresh", auth, concurrency)
 
-def bulk_flush_indices(host_url: str, indices: List[str], auth: Optional[tuple]) -> List[Dict[str, Any]]:
+def bulk_flush_indices(host_url: str, indices: List[str], auth: Optional[tuple],
+                       concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
     """Flush multiple indices"""
-    return bulk_index_operation(host_url, indices, "flush", auth)
+    return bulk_index_operation(host_url, indices, "flush", auth, concurrency)
+
+def index_operation_request(host_url: str, target: str, operation: str, auth: Optional[tuple]) -> requests.Response:
+    """One close/open/refresh/flush/delete request against a (comma-joined) index target"""
+    if operation == 'delete':
+        return requests.delete(
+            f"{host_url}/{target}",
+            auth=auth,
+            timeout=30,
+            verify=False
+        )
+    return requests.post(
+        f"{host_url}/{target}/_{operation}",
+        auth=auth,
+        timeout=30,
+        verify=False
+    )
 
 def bulk_index_operation(
         host_url: str,
         indices: List[str],
         operation: str,
-        auth: Optional[tuple]
+        auth: Optional[tuple],
+        concurrency: Optional[int] = None
 ) -> List[Dict[str, Any]]:
-    """Generic bulk operation for simple index operations"""
-    results = []
+    """
+    Generic bulk operation for simple index operations. Indices are sent as
+    comma-joined targets; a group whose combined request fails is retried per
+    index so each failure is reported against the index that caused it.
+    """
+    def single(index_name: str) -> Dict[str, Any]:
+        response = index_operation_request(host_url, index_name, operation, auth)
+        return {
+            "index": index_name,
+            "operation": operation,
+            "success": response.status_code == 200,
+            "error": response.text if response.status_code != 200 else None
+        }
 
-    for index_name in indices:
+    def group(names: List[str]) -> List[Dict[str, Any]]:
+        if len(names) == 1:
+            return run_per_index(host_url, names, operation, single, concurrency)
         try:
-            if operation in ['close', 'open']:
-                response = requests.post(
-                    f"{host_url}/{index_name}/_{operation}",
-                    auth=auth,
-                    timeout=30,
-                    verify=False
-                )
-            else:  # refresh, flush
-                response = requests.post(
-                    f"{host_url}/{index_name}/_{operation}",
-                    auth=auth,
-                    timeout=30,
-                    verify=False
-                )
-
-            results.append({
-                "index": index_name,
-                "operation": operation,
-                "success": response.status_code == 200,
-                "error": response.text if response.status_code != 200 else None
-            })
-
-        except Exception as e:
-            results.append({
-                "index": index_name,
-                "operation": operation,
-                "success": False,
-                "error": str(e)
-            })
+            with cluster_bulk_slots(host_url, max(1, concurrency or BULK_OPERATION_CONCURRENCY)):
+                response = index_operation_request(host_url, ",".join(names), operation, auth)
+        except Exception:
+            response = None
+        if response is None or response.status_code != 200:
+            return run_per_index(host_url, names, operation, single, concurrency)
+
+        # refresh/flush report shard failures and close reports unclosed indices inside a 200 response
+        body = response.json()
+        failed = {}
+        for failure in body.get('_shards', {}).get('failures', []) or []:
+            failed.setdefault(failure.get('index'), json.dumps(failure.get('reason', failure)))
+        for index_name, status in (body.get('indices') or {}).items():
+            if isinstance(status, dict) and status.get('closed') is False:
+                failed.setdefault(index_name, json.dumps(status.get('failedShards', status)))
+        return [{
+            "index": index_name,
+            "operation": operation,
+            "success": index_name not in failed,
+            "error": failed.get(index_name)
+        } for index_name in names]
 
+    results = []
+    for names in chunk_index_names(indices):
+        results.extend(group(names))
     return results
 
 # Additional utility functions for the Enhanced Indices Manager
@@ -5758,30 +9479,116 @@ def generate_cluster_recommendations(health_data: Dict[str, Any], stats_data: Di
 
     return recommendations
 
+CLUSTER_SNAPSHOT_TTL = float(os.getenv("CLUSTER_SNAPSHOT_TTL", "10"))
+
+
+class ClusterSnapshotCache:
+    """
+    Per-environment get_cluster_health snapshot (health, _cluster/stats and
+    the derived score and recommendations) kept for CLUSTER_SNAPSHOT_TTL
+    seconds. Concurrent dashboard loads share one in-flight fetch; failed
+    fetches are not cached.
+    """
+
+    def __init__(self, ttl: float = CLUSTER_SNAPSHOT_TTL):
+        self.ttl = ttl
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, env: Dict[str, Any], refresh: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Return (snapshot, cache info) where info has status hit|miss|coalesced and age"""
+        env_id = env['id']
+        entry = self._entries.get(env_id)
+        if entry is not None and not refresh:
+            age = time.time() - entry["fetched_at"]
+            if age < self.ttl:
+                self.hits += 1
+                return entry["snapshot"], {"status": "hit", "age_seconds": round(age, 2)}
+
+        task = self._inflight.get(env_id)
+        if task is not None:
+            self.coalesced += 1
+            status = "coalesced"
+        else:
+            self.misses += 1
+            status = "miss"
+            task = self._start_fetch(env)
+        return await asyncio.shield(task), {"status": status, "age_seconds": 0.0}
+
+    def _start_fetch(self, env: Dict[str, Any]) -> asyncio.Task:
+        env_id = env['id']
+        generation = self._generation
+
+        async def load():
+            try:
+                snapshot = await asyncio.to_thread(
+                    get_cluster_health, env['host_url'], env.get('username'), env.get('password')
+                )
+                if snapshot.get("success") and generation == self._generation:
+                    self._entries[env_id] = {"snapshot": snapshot, "fetched_at": time.time()}
+                return snapshot
+            finally:
+                self._inflight.pop(env_id, None)
+
+        task = asyncio.create_task(load())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[env_id] = task
+        return task
+
+    def invalidate(self, env_id: Any):
+        self._generation += 1
+        self._entries.pop(int(env_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight)
+        }
+
+
+cluster_snapshot_cache = ClusterSnapshotCache()
+
 # Add these new API endpoints to your main FastAPI application
 
 @app.get("/api/cluster-health/{env_id}")
-async def get_cluster_health_endpoint(env_id: int):
-    """Get enhanced cluster health information"""
+async def get_cluster_health_endpoint(env_id: int, refresh: bool = False):
+    """Get enhanced cluster health information (cached snapshot, ?refresh=true to bypass)"""
     try:
         environments = get_elasticsearch_environments()
         env = next((e for e in environments if e['id'] == env_id), None)
         if not env:
             raise HTTPException(status_code=404, detail="Environment not found")
 
-        health_data = get_cluster_health(
-            env['host_url'],
-            env.get('username'),
-            env.get('password')
-        )
-        return health_data
+        health_data, cache_info = await cluster_snapshot_cache.get(env, refresh)
+        return {**health_data, "cache": cache_info}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/cluster-health-cache/stats")
+async def get_cluster_snapshot_cache_stats():
+    """Counters of the cluster health snapshot cache"""
+    return {"success": True, "stats": cluster_snapshot_cache.stats()}
+
+
 
 @app.get("/api/enhanced-indices-with-performance/{env_id}")
-async def get_enhanced_indices_with_performance(env_id: int):
+async def get_enhanced_indices_with_performance(
+        env_id: int,
+        search: Optional[str] = None,
+        sort: str = 'name',
+        order: str = 'asc',
+        page: int = 1,
+        size: Optional[int] = None
+):
     """Get indices with performance metrics"""
     try:
         environments = get_elasticsearch_environments()
@@ -5789,33 +9596,45 @@ async def get_enhanced_indices_with_performance(env_id: int):
         if not env:
             raise HTTPException(status_code=404, detail="Environment not found")
 
+        page, size = enhanced_indices_page(page, size)
+
         # Get basic indices
-        indices = get_elasticsearch_indices_enhanced(
+        listing = get_elasticsearch_indices_enhanced(
             env['host_url'],
             env.get('username'),
-            env.get('password')
+            env.get('password'),
+            name_filter=search,
+            sort_by=sort,
+            order=order,
+            offset=(page - 1) * size if size else 0,
+            limit=size
         )
+        indices = listing["indices"]
+
+        # Add performance metrics for the whole page from one stats call
+        try:
+            metrics = get_indices_performance_metrics(
+                env['host_url'],
+                [index['name'] for index in indices],
+                f"*{search}*" if search else "*",
+                env.get('username'),
+                env.get('password')
+            )
+            error = None
+        except Exception as e:
+            metrics, error = {}, str(e)
 
-        # Add performance metrics for each index
         for index in indices:
-            try:
-                perf_metrics = get_index_performance_metrics(
-                    env['host_url'],
-                    index['name'],
-                    env.get('username'),
-                    env.get('password')
-                )
-                index['performance'] = perf_metrics
-            except Exception as e:
-                index['performance'] = {
-                    'error': str(e),
-                    'searchLatency': 0,
-                    'indexingRate': 0,
-                    'cacheHitRatio': 0,
-                    'memoryUsage': 'Unknown'
-                }
+            index['performance'] = metrics.get(index['name']) or {
+                'error': error or 'No stats available',
+                'searchLatency': 0,
+                'indexingRate': 0,
+                'cacheHitRatio': 0,
+                'memoryUsage': 'Unknown'
+            }
+            index['performance']['recent'] = metrics_collector.summary(env_id, index['name'])
 
-        return {"success": True, "indices": indices}
+        return {"success": True, "indices": indices, "total": listing["total"], "page": page, "size": size}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -5844,28 +9663,7 @@ def get_index_performance_metrics(
 
         if response.status_code == 200:
             stats = response.json()
-            index_stats = stats.get('indices', {}).get(index_name, {})
-
-            # Extract performance metrics
-            total_stats = index_stats.get('total', {})
-            search_stats = total_stats.get('search', {})
-            indexing_stats = total_stats.get('indexing', {})
-
-            # Calculate metrics
-            search_time = search_stats.get('query_time_in_millis', 0)
-            search_count = search_stats.get('query_total', 1)
-            avg_search_latency = search_time / search_count if search_count > 0 else 0
-
-            indexing_time = indexing_stats.get('index_time_in_millis', 0)
-            indexing_count = indexing_stats.get('index_total', 1)
-            avg_indexing_rate = (indexing_count / (indexing_time / 1000)) if indexing_time > 0 else 0
-
-            return {
-                "searchLatency": round(avg_search_latency, 2),
-                "indexingRate": round(avg_indexing_rate, 2),
-                "cacheHitRatio": 0.85,  # This would need to be calculated from cache stats
-                "memoryUsage": f"{total_stats.get('store', {}).get('size_in_bytes', 0) // (1024*1024)}MB"
-            }
+            return performance_metrics_from_stats(stats.get('indices', {}).get(index_name, {}))
         else:
             raise Exception(f"Failed to get stats: {response.status_code}")
 
@@ -5873,6 +9671,34 @@ def get_index_performance_metrics(
         raise Exception(f"Error getting performance metrics: {str(e)}")
 
 
+def performance_metrics_from_stats(index_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Listing performance metrics from one index's _stats entry. These are
+    lifetime averages; windowed rates come from the metrics collector.
+    """
+    # Extract performance metrics
+    total_stats = index_stats.get('total', {})
+    search_stats = total_stats.get('search', {})
+    indexing_stats = total_stats.get('indexing', {})
+    query_cache = total_stats.get('query_cache', {})
+
+    # Calculate metrics
+    search_time = search_stats.get('query_time_in_millis', 0)
+    search_count = search_stats.get('query_total', 1)
+    avg_search_latency = search_time / search_count if search_count > 0 else 0
+
+    indexing_time = indexing_stats.get('index_time_in_millis', 0)
+    indexing_count = indexing_stats.get('index_total', 1)
+    avg_indexing_rate = (indexing_count / (indexing_time / 1000)) if indexing_time > 0 else 0
+
+    return {
+        "searchLatency": round(avg_search_latency, 2),
+        "indexingRate": round(avg_indexing_rate, 2),
+        "cacheHitRatio": hit_ratio(query_cache.get('hit_count', 0), query_cache.get('miss_count', 0)) or 0,
+        "memoryUsage": f"{total_stats.get('store', {}).get('size_in_bytes', 0) // (1024*1024)}MB"
+    }
+
+
 @app.get("/api/enhanced-settings/{env_id}/{index_name}")
 async def get_enhanced_settings(env_id: int, index_name: str):
     """Get enhanced settings for a specific index"""
@@ -5970,6 +9796,7 @@ async def get_performance_metrics(env_id: int, index_name: str):
                 "searchLatency": round(avg_search_latency, 2),
                 "indexingRate": round(avg_indexing_rate, 2),
                 "cacheHitRatio": round(cache_hit_ratio, 3),
+                "recent": metrics_collector.summary(env_id, index_name),
                 "memoryUsage": f"{store_stats.get('size_in_bytes', 0) // (1024*1024)}MB",
                 "searchTotal": search_stats.get('query_total', 0),
                 "indexingTotal": indexing_stats.get('index_total', 0),
@@ -5995,6 +9822,287 @@ async def get_performance_metrics(env_id: int, index_name: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting performance metrics: {str(e)}")
 
+# ================================
+# Performance metrics collector
+# ================================
+
+METRICS_COLLECTOR_ENABLED = os.getenv("METRICS_COLLECTOR_ENABLED", "true").lower() == "true"
+METRICS_SAMPLE_INTERVAL = int(os.getenv("METRICS_SAMPLE_INTERVAL", "30"))
+METRICS_RETENTION_SAMPLES = int(os.getenv("METRICS_RETENTION_SAMPLES", "720"))
+METRICS_SUMMARY_WINDOW = int(os.getenv("METRICS_SUMMARY_WINDOW", "300"))
+
+# Monotonic counters sampled from _nodes/stats (cluster) and _stats (indices)
+METRIC_COUNTERS = (
+    "query_total", "query_time_ms", "index_total", "index_time_ms",
+    "query_cache_hits", "query_cache_misses", "request_cache_hits", "request_cache_misses"
+)
+
+
+def hit_ratio(hits: int, misses: int) -> Optional[float]:
+    total = hits + misses
+    return round(hits / total, 3) if total else None
+
+
+def counters_from_stats(stats: Dict[str, Any]) -> Dict[str, int]:
+    """METRIC_COUNTERS from an indices-stats block (node indices or index total)"""
+    search = stats.get('search', {})
+    indexing = stats.get('indexing', {})
+    query_cache = stats.get('query_cache', {})
+    request_cache = stats.get('request_cache', {})
+    return {
+        "query_total": search.get('query_total', 0),
+        "query_time_ms": search.get('query_time_in_millis', 0),
+        "index_total": indexing.get('index_total', 0),
+        "index_time_ms": indexing.get('index_time_in_millis', 0),
+        "query_cache_hits": query_cache.get('hit_count', 0),
+        "query_cache_misses": query_cache.get('miss_count', 0),
+        "request_cache_hits": request_cache.get('hit_count', 0),
+        "request_cache_misses": request_cache.get('miss_count', 0)
+    }
+
+
+def counter_deltas(previous: Dict[str, int], current: Dict[str, int]) -> Optional[Dict[str, int]]:
+    """Counter increments between two samples; None after a reset (node restart, index recreated)"""
+    deltas = {key: current.get(key, 0) - previous.get(key, 0) for key in METRIC_COUNTERS}
+    return None if any(value < 0 for value in deltas.values()) else deltas
+
+
+def rates_from_deltas(deltas: Dict[str, int], seconds: float) -> Dict[str, Any]:
+    """Chart metrics from summed counter increments over `seconds`"""
+    return {
+        "search_rate": round(deltas["query_total"] / seconds, 3) if seconds else None,
+        "query_latency_ms": round(deltas["query_time_ms"] / deltas["query_total"], 3) if deltas["query_total"] else None,
+        "indexing_rate": round(deltas["index_total"] / seconds, 3) if seconds else None,
+        "index_latency_ms": round(deltas["index_time_ms"] / deltas["index_total"], 3) if deltas["index_total"] else None,
+        "query_cache_hit_ratio": hit_ratio(deltas["query_cache_hits"], deltas["query_cache_misses"]),
+        "request_cache_hit_ratio": hit_ratio(deltas["request_cache_hits"], deltas["request_cache_misses"])
+    }
+
+
+class MetricsCollector:
+    """
+    Samples _nodes/stats, _stats and _cluster/health per environment and
+    keeps counter deltas in a ring buffer of METRICS_RETENTION_SAMPLES points.
+    Rates and hit ratios are computed from summed deltas over the requested
+    window, so they reflect recent traffic rather than lifetime averages.
+    """
+
+    def __init__(self, retention: int = METRICS_RETENTION_SAMPLES):
+        self.retention = retention
+        self._points: Dict[int, deque] = {}
+        self._last: Dict[int, Dict[str, Any]] = {}
+        self._errors: Dict[int, str] = {}
+        self._listing_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def sample(self, env: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Take one sample; returns the new delta point (None for the first sample)"""
+        host_url = env['host_url'] if env['host_url'].startswith(('http://', 'https://')) else f"http://{env['host_url']}"
+        auth = (env['username'], env['password']) if env.get('username') and env.get('password') else None
+
+        nodes = requests.get(
+            f"{host_url}/_nodes/stats/indices,jvm",
+            params={"filter_path": "nodes.*.indices.search,nodes.*.indices.indexing,nodes.*.indices.query_cache,"
+                                   "nodes.*.indices.request_cache,nodes.*.jvm.mem.heap_used_percent"},
+            auth=auth, timeout=10, verify=False
+        )
+        nodes.raise_for_status()
+        indices = requests.get(
+            f"{host_url}/_stats/search,indexing,query_cache,request_cache",
+            params={"level": "indices", "filter_path": "indices.*.total"},
+            auth=auth, timeout=30, verify=False
+        )
+        indices.raise_for_status()
+        health = requests.get(
+            f"{host_url}/_cluster/health",
+            params={"filter_path": "status,number_of_nodes,active_shards,relocating_shards,initializing_shards,unassigned_shards"},
+            auth=auth, timeout=10, verify=False
+        )
+        health.raise_for_status()
+
+        cluster = dict.fromkeys(METRIC_COUNTERS, 0)
+        heap = []
+        for node in nodes.json().get('nodes', {}).values():
+            for key, value in counters_from_stats(node.get('indices', {})).items():
+                cluster[key] += value
+            heap.append(node.get('jvm', {}).get('mem', {}).get('heap_used_percent', 0))
+        index_counters = {name: counters_from_stats(data.get('total', {}))
+                          for name, data in indices.json().get('indices', {}).items()}
+
+        current = {"ts": time.time(), "cluster": cluster, "indices": index_counters}
+        env_id = env['id']
+        with self._lock:
+            previous = self._last.get(env_id)
+            self._last[env_id] = current
+            self._errors.pop(env_id, None)
+            if previous is None:
+                return None
+
+            point = {
+                "ts": current["ts"],
+                "seconds": current["ts"] - previous["ts"],
+                "cluster": counter_deltas(previous["cluster"], cluster),
+                "indices": {},
+                "health": health.json(),
+                "max_heap_used_percent": max(heap) if heap else None
+            }
+            for name, counters in index_counters.items():
+                deltas = counter_deltas(previous["indices"].get(name, counters), counters)
+                # Idle indices are left out to keep points small
+                if deltas and any(deltas.values()):
+                    point["indices"][name] = deltas
+            self._points.setdefault(env_id, deque(maxlen=self.retention)).append(point)
+            return point
+
+    def record_error(self, env_id: int, error: str):
+        with self._lock:
+            self._errors[env_id] = error
+
+    def record_listing_error(self, error: Optional[str]):
+        """Failure (or recovery, with None) of reading the environment list"""
+        with self._lock:
+            self._listing_error = error
+
+    def series(self, env_id: int, index_name: Optional[str] = None, window: int = 3600,
+               step: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Points of the last `window` seconds, optionally summed into `step`-second buckets"""
+        since = time.time() - window
+        with self._lock:
+            points = [p for p in self._points.get(env_id, ()) if p["ts"] >= since]
+
+        buckets: "OrderedDict[float, Dict[str, Any]]" = OrderedDict()
+        for point in points:
+            deltas = point["cluster"] if index_name is None else point["indices"].get(index_name, dict.fromkeys(METRIC_COUNTERS, 0))
+            if deltas is None:
+                continue
+            key = point["ts"] - point["ts"] % step if step else point["ts"]
+            bucket = buckets.setdefault(key, {"deltas": dict.fromkeys(METRIC_COUNTERS, 0), "seconds": 0.0, "last": point})
+            for counter in METRIC_COUNTERS:
+                bucket["deltas"][counter] += deltas[counter]
+            bucket["seconds"] += point["seconds"]
+            bucket["last"] = point
+
+        series = []
+        for key, bucket in buckets.items():
+            entry = {"ts": datetime.fromtimestamp(key).isoformat(), **rates_from_deltas(bucket["deltas"], bucket["seconds"])}
+            if index_name is None:
+                entry["cluster_status"] = bucket["last"]["health"].get("status")
+                entry["max_heap_used_percent"] = bucket["last"]["max_heap_used_percent"]
+            series.append(entry)
+        return series
+
+    def summary(self, env_id: int, index_name: Optional[str] = None, window: int = METRICS_SUMMARY_WINDOW) -> Optional[Dict[str, Any]]:
+        """Rates over the whole window, or None before two samples were taken"""
+        since = time.time() - window
+        with self._lock:
+            points = [p for p in self._points.get(env_id, ()) if p["ts"] >= since]
+        if not points:
+            return None
+        totals = dict.fromkeys(METRIC_COUNTERS, 0)
+        seconds = 0.0
+        for point in points:
+            deltas = point["cluster"] if index_name is None else point["indices"].get(index_name)
+            seconds += point["seconds"]
+            for counter in METRIC_COUNTERS:
+                totals[counter] += (deltas or {}).get(counter, 0)
+        return {"window_seconds": round(seconds, 1), **rates_from_deltas(totals, seconds)}
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": METRICS_COLLECTOR_ENABLED,
+                "interval_seconds": METRICS_SAMPLE_INTERVAL,
+                "retention_samples": self.retention,
+                "listing_error": self._listing_error,
+                "environments": {
+                    str(env_id): {
+                        "points": len(self._points.get(env_id, ())),
+                        "last_sample": datetime.fromtimestamp(self._last[env_id]["ts"]).isoformat() if env_id in self._last else None,
+                        "last_error": self._errors.get(env_id)
+                    } for env_id in set(self._points) | set(self._last) | set(self._errors)
+                }
+            }
+
+
+metrics_collector = MetricsCollector()
+_metrics_collector_task: Optional[asyncio.Task] = None
+
+
+async def metrics_collector_loop():
+    """Sample every environment each METRICS_SAMPLE_INTERVAL seconds"""
+    while True:
+        try:
+            environments = await asyncio.to_thread(get_elasticsearch_environments)
+            metrics_collector.record_listing_error(None)
+        except Exception as e:
+            # A transient database error must not end the collector task
+            logger.warning(f"Metrics collector could not list environments: {e}")
+            metrics_collector.record_listing_error(str(e))
+            environments = []
+        for env in environments:
+            try:
+                await asyncio.to_thread(metrics_collector.sample, env)
+            except Exception as e:
+                metrics_collector.record_error(env['id'], str(e))
+        await asyncio.sleep(METRICS_SAMPLE_INTERVAL)
+
+
+def start_metrics_collector():
+    global _metrics_collector_task
+    if METRICS_COLLECTOR_ENABLED:
+        _metrics_collector_task = asyncio.create_task(metrics_collector_loop())
+
+
+async def stop_metrics_collector():
+    global _metrics_collector_task
+    if _metrics_collector_task is not None:
+        _metrics_collector_task.cancel()
+        try:
+            await _metrics_collector_task
+        except asyncio.CancelledError:
+            pass
+    _metrics_collector_task = None
+
+
+@app.get("/api/metrics/status")
+async def get_metrics_collector_status():
+    """Collector configuration and per-environment sampling state"""
+    return {"success": True, "status": metrics_collector.status()}
+
+
+@app.get("/api/metrics/{env_id}/series")
+async def get_metrics_series(env_id: int, index: Optional[str] = None, window: int = 3600, step: Optional[int] = None):
+    """Windowed rate series for charts (cluster-wide, or one index with ?index=)"""
+    window = max(1, window)
+    return {
+        "success": True,
+        "env_id": env_id,
+        "index": index,
+        "window_seconds": window,
+        "step_seconds": step,
+        "series": metrics_collector.series(env_id, index, window, max(1, step) if step else None)
+    }
+
+
+@app.get("/api/metrics/{env_id}/summary")
+async def get_metrics_summary(env_id: int, index: Optional[str] = None, window: int = METRICS_SUMMARY_WINDOW):
+    """Rates and cache hit ratios over the last window"""
+    return {"success": True, "env_id": env_id, "index": index, "summary": metrics_collector.summary(env_id, index, max(1, window))}
+
+
+@app.post("/api/metrics/{env_id}/sample")
+async def take_metrics_sample(env_id: int):
+    """Sample an environment now instead of waiting for the next interval"""
+    try:
+        env = next((e for e in get_elasticsearch_environments() if e['id'] == env_id), None)
+        if not env:
+            raise HTTPException(status_code=404, detail="Environment not found")
+        point = await asyncio.to_thread(metrics_collector.sample, env)
+        return {"success": True, "first_sample": point is None}
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
 @app.get("/api/index-aliases/{env_id}/{index_name}")
 async def get_index_aliases(env_id: int, index_name: str):
     """Get aliases for a specific index"""
@@ -6315,7 +10423,7 @@ def build_query_v6(
         "inner_groups": inner_groups,
     }
 
-def transform_query_v6(input_data):
+def transform_query_v6(input_data, pagination: Optional[Dict[str, Any]] = None):
     """
     Transform query data (from build_query_v5) into the final query structure.
 
@@ -6336,6 +10444,8 @@ def transform_query_v6(input_data):
             ],
             ...
         }
+        pagination (dict, optional): replaces the default {"from": 0, "size": 10},
+            e.g. {"size": 50, "pit_id": "...", "search_after": [...]} for cursor paging.
 
     Returns:
         dict: {
@@ -6355,7 +10465,7 @@ def transform_query_v6(input_data):
             "operator": "AND",
             "groups": []
         },
-        "pagination": {
+        "pagination": pagination or {
             "from": 0,
             "size": 10
         },
@@ -6456,8 +10566,15 @@ def transform_query_v6(input_data):
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    start_submission_log_writer()
+    start_metrics_collector()
     print("Database initialized successfully!")
     print("Oracle to Elasticsearch Mapping Generator is ready!")
     print("Access the application at: http://localhost:8000")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_submission_log_writer()
+    await stop_metrics_collector()
+
 if __name__ == "__main__":    uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
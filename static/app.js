@@ -7912,7 +7912,8 @@ async function generateWorkflowMapping(isSave = false) {
             relationships: workflowData.relationships,
             tableStructures: workflowData.tableStructures,
             fieldMappings: workflowData.fieldMappings,
-            autoDetectionBtn:autoDetectionBtn
+            autoDetectionBtn:autoDetectionBtn,
+            oracleEnvId: workflowData.selectedEnvironment
         };
 
         const response = await fetch(`/oracle/generate-workflow-mapping/${elasticEnvId}?dry_run=${!isSave}`, {
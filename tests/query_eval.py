@@ -0,0 +1,176 @@
+"""
+Brute-force evaluator for the query DSL subset builder.py emits, following
+Elasticsearch/Lucene bool semantics, plus seeded random documents and form
+query structures. Lets tests compare matched document sets without a cluster.
+"""
+import random
+
+KEYWORD_VALUES = {"status": ["open", "closed", "pending"], "tier": ["gold", "silver"]}
+NAME_WORDS = ["acme", "global", "trading", "north", "star"]
+SKUS = ["a1", "b2", "c3"]
+
+
+def _values(doc, field):
+    value = doc.get(field)
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _bool_matches(body, doc):
+    must = _as_list(body.get("must")) + _as_list(body.get("filter"))
+    should = _as_list(body.get("should"))
+    must_not = _as_list(body.get("must_not"))
+    if not (must or should or must_not):
+        return True  # empty bool is match_all
+
+    if not all(matches(c, doc) for c in must):
+        return False
+    if any(matches(c, doc) for c in must_not):
+        return False
+
+    if not should:
+        return True
+    msm = body.get("minimum_should_match")
+    required = int(msm) if msm is not None else (0 if must else 1)
+    if not must:
+        # Lucene: without required clauses at least one should clause must match
+        required = max(required, 1)
+    return sum(1 for c in should if matches(c, doc)) >= required
+
+
+def matches(query, doc):
+    kind, body = next(iter(query.items()))
+    if kind == "match_all":
+        return True
+    if kind == "bool":
+        return _bool_matches(body, doc)
+    if kind == "nested":
+        return any(matches(body["query"], child) for child in _values(doc, body["path"]))
+    if kind == "exists":
+        return bool(_values(doc, body["field"]))
+
+    field, spec = next(iter(body.items()))
+    values = _values(doc, field)
+    if kind == "term":
+        expected = spec["value"] if isinstance(spec, dict) else spec
+        return expected in values
+    if kind == "terms":
+        return any(v in values for v in spec)
+    if kind == "range":
+        checks = {"gt": lambda v, b: v > b, "gte": lambda v, b: v >= b,
+                  "lt": lambda v, b: v < b, "lte": lambda v, b: v <= b}
+        return any(all(checks[op](v, bound) for op, bound in spec.items() if op in checks) for v in values)
+    if kind == "match":
+        text = spec["query"] if isinstance(spec, dict) else spec
+        tokens = set(str(text).lower().split())
+        return any(tokens & set(str(v).lower().split()) for v in values)
+    raise ValueError(f"Unsupported clause: {kind}")
+
+
+def matched_ids(query, docs):
+    return {doc["id"] for doc in docs if matches(query, doc)}
+
+
+def random_documents(rng, count=60):
+    docs = []
+    for doc_id in range(count):
+        doc = {"id": doc_id}
+        for field, choices in KEYWORD_VALUES.items():
+            if rng.random() < 0.85:
+                doc[field] = rng.choice(choices)
+        if rng.random() < 0.85:
+            doc["age"] = rng.randint(0, 10)
+        if rng.random() < 0.85:
+            doc["name"] = " ".join(rng.sample(NAME_WORDS, rng.randint(1, 3)))
+        doc["items"] = [
+            {"items.sku": rng.choice(SKUS), "items.qty": rng.randint(0, 5)}
+            for _ in range(rng.randint(0, 3))
+        ]
+        docs.append(doc)
+    return docs
+
+
+def random_condition(rng, nested=False):
+    if nested:
+        if rng.random() < 0.5:
+            return {"field": "items.sku", "operator": "==", "value": rng.choice(SKUS)}
+        return {"field": "items.qty", "operator": rng.choice([">", ">=", "<", "<="]), "value": rng.randint(0, 5)}
+
+    roll = rng.random()
+    if roll < 0.3:
+        field = rng.choice(list(KEYWORD_VALUES))
+        return {"field": field, "operator": rng.choice(["==", "!="]), "value": rng.choice(KEYWORD_VALUES[field])}
+    if roll < 0.45:
+        field = rng.choice(list(KEYWORD_VALUES))
+        return {"field": field, "operator": "in", "value": rng.sample(KEYWORD_VALUES[field], 2)}
+    if roll < 0.5:
+        return {"field": "age", "operator": rng.choice([">", ">=", "<", "<="]), "value": rng.randint(0, 10)}
+    if roll < 0.6:
+        return {"field": "age", "operator": "between", "value": sorted(rng.sample(range(11), 2))}
+    if roll < 0.7:
+        return {"field": rng.choice(["age", "name", "status"]), "operator": rng.choice(["exists", "missing"])}
+    return {"field": "name", "operator": "match", "value": " ".join(rng.sample(NAME_WORDS, rng.randint(1, 2)))}
+
+
+def random_group(rng, depth=3, nested=False):
+    """Form query group as the UI builds it; nested groups only hold conditions"""
+    group = {"operator": rng.choice(["AND", "AND", "OR", "NOT"]), "conditions": [], "groups": []}
+    for _ in range(rng.randint(1 if depth == 0 else 0, 3)):
+        group["conditions"].append(random_condition(rng, nested))
+    if not nested and depth > 0:
+        for _ in range(rng.randint(0, 2)):
+            if rng.random() < 0.25:
+                child = random_group(rng, 0, nested=True)
+                child["nested_path"] = "items"
+            else:
+                child = random_group(rng, depth - 1)
+            group["groups"].append(child)
+    if not group["conditions"] and not group["groups"]:
+        group["conditions"].append(random_condition(rng, nested))
+    if rng.random() < 0.15:
+        group["negate"] = True
+    return group
+
+
+def seeded(seed):
+    return random.Random(seed)
+
+
+def random_leaf(rng, nested=False):
+    if nested:
+        return {"term": {"items.sku": {"value": rng.choice(SKUS)}}} if rng.random() < 0.5 \
+            else {"range": {"items.qty": {rng.choice(["gt", "gte", "lt", "lte"]): rng.randint(0, 5)}}}
+    roll = rng.random()
+    if roll < 0.4:
+        # Few fields and values, so repeated term clauses on one field are common
+        field = rng.choice(list(KEYWORD_VALUES))
+        return {"term": {field: {"value": rng.choice(KEYWORD_VALUES[field])}}}
+    if roll < 0.5:
+        field = rng.choice(list(KEYWORD_VALUES))
+        return {"terms": {field: rng.sample(KEYWORD_VALUES[field], 2)}}
+    if roll < 0.7:
+        return {"range": {"age": {rng.choice(["gt", "gte", "lt", "lte"]): rng.randint(0, 10)}}}
+    if roll < 0.8:
+        return {"exists": {"field": rng.choice(["age", "name", "status"])}}
+    return {"match": {"name": {"query": rng.choice(NAME_WORDS)}}}
+
+
+def random_bool_query(rng, depth=3, nested=False):
+    """Arbitrary bool tree: wrappers, pure negations, minimum_should_match, nested blocks"""
+    if depth == 0 or rng.random() < 0.25:
+        if not nested and rng.random() < 0.2:
+            return {"nested": {"path": "items", "query": random_bool_query(rng, min(depth, 1), nested=True)}}
+        return random_leaf(rng, nested)
+    body = {}
+    for occur in rng.sample(["must", "filter", "should", "must_not"], rng.randint(1, 3)):
+        body[occur] = [random_bool_query(rng, depth - 1, nested) for _ in range(rng.randint(1, 3))]
+    if "should" in body and rng.random() < 0.4:
+        body["minimum_should_match"] = rng.choice([0, 1, "1", 2])
+    return {"bool": body}
@@ -0,0 +1,63 @@
+import pytest
+
+from builder import build_es_query_v3
+from query_eval import matched_ids, random_documents, random_group, seeded
+
+DOCS = random_documents(seeded(31), count=120)
+
+
+def compile_both(group):
+    structure = {"query": group}
+    scoring = build_es_query_v3(structure, filter_context=False)["query"]
+    filtered = build_es_query_v3(structure, filter_context=True)["query"]
+    return scoring, filtered
+
+
+def cond(field, operator, value=None):
+    condition = {"field": field, "operator": operator}
+    if value is not None:
+        condition["value"] = value
+    return condition
+
+
+CASES = {
+    "and": {"operator": "AND", "conditions": [
+        cond("status", "==", "open"), cond("age", ">=", 3), cond("name", "match", "acme")]},
+    "or": {"operator": "OR", "conditions": [
+        cond("tier", "==", "gold"), cond("age", "<", 2), cond("name", "match", "star north")]},
+    "not": {"operator": "NOT", "conditions": [cond("status", "in", ["open", "pending"]), cond("tier", "==", "gold")]},
+    "and_of_or_and_not": {"operator": "AND", "conditions": [cond("age", "between", [2, 8])], "groups": [
+        {"operator": "OR", "conditions": [cond("status", "==", "closed"), cond("name", "match", "global")]},
+        {"operator": "NOT", "conditions": [cond("tier", "==", "silver")]}]},
+    "negated_group": {"operator": "AND", "conditions": [cond("name", "match", "trading")], "groups": [
+        {"operator": "AND", "negate": True, "conditions": [cond("status", "!=", "open"), cond("age", "missing")]}]},
+    "nested_and": {"operator": "AND", "conditions": [cond("tier", "==", "gold")], "groups": [
+        {"operator": "AND", "nested_path": "items",
+         "conditions": [cond("items.sku", "==", "a1"), cond("items.qty", ">", 2)]}]},
+    "nested_or_with_match": {"operator": "OR", "conditions": [cond("name", "match", "acme")], "groups": [
+        {"operator": "OR", "nested_path": "items",
+         "conditions": [cond("items.sku", "==", "b2"), cond("items.qty", "<=", 0)]}]},
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_filter_context_matches_same_documents(name):
+    scoring, filtered = compile_both(CASES[name])
+    assert matched_ids(filtered, DOCS) == matched_ids(scoring, DOCS)
+
+
+def test_cases_are_not_trivial():
+    for group in CASES.values():
+        assert 0 < len(matched_ids(compile_both(group)[0], DOCS)) < len(DOCS)
+
+
+def test_filter_context_moves_exact_clauses_to_filter():
+    _, filtered = compile_both(CASES["and"])
+    assert filtered["bool"]["must"] == [{"match": {"name": {"query": "acme"}}}]
+    assert {next(iter(c)) for c in filtered["bool"]["filter"]} == {"term", "range"}
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_random_forms_match_same_documents(seed):
+    scoring, filtered = compile_both(random_group(seeded(seed)))
+    assert matched_ids(filtered, DOCS) == matched_ids(scoring, DOCS)
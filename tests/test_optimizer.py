@@ -0,0 +1,58 @@
+import pytest
+
+from builder import build_es_query_v3, optimize_clause, optimize_es_query
+from query_eval import matched_ids, random_bool_query, random_documents, random_group, seeded
+
+DOCS = random_documents(seeded(32), count=120)
+
+A = {"term": {"status": {"value": "open"}}}
+B = {"term": {"tier": {"value": "gold"}}}
+C = {"range": {"age": {"gte": 5}}}
+
+
+def assert_same_results(query, scoring):
+    assert matched_ids(optimize_clause(query, scoring), DOCS) == matched_ids(query, DOCS)
+
+
+@pytest.mark.parametrize("scoring", [True, False])
+def test_optional_should_with_pure_negative_filter(scoring):
+    query = {"bool": {"should": [A, B], "filter": [{"bool": {"must_not": [C]}}]}}
+    assert_same_results(query, scoring)
+
+
+@pytest.mark.parametrize("scoring", [True, False])
+def test_optional_should_with_pure_negative_must(scoring):
+    query = {"bool": {"should": [A], "must": [{"bool": {"must_not": [C, B]}}], "minimum_should_match": 0}}
+    assert_same_results(query, scoring)
+
+
+def test_unwraps_single_clause_bool():
+    assert optimize_clause({"bool": {"must": [{"bool": {"must": [A]}}]}}) == A
+
+
+def test_removes_double_negation():
+    assert optimize_clause({"bool": {"must_not": [{"bool": {"must_not": [A]}}]}}, scoring=False) == A
+
+
+def test_merges_repeated_terms_in_non_scoring_or():
+    query = {"bool": {"should": [A, {"term": {"status": {"value": "closed"}}}], "minimum_should_match": 1}}
+    assert optimize_clause(query, scoring=False) == {"terms": {"status": ["open", "closed"]}}
+
+
+def test_keeps_same_path_nested_blocks_under_and():
+    nested = [{"nested": {"path": "items", "query": {"term": {"items.sku": {"value": sku}}}}} for sku in ("a1", "b2")]
+    assert optimize_clause({"bool": {"filter": nested}}, scoring=False) == {"bool": {"filter": nested}}
+
+
+@pytest.mark.parametrize("seed", range(500))
+def test_random_bool_trees_keep_results(seed):
+    query = random_bool_query(seeded(seed))
+    assert_same_results(query, scoring=True)
+    assert_same_results(query, scoring=False)
+
+
+@pytest.mark.parametrize("seed", range(300))
+@pytest.mark.parametrize("filter_context", [False, True])
+def test_random_forms_keep_results(seed, filter_context):
+    body = build_es_query_v3({"query": random_group(seeded(seed))}, filter_context=filter_context)
+    assert matched_ids(optimize_es_query(body)["query"], DOCS) == matched_ids(body["query"], DOCS)
@@ -0,0 +1,15 @@
+from builder import with_sort_tiebreaker
+
+
+def test_default_sort_ends_with_shard_doc():
+    assert with_sort_tiebreaker(None) == [{"_score": {"order": "desc"}}, {"_shard_doc": {"order": "asc"}}]
+
+
+def test_user_sort_gets_tiebreaker():
+    assert with_sort_tiebreaker([{"created": "desc"}]) == [{"created": "desc"}, {"_shard_doc": {"order": "asc"}}]
+    assert with_sort_tiebreaker({"created": "desc"}) == [{"created": "desc"}, {"_shard_doc": {"order": "asc"}}]
+
+
+def test_existing_tiebreaker_is_kept_once():
+    sort = [{"created": "desc"}, "_shard_doc"]
+    assert with_sort_tiebreaker(sort) == sort
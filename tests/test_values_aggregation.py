@@ -0,0 +1,40 @@
+from builder import wrap_values_aggregation
+
+NESTED = {"keyword_field": "items.sku.keyword", "nested_path": "items"}
+FLAT = {"keyword_field": "status", "nested_path": None}
+PREFIX = {"prefix": {"items.sku.keyword": {"value": "a", "case_insensitive": True}}}
+
+
+def parents(aggs, path):
+    """Aggregation types enclosing the last aggregation on the path"""
+    kinds = []
+    for name in path[:-1]:
+        node = aggs[name]
+        kinds.append(next(key for key in node if key != "aggs"))
+        aggs = node["aggs"]
+    return kinds, aggs[path[-1]]
+
+
+def test_composite_on_nested_field_with_prefix_has_only_nested_parents():
+    composite = {"composite": {"size": 10, "sources": [{"value": {"terms": {"field": "items.sku.keyword"}}}]}}
+    body, path = wrap_values_aggregation(NESTED, composite, PREFIX)
+    kinds, leaf = parents(body["aggs"], path)
+    assert kinds == ["nested"]
+    assert leaf == composite
+    assert body["query"] == {"nested": {"path": "items", "query": PREFIX}}
+
+
+def test_terms_on_nested_field_with_prefix_is_filtered_inside_nested():
+    terms = {"terms": {"field": "items.sku.keyword", "size": 10}}
+    body, path = wrap_values_aggregation(NESTED, terms, PREFIX)
+    kinds, leaf = parents(body["aggs"], path)
+    assert kinds == ["nested", "filter"]
+    assert body["aggs"]["nested_values"]["aggs"]["matching"]["filter"] == PREFIX
+    assert leaf == terms
+
+
+def test_flat_field_is_not_wrapped():
+    composite = {"composite": {"size": 10, "sources": [{"value": {"terms": {"field": "status"}}}]}}
+    body, path = wrap_values_aggregation(FLAT, composite, None)
+    assert path == ["values"]
+    assert body == {"size": 0, "aggs": {"values": composite}}